@@ -1,21 +1,25 @@
 from flask import Flask, render_template, request, jsonify, session, redirect, url_for
+from flask import Response, stream_with_context
 import os
 from functools import wraps
 from datetime import datetime
 import csv
 import io
+import zlib
+import shutil
+import tempfile
+import itertools
 from flask import send_file
 import uuid
 
 # Import your existing modules
-from auth import login_user, register_user, logout_user, load_session, save_session
+from auth import authenticate, upgrade_password_hash, register_user, logout_user, load_session, save_session
 from transactions import (
     add_transaction,
     view_transactions,
     delete_transaction,
     edit_transaction,
-    get_user_summary,
-    get_top_categories,
+    get_dashboard_summary,
 )
 from goals import add_goal, view_goals, delete_goal, edit_goal
 from bill_reminders import (
@@ -26,20 +30,43 @@ from bill_reminders import (
     check_due_reminders,
 )
 from data_handler import (
-    load_transactions,
-    load_users,
-    load_goals,
-    load_reminders,
-    save_transactions,
+    get_user,
     import_transactions,
     export_transactions,
+    save_user,
+    load_user_transactions,
+    iter_user_transactions,
+    add_transaction_record,
+    update_transaction_record,
+    delete_transaction_record,
+    load_user_goals,
+    add_goal_record,
+    update_goal_record,
+    delete_goal_record,
+    load_user_reminders,
+    add_reminder_record,
+    update_reminder_record,
+    delete_reminder_record,
+    user_lock,
 )
-from search import search_transactions
-from simple_gemini import ask_gemini
+from search import search_transactions, page_transactions
+from simple_gemini import submit_question, get_job, get_cache_metrics
+from importer import import_csv_stream, bulk_import
+from backup import start_scheduler
+import charts
 
 app = Flask(__name__)
 app.secret_key = os.urandom(24)  # Change this to a fixed secret key in production
 
+# Incremental backups every SPENDLIFY_BACKUP_INTERVAL seconds, off the request path
+start_scheduler()
+
+# Page size limits for /api/transactions
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+# Rows read from storage per chunk of a streamed export
+EXPORT_CHUNK_SIZE = 1000
+
 
 # Login required decorator
 def login_required(f):
@@ -52,6 +79,16 @@ def login_required(f):
     return decorated_function
 
 
+# Serialize a user's read-modify-write requests across threads and workers
+def per_user(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        with user_lock(session["username"]):
+            return f(*args, **kwargs)
+
+    return decorated_function
+
+
 # Routes
 @app.route("/")
 def index():
@@ -64,43 +101,18 @@ def index():
 def login():
     if request.method == "POST":
         data = request.get_json()
-        username = data.get("username")
-        password = data.get("password")
-
-        # Temporarily store credentials for validation
-        import getpass
-        import sys
-        from io import StringIO
-
-        # Mock the input functions
-        old_input = __builtins__.input
-        old_getpass = getpass.getpass
-
-        inputs = iter([username, password])
-        __builtins__.input = lambda _: next(inputs)
-        getpass.getpass = lambda _: next(inputs)
-
-        # Capture output
-        old_stdout = sys.stdout
-        sys.stdout = StringIO()
-
-        result = login_user()
-
-        # Restore
-        output = sys.stdout.getvalue()
-        sys.stdout = old_stdout
-        __builtins__.input = old_input
-        getpass.getpass = old_getpass
-
-        if result:
-            session["username"] = result
-            users = load_users()
-            user_data = users.get(result, {})
+        username = (data.get("username") or "").strip()
+        password = data.get("password") or ""
+
+        user_data = authenticate(username, password)
+        if user_data is not None:
+            upgrade_password_hash(username, user_data, password)
+            session["username"] = username
             return jsonify(
                 {
                     "success": True,
-                    "username": result,
-                    "name": user_data.get("full_name", result),
+                    "username": username,
+                    "name": user_data.get("full_name", username),
                     "currency": user_data.get("currency", "USD"),
                 }
             )
@@ -118,26 +130,30 @@ def register():
     currency = data.get("currency")
     password = data.get("password")
 
-    users = load_users()
-
-    # Validation
-    if username in users:
-        return jsonify({"success": False, "message": "Username already exists"}), 400
-
     # Create user (simplified version - you may want to use your register_user function)
     from auth import hash_password
     import uuid
 
-    users[username] = {
-        "user_id": str(uuid.uuid4()),
-        "full_name": full_name,
-        "password_hash": hash_password(password),
-        "currency": currency,
-    }
+    if get_user(username) is not None:
+        return jsonify({"success": False, "message": "Username already exists"}), 400
+    # Hashed before taking the lock, the KDF is the slow part
+    password_hash = hash_password(password)
 
-    from data_handler import save_users
+    # Checked and saved under one lock so two sign-ups cannot take the same name
+    with user_lock(username or ""):
+        # Validation
+        if get_user(username) is not None:
+            return jsonify({"success": False, "message": "Username already exists"}), 400
 
-    save_users(users)
+        save_user(
+            username,
+            {
+                "user_id": str(uuid.uuid4()),
+                "full_name": full_name,
+                "password_hash": password_hash,
+                "currency": currency,
+            },
+        )
 
     return jsonify({"success": True, "message": "Registration successful"})
 
@@ -152,8 +168,7 @@ def logout():
 @login_required
 def dashboard():
     username = session.get("username")
-    users = load_users()
-    user_data = users.get(username, {})
+    user_data = get_user(username) or {}
 
     return render_template(
         "dashboard.html",
@@ -168,14 +183,13 @@ def dashboard():
 @login_required
 def api_summary():
     username = session.get("username")
-    summary = get_user_summary(username)
 
-    users = load_users()
-    user_data = users.get(username, {})
+    user_data = get_user(username) or {}
     currency = user_data.get("currency", "USD")
 
-    totals = summary.get(currency, {"income": 0.0, "expense": 0.0, "net": 0.0})
-    top_cats = get_top_categories(username, currency=currency, top_n=5)
+    summary = get_dashboard_summary(username, currency=currency, top_n=5)
+    totals = summary["totals"].get(currency, {"income": 0.0, "expense": 0.0, "net": 0.0})
+    top_cats = summary["top_categories"]
 
     return jsonify(
         {
@@ -190,13 +204,96 @@ def api_summary():
     )
 
 
+@app.route("/api/charts/categories")
+@login_required
+def api_chart_categories():
+    username = session.get("username")
+    try:
+        start = charts.parse_day(request.args.get("start"))
+        end = charts.parse_day(request.args.get("end"))
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+    return jsonify(
+        {
+            "categories": charts.category_totals(
+                username, start, end, request.args.get("currency")
+            )
+        }
+    )
+
+
+@app.route("/api/charts/trend")
+@login_required
+def api_chart_trend():
+    username = session.get("username")
+    try:
+        series = charts.trend(
+            username,
+            interval=request.args.get("interval", "month"),
+            start=charts.parse_day(request.args.get("start")),
+            end=charts.parse_day(request.args.get("end")),
+            currency=request.args.get("currency"),
+        )
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+    return jsonify(series)
+
+
 @app.route("/api/transactions", methods=["GET"])
 @login_required
 def api_get_transactions():
     username = session.get("username")
-    transactions = load_transactions()
-    user_transactions = [t for t in transactions if t["username"] == username]
-    return jsonify(user_transactions)
+    args = request.args
+    # Without paging parameters keep returning the whole history as before
+    if not any(k in args for k in ("limit", "cursor", "sort", "order")):
+        return jsonify(load_user_transactions(username))
+
+    try:
+        limit = int(args.get("limit", PAGE_SIZE))
+        if limit < 1:
+            raise ValueError("limit must be a positive integer")
+        rows, next_cursor = page_transactions(
+            username,
+            sort_by=args.get("sort", "date"),
+            order=args.get("order", "desc"),
+            limit=min(limit, MAX_PAGE_SIZE),
+            cursor=args.get("cursor"),
+        )
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+
+    return jsonify({"transactions": rows, "next_cursor": next_cursor})
+
+
+@app.route("/api/transactions/search")
+@login_required
+def api_search_transactions():
+    username = session.get("username")
+    args = request.args
+    try:
+        min_amount = float(args["min_amount"]) if args.get("min_amount") else None
+        max_amount = float(args["max_amount"]) if args.get("max_amount") else None
+        start = charts.parse_day(args.get("start"))
+        end = charts.parse_day(args.get("end"))
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+
+    sort_by = args.get("sort", "date")
+    order = args.get("order", "asc")
+    if sort_by not in ("date", "amount", "category") or order not in ("asc", "desc"):
+        return jsonify({"success": False, "message": "Invalid sort or order"}), 400
+
+    results = search_transactions(
+        username,
+        start_date=start,
+        end_date=end,
+        category=args.get("category") or None,
+        min_amount=min_amount,
+        max_amount=max_amount,
+        sort_by=sort_by,
+        reverse=order == "desc",
+    )
+    return jsonify({"transactions": results, "count": len(results)})
 
 
 @app.route("/api/transactions", methods=["POST"])
@@ -219,31 +316,22 @@ def api_add_transaction():
         "payment": data["payment"],
     }
 
-    transactions = load_transactions()
-    transactions.append(transaction)
-    save_transactions(transactions)
+    add_transaction_record(transaction)
 
     return jsonify({"success": True, "transaction": transaction})
 
 
 @app.route("/api/transactions/<transaction_id>", methods=["DELETE"])
 @login_required
+@per_user
 def api_delete_transaction(transaction_id):
     username = session.get("username")
-    transactions = load_transactions()
-
-    transaction = next(
-        (
-            t
-            for t in transactions
-            if t["id"] == transaction_id and t["username"] == username
-        ),
-        None,
-    )
+    transactions = load_user_transactions(username)
+
+    transaction = next((t for t in transactions if t["id"] == transaction_id), None)
 
     if transaction:
-        transactions.remove(transaction)
-        save_transactions(transactions)
+        delete_transaction_record(transaction)
         return jsonify({"success": True})
 
     return jsonify({"success": False, "message": "Transaction not found"}), 404
@@ -251,19 +339,13 @@ def api_delete_transaction(transaction_id):
 
 @app.route("/api/transactions/<transaction_id>", methods=["PUT"])
 @login_required
+@per_user
 def api_edit_transaction(transaction_id):
     username = session.get("username")
     data = request.get_json()
-    transactions = load_transactions()
-
-    transaction = next(
-        (
-            t
-            for t in transactions
-            if t["id"] == transaction_id and t["username"] == username
-        ),
-        None,
-    )
+    transactions = load_user_transactions(username)
+
+    transaction = next((t for t in transactions if t["id"] == transaction_id), None)
 
     if transaction:
         transaction.update(
@@ -277,7 +359,7 @@ def api_edit_transaction(transaction_id):
                 "payment": data.get("payment", transaction["payment"]),
             }
         )
-        save_transactions(transactions)
+        update_transaction_record(transaction)
         return jsonify({"success": True, "transaction": transaction})
 
     return jsonify({"success": False, "message": "Transaction not found"}), 404
@@ -287,9 +369,7 @@ def api_edit_transaction(transaction_id):
 @login_required
 def api_get_goals():
     username = session.get("username")
-    goals = load_goals()
-    user_goals = [g for g in goals if g["username"] == username]
-    return jsonify(user_goals)
+    return jsonify(load_user_goals(username))
 
 
 @app.route("/api/goals", methods=["POST"])
@@ -316,30 +396,22 @@ def api_add_goal():
         "status": status,
     }
 
-    from data_handler import save_goals
-
-    goals = load_goals()
-    goals.append(goal)
-    save_goals(goals)
+    add_goal_record(goal)
 
     return jsonify({"success": True, "goal": goal})
 
 
 @app.route("/api/goals/<goal_id>", methods=["DELETE"])
 @login_required
+@per_user
 def api_delete_goal(goal_id):
     username = session.get("username")
-    goals = load_goals()
+    goals = load_user_goals(username)
 
-    goal = next(
-        (g for g in goals if g["id"] == goal_id and g["username"] == username), None
-    )
+    goal = next((g for g in goals if g["id"] == goal_id), None)
 
     if goal:
-        from data_handler import save_goals
-
-        goals.remove(goal)
-        save_goals(goals)
+        delete_goal_record(goal)
         return jsonify({"success": True})
 
     return jsonify({"success": False, "message": "Goal not found"}), 404
@@ -347,14 +419,13 @@ def api_delete_goal(goal_id):
 
 @app.route("/api/goals/<goal_id>", methods=["PUT"])
 @login_required
+@per_user
 def api_edit_goal(goal_id):
     username = session.get("username")
     data = request.get_json()
-    goals = load_goals()
+    goals = load_user_goals(username)
 
-    goal = next(
-        (g for g in goals if g["id"] == goal_id and g["username"] == username), None
-    )
+    goal = next((g for g in goals if g["id"] == goal_id), None)
 
     if goal:
         # Calculate new status
@@ -372,9 +443,7 @@ def api_edit_goal(goal_id):
             }
         )
 
-        from data_handler import save_goals
-
-        save_goals(goals)
+        update_goal_record(goal)
         return jsonify({"success": True, "goal": goal})
 
     return jsonify({"success": False, "message": "Goal not found"}), 404
@@ -384,9 +453,7 @@ def api_edit_goal(goal_id):
 @login_required
 def api_get_reminders():
     username = session.get("username")
-    reminders = load_reminders()
-    user_reminders = [r for r in reminders if r["username"] == username]
-    return jsonify(user_reminders)
+    return jsonify(load_user_reminders(username))
 
 
 @app.route("/api/reminders", methods=["POST"])
@@ -405,26 +472,20 @@ def api_add_reminder():
         "deadline": data["deadline"],
     }
 
-    from data_handler import save_reminders
-
-    reminders = load_reminders()
-    reminders.append(reminder)
-    save_reminders(reminders)
+    add_reminder_record(reminder)
 
     return jsonify({"success": True, "reminder": reminder})
 
 
 @app.route("/api/reminders/<reminder_id>", methods=["PUT"])
 @login_required
+@per_user
 def api_edit_reminder(reminder_id):
     username = session.get("username")
     data = request.get_json()
-    reminders = load_reminders()
+    reminders = load_user_reminders(username)
 
-    reminder = next(
-        (r for r in reminders if r["id"] == reminder_id and r["username"] == username),
-        None,
-    )
+    reminder = next((r for r in reminders if r["id"] == reminder_id), None)
 
     if reminder:
         reminder.update(
@@ -435,9 +496,7 @@ def api_edit_reminder(reminder_id):
             }
         )
 
-        from data_handler import save_reminders
-
-        save_reminders(reminders)
+        update_reminder_record(reminder)
         return jsonify({"success": True, "reminder": reminder})
 
     return jsonify({"success": False, "message": "Reminder not found"}), 404
@@ -445,20 +504,15 @@ def api_edit_reminder(reminder_id):
 
 @app.route("/api/reminders/<reminder_id>", methods=["DELETE"])
 @login_required
+@per_user
 def api_delete_reminder(reminder_id):
     username = session.get("username")
-    reminders = load_reminders()
+    reminders = load_user_reminders(username)
 
-    reminder = next(
-        (r for r in reminders if r["id"] == reminder_id and r["username"] == username),
-        None,
-    )
+    reminder = next((r for r in reminders if r["id"] == reminder_id), None)
 
     if reminder:
-        from data_handler import save_reminders
-
-        reminders.remove(reminder)
-        save_reminders(reminders)
+        delete_reminder_record(reminder)
         return jsonify({"success": True})
 
     return jsonify({"success": False, "message": "Reminder not found"}), 404
@@ -471,21 +525,41 @@ def api_ai_chat():
     data = request.get_json()
     question = data.get("question")
 
-    users = load_users()
-    user_data = users.get(username, {})
+    user_data = get_user(username) or {}
     current_user = {
         "username": username,
         "name": user_data.get("full_name", username),
         "currency": user_data.get("currency", "USD"),
     }
 
-    response = ask_gemini(question, current_user)
-    return jsonify({"response": response})
+    # Answered in the background; the page polls /api/ai/chat/<job_id>
+    job = submit_question(question, current_user)
+    if job is None:
+        return jsonify({"success": False,
+                        "message": "The assistant is busy, please try again in a moment."}), 503
+    return jsonify({"job_id": job["id"], "status": job["status"]}), 202
+
+
+@app.route("/api/ai/metrics", methods=["GET"])
+@login_required
+def api_ai_metrics():
+    # Counters of this worker process only
+    return jsonify(get_cache_metrics())
+
+
+@app.route("/api/ai/chat/<job_id>", methods=["GET"])
+@login_required
+def api_ai_chat_result(job_id):
+    job = get_job(job_id, session.get("username"))
+    if job is None:
+        return jsonify({"success": False, "message": "Unknown chat request"}), 404
+    return jsonify({"job_id": job["id"], "status": job["status"], "response": job.get("response")})
 
 
 # CSV Import Route - FIXED
 @app.route("/api/transactions/import", methods=["POST"])
 @login_required
+@per_user
 def api_import_transactions():
     username = session.get("username")
 
@@ -501,94 +575,33 @@ def api_import_transactions():
         return jsonify({"success": False, "message": "File must be a CSV"}), 400
 
     try:
-        # Read the CSV file
-        stream = io.StringIO(file.stream.read().decode("UTF8"), newline=None)
-        csv_reader = csv.DictReader(stream)
-
-        transactions = load_transactions()
-        imported_count = 0
-        errors = []
-
-        for row_num, row in enumerate(csv_reader, start=2):
-            try:
-                # Validate required fields
-                required_fields = [
-                    "amount",
-                    "currency",
-                    "category",
-                    "date",
-                    "description",
-                    "type",
-                    "payment",
-                ]
-                missing_fields = [
-                    field
-                    for field in required_fields
-                    if field not in row or not row[field]
-                ]
-
-                if missing_fields:
-                    errors.append(
-                        f"Row {row_num}: Missing fields: {', '.join(missing_fields)}"
-                    )
-                    continue
-
-                # Validate amount
-                try:
-                    amount = float(row["amount"])
-                    if amount <= 0:
-                        errors.append(f"Row {row_num}: Amount must be greater than 0")
-                        continue
-                except ValueError:
-                    errors.append(f"Row {row_num}: Invalid amount value")
-                    continue
-
-                # Validate date format
-                try:
-                    datetime.strptime(row["date"], "%Y-%m-%d")
-                except ValueError:
-                    errors.append(
-                        f"Row {row_num}: Invalid date format (use YYYY-MM-DD)"
-                    )
-                    continue
-
-                # Validate type
-                if row["type"].lower() not in ["income", "expense"]:
-                    errors.append(f"Row {row_num}: Type must be 'income' or 'expense'")
-                    continue
-
-                # Create transaction
-                transaction = {
-                    "id": str(uuid.uuid4()),
-                    "username": username,
-                    "amount": amount,
-                    "currency": row["currency"].upper(),
-                    "category": row["category"],
-                    "date": row["date"],
-                    "description": row["description"],
-                    "type": row["type"].lower(),
-                    "payment": row["payment"],
-                }
-
-                transactions.append(transaction)
-                imported_count += 1
-
-            except Exception as e:
-                errors.append(f"Row {row_num}: {str(e)}")
-                continue
-
-        # Save transactions
-        if imported_count > 0:
-            save_transactions(transactions)
+        # Parse and store the upload in batches straight from the request stream
+        # Rows already stored are skipped unless ?duplicates=keep, then only flagged
+        result = import_csv_stream(
+            username, file.stream, keep_duplicates=request.args.get("duplicates") == "keep"
+        )
+        imported_count = result["count"]
 
         response_data = {
             "success": True,
             "count": imported_count,
+            "rows": result["rows"],
+            "duplicates": result["duplicates"],
+            "skipped": result["error_count"],
             "message": f"Successfully imported {imported_count} transactions",
         }
 
-        if errors:
-            response_data["warnings"] = errors[:10]  # Limit to first 10 errors
+        if result["errors"]:
+            response_data["warnings"] = result["errors"]  # Limited to the first 10 errors
+
+        if result["error"]:
+            # The rows before the unreadable part are stored, so report them
+            response_data["partial"] = True
+            response_data["error"] = result["error"]
+            response_data["message"] = (
+                f"Imported {imported_count} transactions before the file could not be "
+                f"read further: {result['error']}"
+            )
 
         return jsonify(response_data)
 
@@ -600,64 +613,109 @@ def api_import_transactions():
         )
 
 
-# CSV Export Route - FIXED
+@app.route("/api/transactions/import/bulk", methods=["POST"])
+@login_required
+@per_user
+def api_bulk_import_transactions():
+    username = session.get("username")
+    files = [f for f in request.files.getlist("files") if f.filename]
+
+    if not files:
+        return jsonify({"success": False, "message": "No files provided"}), 400
+
+    upload_dir = tempfile.mkdtemp(prefix="spendlify-import-")
+    try:
+        # The import workers read the uploads from disk rather than being
+        # sent their contents
+        sources = []
+        for i, f in enumerate(files):
+            path = os.path.join(upload_dir, str(i))
+            f.save(path)
+            sources.append((f.filename, path))
+        summary = bulk_import(
+            username,
+            sources,
+            keep_duplicates=request.args.get("duplicates") == "keep",
+        )
+        response_data = {
+            "success": True,
+            "files": summary["files"],
+            "count": summary["count"],
+            "rows": summary["rows"],
+            "duplicates": summary["duplicates"],
+            "skipped": summary["error_count"],
+            "message": f"Successfully imported {summary['count']} transactions "
+                       f"from {summary['files']} files",
+        }
+        if summary["errors"]:
+            response_data["warnings"] = summary["errors"]
+        return jsonify(response_data)
+
+    except Exception as e:
+        print(f"Bulk import error: {e}")
+        return (
+            jsonify({"success": False, "message": f"Error importing files: {str(e)}"}),
+            500,
+        )
+    finally:
+        shutil.rmtree(upload_dir, ignore_errors=True)
+
+
+# CSV Export Route
+EXPORT_FIELDS = ["amount", "currency", "category", "date", "description", "type", "payment"]
+
+
+def _export_csv(first, chunks):
+    """Yield CSV text one chunk of transactions at a time"""
+    output = io.StringIO()
+    writer = csv.DictWriter(output, fieldnames=EXPORT_FIELDS, extrasaction="ignore")
+    writer.writeheader()
+    for chunk in itertools.chain([first], chunks):
+        writer.writerows(chunk)
+        yield output.getvalue()
+        output.seek(0)
+        output.truncate()
+
+
+def _gzip(parts):
+    """Compress a stream of text parts into gzip bytes on the fly"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for part in parts:
+        data = compressor.compress(part.encode("utf-8"))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
 @app.route("/api/transactions/export", methods=["GET"])
 @login_required
 def api_export_transactions():
     username = session.get("username")
 
     try:
-        transactions = load_transactions()
-        user_transactions = [t for t in transactions if t["username"] == username]
+        # Rows are read from storage and written out in chunks as the client downloads
+        chunks = iter_user_transactions(username, EXPORT_CHUNK_SIZE)
+        first = next(chunks, None)
 
-        if not user_transactions:
+        if not first:
             return (
                 jsonify({"success": False, "message": "No transactions to export"}),
                 404,
             )
 
-        # Create CSV in memory
-        output = io.StringIO()
-        fieldnames = [
-            "amount",
-            "currency",
-            "category",
-            "date",
-            "description",
-            "type",
-            "payment",
-        ]
-        writer = csv.DictWriter(output, fieldnames=fieldnames)
-
-        writer.writeheader()
-        for tx in user_transactions:
-            writer.writerow(
-                {
-                    "amount": tx["amount"],
-                    "currency": tx["currency"],
-                    "category": tx["category"],
-                    "date": tx["date"],
-                    "description": tx["description"],
-                    "type": tx["type"],
-                    "payment": tx["payment"],
-                }
-            )
-
-        # Convert to bytes for download
-        output.seek(0)
-        
-        # Create response with proper headers
-        from flask import Response
-        
-        response = Response(
-            output.getvalue(),
-            mimetype="text/csv",
-            headers={
-                "Content-Disposition": f"attachment; filename={username}_transactions_{datetime.now().strftime('%Y%m%d')}.csv"
-            }
+        filename = f"{username}_transactions_{datetime.now().strftime('%Y%m%d')}.csv"
+        body = _export_csv(first, chunks)
+        mimetype = "text/csv"
+        if request.args.get("gzip") in ("1", "true"):
+            body = _gzip(body)
+            filename += ".gz"
+            mimetype = "application/gzip"
+
+        return Response(
+            stream_with_context(body),
+            mimetype=mimetype,
+            headers={"Content-Disposition": f"attachment; filename={filename}"},
         )
-        
-        return response
 
     except Exception as e:
         print(f"Export error: {e}")
@@ -1,10 +1,10 @@
 import json
 import os
-import hashlib
 import getpass
 import re
 import uuid
-from data_handler import save_users, load_users
+from data_handler import save_user, get_user, user_lock
+from passwords import hash_password, verify_password, needs_rehash
 
 SESSION_FILE = "data/session.json"
 
@@ -13,10 +13,6 @@ def is_strong_password(password):
     pattern = r"^(?=.*[a-z])(?=.*[A-Z])(?=.*\d)(?=.*[!@#$%^&*()_+\-=\[\]{};':\"\\|,.<>\/?])[A-Za-z\d!@#$%^&*()_+\-=\[\]{};':\"\\|,.<>\/?]{8,}$"
     return bool(re.match(pattern, password))
 
-# Hash password using SHA-256
-def hash_password(password):
-    return hashlib.sha256(password.encode()).hexdigest()
-
 # Save current session
 def save_session(username):
     with open(SESSION_FILE, "w") as f:
@@ -37,8 +33,6 @@ def clear_session():
 
 # User registration
 def register_user():
-    users = load_users()
-
     full_name = input("Enter full name: ").strip()
     if not full_name:
         print("Full name cannot be empty.")
@@ -51,7 +45,7 @@ def register_user():
     if not username:
         print("Username cannot be empty.")
         return
-    if username in users:
+    if get_user(username) is not None:
         print("Username already exists!")
         return
     if len(username) < 3:
@@ -76,21 +70,31 @@ def register_user():
     password_hash = hash_password(password)
     
     # Store user data
-    users[username] = {
+    save_user(username, {
         "user_id": str(uuid.uuid4()),
         "full_name": full_name,
         "password_hash": password_hash,
         "currency": currency,
-    }
-    
-    save_users(users)
+    })
     print("Registration successful!")
     return username
 
+# Check credentials
+def authenticate(username, password):
+    """Return the user record if password is right for username, else None.
+
+    Reads the one user record and nothing else: no prompts, no output and
+    no session file, so it is safe to call from concurrent web requests.
+    """
+    if not username or not password:
+        return None
+    user = get_user(username)
+    if user is None or not verify_password(password, user.get("password_hash")):
+        return None
+    return user
+
 # User login
 def login_user():
-    users = load_users()
-    
     # Check the username is not empty
     username = input("Username: ").strip()
     if not username:
@@ -100,7 +104,9 @@ def login_user():
     password = getpass.getpass("Password: ")
     
     # Verify credentials
-    if username in users and users[username]["password_hash"] == hash_password(password):
+    user = authenticate(username, password)
+    if user is not None:
+        upgrade_password_hash(username, user, password)
         print("Login successful!")
         save_session(username)
         return username
@@ -108,6 +114,22 @@ def login_user():
         print("Invalid username or password!")
         return
 
+# Re-hash a password stored with an old scheme or parameters
+def upgrade_password_hash(username, user, password):
+    """Store password with the current hasher after a successful login
+    when the stored hash is from a legacy scheme or older parameters"""
+    stored = user["password_hash"]
+    if needs_rehash(stored):
+        new_hash = hash_password(password)
+        # Re-read under the user's lock so a concurrent profile edit or
+        # password change is not overwritten
+        with user_lock(username):
+            current = get_user(username)
+            if current is not None and current.get("password_hash") == stored:
+                user = dict(current, password_hash=new_hash)
+                save_user(username, user)
+    return user
+
 # User logout    
 def logout_user(current_user):
     if current_user:
@@ -119,13 +141,13 @@ def logout_user(current_user):
 
 # Change user password
 def change_password(username):
-    users = load_users()
-    if username not in users:
+    user = get_user(username)
+    if user is None:
         print("User does not exist.")
         return
     
     current_password = getpass.getpass("Enter current password: ")
-    if users[username]["password_hash"] != hash_password(current_password):
+    if not verify_password(current_password, user["password_hash"]):
         print("Current password is incorrect.")
         return
     
@@ -139,6 +161,6 @@ def change_password(username):
         print("Passwords do not match.")
         return
     
-    users[username]["password_hash"] = hash_password(new_password)
-    save_users(users)
+    user["password_hash"] = hash_password(new_password)
+    save_user(username, user)
     print("Password changed successfully.")
\ No newline at end of file
@@ -0,0 +1,398 @@
+import os
+import sys
+import json
+import zlib
+import hashlib
+import threading
+from datetime import datetime, timezone
+from data_handler import (
+    BACKUP,
+    USERS_FILE,
+    USERS_LOG,
+    TRANSACTION_FILE,
+    TRANSACTION_LOG,
+    TRANSACTION_SHARDS,
+    GOALS_FILE,
+    REMINDERS_FILE,
+    DATABASE_FILE,
+    get_engine,
+)
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Incremental backups. Every data file is cut into chunks at line
+# boundaries chosen by the content of the lines, so an edit only changes
+# the chunks around it. Chunks are stored once, compressed, under their
+# SHA-256 in BACKUP/chunks/. A generation is a manifest in
+# BACKUP/generations/ listing the chunks of every file at that moment;
+# files whose size and mtime match the previous generation are not even
+# read. Old generations are pruned by the retention policy below and
+# chunks no generation uses any more are deleted.
+
+CHUNKS_DIR = os.path.join(BACKUP, "chunks")
+GENERATIONS_DIR = os.path.join(BACKUP, "generations")
+LOCK_FILE = os.path.join(BACKUP, "backup.lock")
+# The SQLite database is copied here with the online backup API first
+DATABASE_STAGING = os.path.join(BACKUP, "staging.db")
+
+# Retention: the latest KEEP_LAST generations, plus the newest one of each
+# of the last KEEP_DAILY days and KEEP_WEEKLY weeks
+KEEP_LAST = int(os.getenv("SPENDLIFY_BACKUP_KEEP_LAST", 10))
+KEEP_DAILY = int(os.getenv("SPENDLIFY_BACKUP_KEEP_DAILY", 7))
+KEEP_WEEKLY = int(os.getenv("SPENDLIFY_BACKUP_KEEP_WEEKLY", 4))
+# Seconds between background backups, 0 disables them
+BACKUP_INTERVAL = int(os.getenv("SPENDLIFY_BACKUP_INTERVAL", 3600))
+
+# A line ends a chunk when its CRC is 0 modulo CHUNK_MODULUS, once the
+# chunk has MIN_CHUNK bytes; MAX_CHUNK bounds chunks of files with few lines
+MIN_CHUNK = 16 * 1024
+MAX_CHUNK = 1024 * 1024
+CHUNK_MODULUS = 256
+
+
+def _data_paths():
+    """The data files that exist, apart from the database"""
+    paths = [p for p in (USERS_FILE, USERS_LOG, USERS_LOG + ".compacting",
+                         TRANSACTION_FILE, TRANSACTION_LOG, TRANSACTION_LOG + ".compacting",
+                         GOALS_FILE, REMINDERS_FILE)
+             if os.path.exists(p)]
+    if os.path.isdir(TRANSACTION_SHARDS):
+        for name in sorted(os.listdir(TRANSACTION_SHARDS)):
+            # Lock files belong to the running processes, temporary files
+            # are half-written saves and .hashes files are rebuilt from the
+            # shards, none of them is data
+            if name.endswith((".lock", ".tmp", ".hashes")):
+                continue
+            path = os.path.join(TRANSACTION_SHARDS, name)
+            if os.path.isfile(path):
+                paths.append(path)
+    return paths
+
+
+def data_files():
+    """(path recorded in the backup, path to read it from) for every data file"""
+    files = [(p, p) for p in _data_paths()]
+    engine = get_engine()
+    if engine.name == "sqlite":
+        engine.backup_to(DATABASE_STAGING)
+        files.append((DATABASE_FILE, DATABASE_STAGING))
+    return files
+
+
+def _chunks(file):
+    chunk = []
+    size = 0
+    for line in file:
+        chunk.append(line)
+        size += len(line)
+        if size >= MAX_CHUNK or (size >= MIN_CHUNK and zlib.crc32(line) % CHUNK_MODULUS == 0):
+            yield b"".join(chunk)
+            chunk = []
+            size = 0
+    if chunk:
+        yield b"".join(chunk)
+
+
+def _chunk_path(digest):
+    return os.path.join(CHUNKS_DIR, digest[:2], digest)
+
+
+def _store_chunk(data):
+    digest = hashlib.sha256(data).hexdigest()
+    path = _chunk_path(digest)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(zlib.compress(data, 6))
+        os.replace(tmp, path)
+    return digest
+
+
+def _read_chunk(digest):
+    with open(_chunk_path(digest), "rb") as f:
+        return zlib.decompress(f.read())
+
+
+def _backup_file(path):
+    """Store the chunks of one file, returns its manifest entry"""
+    st = os.stat(path)
+    whole = hashlib.sha256()
+    chunks = []
+    with open(path, "rb") as f:
+        for data in _chunks(f):
+            whole.update(data)
+            chunks.append(_store_chunk(data))
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns,
+            "sha256": whole.hexdigest(), "chunks": chunks}
+
+
+class _Lock:
+    """Exclusive lock on the backup store shared by all processes"""
+
+    def __enter__(self):
+        os.makedirs(BACKUP, exist_ok=True)
+        self.file = open(LOCK_FILE, "a")
+        if fcntl is not None:
+            fcntl.flock(self.file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if fcntl is not None:
+            fcntl.flock(self.file, fcntl.LOCK_UN)
+        self.file.close()
+
+
+# ==================== GENERATIONS ====================
+
+def list_generations():
+    """Generation names, oldest first"""
+    if not os.path.isdir(GENERATIONS_DIR):
+        return []
+    return sorted(name[:-5] for name in os.listdir(GENERATIONS_DIR) if name.endswith(".json"))
+
+
+def load_generation(name):
+    with open(os.path.join(GENERATIONS_DIR, name + ".json"), "r") as f:
+        return json.load(f)
+
+
+def _save_generation(name, manifest):
+    os.makedirs(GENERATIONS_DIR, exist_ok=True)
+    path = os.path.join(GENERATIONS_DIR, name + ".json")
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def _generation_time(name):
+    return datetime.strptime(name, "%Y%m%dT%H%M%S%fZ").replace(tzinfo=timezone.utc)
+
+
+def create_generation():
+    """Back up every data file as a new generation.
+
+    Returns the generation name, or None when nothing changed since the
+    latest generation.
+    """
+    with _Lock():
+        generations = list_generations()
+        previous = load_generation(generations[-1])["files"] if generations else {}
+        files = {}
+        for name, path in data_files():
+            st = os.stat(path)
+            entry = previous.get(name)
+            if entry and entry["size"] == st.st_size and entry["mtime_ns"] == st.st_mtime_ns:
+                files[name] = entry
+            else:
+                files[name] = _backup_file(path)
+        if os.path.exists(DATABASE_STAGING):
+            os.remove(DATABASE_STAGING)
+
+        if generations and {n: e["sha256"] for n, e in files.items()} == \
+                {n: e["sha256"] for n, e in previous.items()}:
+            return None
+
+        now = datetime.now(timezone.utc)
+        name = now.strftime("%Y%m%dT%H%M%S%fZ")
+        _save_generation(name, {"created": now.isoformat(), "files": files})
+        return name
+
+
+def retained(generations, keep_last=KEEP_LAST, keep_daily=KEEP_DAILY, keep_weekly=KEEP_WEEKLY):
+    """The generations the retention policy keeps"""
+    generations = sorted(generations)
+    keep = set(generations[-keep_last:] if keep_last > 0 else [])
+    days = {}
+    weeks = {}
+    for name in reversed(generations):
+        time = _generation_time(name)
+        days.setdefault(time.date(), name)
+        weeks.setdefault(time.isocalendar()[:2], name)
+    keep.update(list(days.values())[:keep_daily])
+    keep.update(list(weeks.values())[:keep_weekly])
+    return keep
+
+
+def prune(keep_last=KEEP_LAST, keep_daily=KEEP_DAILY, keep_weekly=KEEP_WEEKLY):
+    """Delete the generations the retention policy drops and the chunks only
+    they used. Returns (generations removed, chunks removed)."""
+    with _Lock():
+        generations = list_generations()
+        keep = retained(generations, keep_last, keep_daily, keep_weekly)
+        removed = [name for name in generations if name not in keep]
+        for name in removed:
+            os.remove(os.path.join(GENERATIONS_DIR, name + ".json"))
+
+        used = set()
+        for name in keep:
+            for entry in load_generation(name)["files"].values():
+                used.update(entry["chunks"])
+        chunks = 0
+        if os.path.isdir(CHUNKS_DIR):
+            for folder in os.listdir(CHUNKS_DIR):
+                for digest in os.listdir(os.path.join(CHUNKS_DIR, folder)):
+                    if digest not in used:
+                        os.remove(os.path.join(CHUNKS_DIR, folder, digest))
+                        chunks += 1
+        return len(removed), chunks
+
+
+def restore(name, target=None):
+    """Write the files of a generation back in place, or under target.
+
+    Stop the app first when restoring in place. Returns the paths written.
+    """
+    with _Lock():
+        manifest = load_generation(name)
+        if not target:
+            # A change log left from after the backup would be replayed on
+            # top of the restored files
+            for path in _data_paths():
+                if path not in manifest["files"]:
+                    os.remove(path)
+        written = []
+        for path, entry in manifest["files"].items():
+            out = os.path.join(target, path) if target else path
+            folder = os.path.dirname(out)
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+            whole = hashlib.sha256()
+            with open(out + ".tmp", "wb") as f:
+                for digest in entry["chunks"]:
+                    data = _read_chunk(digest)
+                    whole.update(data)
+                    f.write(data)
+            if whole.hexdigest() != entry["sha256"]:
+                os.remove(out + ".tmp")
+                raise ValueError(f"Backup of {path} in {name} is damaged")
+            if path == DATABASE_FILE:
+                # SQLite would apply a leftover write-ahead log to the restored file
+                for suffix in ("-wal", "-shm"):
+                    if os.path.exists(out + suffix):
+                        os.remove(out + suffix)
+            os.replace(out + ".tmp", out)
+            written.append(out)
+        return written
+
+
+def run_backup():
+    """Take a generation and apply the retention policy"""
+    try:
+        name = create_generation()
+        prune()
+        return name
+    except Exception as e:
+        print(f"Error during backup: {e}")
+        return None
+
+
+# ==================== BACKGROUND THREAD ====================
+
+class BackupWorker:
+    """Runs backups on a daemon thread, every interval seconds (if not 0)
+    and whenever request() is called. Requests made while a backup runs
+    are folded into one more run."""
+
+    def __init__(self, interval=0):
+        self.interval = interval
+        self._cond = threading.Condition()
+        self._requested = False
+        self._running = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def request(self):
+        with self._cond:
+            self._requested = True
+            self._cond.notify_all()
+
+    def wait(self, timeout=None):
+        """Block until no backup is running or requested"""
+        with self._cond:
+            return self._cond.wait_for(lambda: not (self._requested or self._running), timeout)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._requested, self.interval or None)
+                self._requested = False
+                self._running = True
+            try:
+                run_backup()
+            finally:
+                with self._cond:
+                    self._running = False
+                    self._cond.notify_all()
+
+
+_worker = None
+_worker_lock = threading.Lock()
+
+def _get_worker(interval=0):
+    global _worker
+    with _worker_lock:
+        if _worker is None:
+            _worker = BackupWorker(interval)
+        elif interval:
+            # Takes effect after the next backup
+            _worker.interval = interval
+        return _worker
+
+def schedule_backup():
+    """Start a backup in the background and return at once"""
+    _get_worker().request()
+
+def start_scheduler(interval=BACKUP_INTERVAL):
+    """Back up every interval seconds in the background"""
+    if interval > 0:
+        _get_worker(interval)
+
+def wait_for_backup(timeout=None):
+    """Wait for a background backup to finish, if one is running"""
+    if _worker is not None:
+        return _worker.wait(timeout)
+    return True
+
+
+USAGE = """Usage: python backup.py <command>
+
+Commands:
+  run                          Back up the data files now
+  list                         Show the generations kept
+  prune                        Apply the retention policy
+  restore <generation> [dir]   Restore a generation in place (stop the app first) or into dir
+"""
+
+def main(argv):
+    if not argv or argv[0] not in ("run", "list", "prune", "restore"):
+        print(USAGE)
+        return 1
+    command = argv[0]
+    if command == "run":
+        name = run_backup()
+        print(f"Created generation {name}." if name else "No changes since the last backup.")
+    elif command == "list":
+        generations = list_generations()
+        if not generations:
+            print("No backups yet.")
+        for name in generations:
+            files = load_generation(name)["files"]
+            size = sum(entry["size"] for entry in files.values())
+            print(f"{name}  {len(files)} files, {size} bytes")
+    elif command == "prune":
+        generations, chunks = prune()
+        print(f"Removed {generations} generations and {chunks} unused chunks.")
+    else:
+        if len(argv) < 2 or argv[1] not in list_generations():
+            print("Unknown generation, see `python backup.py list`.")
+            return 1
+        for path in restore(argv[1], argv[2] if len(argv) > 2 else None):
+            print(f"Restored {path}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,666 @@
+import sys
+import time
+import random
+import uuid
+import shutil
+import tempfile
+import datetime
+import argparse
+import threading
+import data_handler
+from storage import FileStorage
+
+USERS = 20
+CURRENCIES = ["USD", "EUR", "EGP", "GBP", "JPY"]
+CATEGORIES = ["Food", "Transport", "Bills", "Shopping", "Other"]
+
+def make_transactions(rows, users=USERS, seed=42):
+    """Generate rows of random transactions spread over users"""
+    rng = random.Random(seed)
+    start = datetime.date(2015, 1, 1).toordinal()
+    transactions = []
+    for _ in range(rows):
+        transactions.append({
+            "id": str(uuid.UUID(int=rng.getrandbits(128))),
+            "username": f"user{rng.randrange(users)}",
+            "amount": round(rng.uniform(1, 500), 2),
+            "currency": rng.choice(CURRENCIES),
+            "category": rng.choice(CATEGORIES),
+            "date": datetime.date.fromordinal(start + rng.randrange(3650)).isoformat(),
+            "description": f"Purchase {rng.randrange(1000)}",
+            "type": "income" if rng.random() < 0.2 else "expense",
+            "payment": rng.choice(["cash", "credit card"]),
+        })
+    return transactions
+
+def best_of(fn, repeat=5):
+    """Best wall time of repeat runs, in milliseconds"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+class TempData:
+    """Point data_handler at a throw-away CSV/JSON data directory"""
+
+    def __init__(self, transactions=()):
+        self.transactions = transactions
+
+    def __enter__(self):
+        self.dir = tempfile.mkdtemp(prefix="spendlify-bench-")
+        path = lambda name: f"{self.dir}/{name}"
+        self.engine = FileStorage(path("users.json"), path("transactions.csv"),
+                                  path("goals.json"), path("reminders.json"))
+        data_handler.set_engine(self.engine)
+        if self.transactions:
+            data_handler.save_transactions(self.transactions)
+        data_handler.clear_cache()
+        return self
+
+    def __exit__(self, *exc):
+        data_handler.set_engine(data_handler.STORAGE_ENGINE)
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+def report(title, results):
+    print(f"\n{title}")
+    print("-" * 60)
+    for name, value, unit in results:
+        print(f"{name:<45} {value:>10.2f} {unit}")
+
+# ==================== BENCHMARKS ====================
+
+# The summary helpers as they were before the single aggregation pass,
+# kept here as the baseline for bench_summary
+
+def _amount(t):
+    try:
+        return float(t.get('amount', 0.0))
+    except (TypeError, ValueError):
+        return 0.0
+
+def _old_user_summary(user_transactions):
+    summary = {}
+    for t in user_transactions:
+        cur = t.get('currency', 'USD')
+        amt = _amount(t)
+        if cur not in summary:
+            summary[cur] = {'income': 0.0, 'expense': 0.0, 'net': 0.0}
+        if t.get('type', '').lower() == 'income':
+            summary[cur]['income'] += amt
+            summary[cur]['net'] += amt
+        else:
+            summary[cur]['expense'] += amt
+            summary[cur]['net'] -= amt
+    return summary
+
+def _old_top_categories(user_transactions, currency="USD", top_n=5):
+    expenses = [t for t in user_transactions if t.get('type', '').lower() == 'expense' and (currency is None or t.get('currency') == currency)]
+    totals = {}
+    total_expense = 0.0
+    for t in expenses:
+        cat = t.get('category', 'Other')
+        amt = _amount(t)
+        totals[cat] = totals.get(cat, 0.0) + amt
+        total_expense += amt
+    sorted_cats = sorted(totals.items(), key=lambda x: x[1], reverse=True)
+    return [(cat, amt, (amt / total_expense * 100) if total_expense > 0 else 0.0)
+            for cat, amt in sorted_cats[:top_n]]
+
+def _old_category_breakdown(user_transactions, currency="USD"):
+    expenses = [t for t in user_transactions if t.get('type', '').lower() == 'expense' and (currency is None or t.get('currency') == currency)]
+    breakdown = {}
+    for t in expenses:
+        cat = t.get('category', 'Other')
+        breakdown[cat] = breakdown.get(cat, 0.0) + _amount(t)
+    return breakdown
+
+def bench_summary(rows):
+    """Dashboard summary: three separate scans vs the rollup-backed summary.
+
+    With a cold cache loading the rows dominates both sides, so the gain is
+    the two loads saved; once the rollups are cached (every request after
+    the first, since writes update them in place) no rows are read at all.
+    """
+    import transactions as tx
+
+    with TempData(make_transactions(rows)):
+        def separate():
+            # What /api/summary used to do: every helper reloads and rescans
+            for fn in (_old_user_summary, _old_top_categories, _old_category_breakdown):
+                data_handler.clear_cache()
+                fn(data_handler.load_user_transactions("user0"))
+
+        def single_pass():
+            data_handler.clear_cache()
+            tx.get_dashboard_summary("user0", "USD", 5)
+
+        def cached():
+            tx.get_dashboard_summary("user0", "USD", 5)
+
+        before = best_of(separate)
+        after = best_of(single_pass)
+        cached()
+        warm = best_of(cached)
+        report(f"Dashboard summary, {rows} rows", [
+            ("reload + scan per helper", before, "ms"),
+            ("one load + one aggregation pass", after, "ms"),
+            ("cached rollups", warm, "ms"),
+            ("speed-up, cold cache", before / after, "x"),
+            ("speed-up, cached rollups", before / warm, "x"),
+        ])
+
+def bench_search(rows):
+    """Search: chained list filters vs the query engine on the columnar table"""
+    import search
+
+    query = dict(start_date="2017-01-01", end_date="2018-12-31", category="food",
+                 min_amount=50, max_amount=250)
+    with TempData(make_transactions(rows)):
+        def chained():
+            # The old search_transactions: filter the full list, strptime per row
+            txs = data_handler.load_user_transactions("user0")
+            txs = search.search_by_date_range(txs, query["start_date"], query["end_date"])
+            txs = search.filter_by_category(txs, query["category"])
+            txs = search.filter_by_amount_range(txs, query["min_amount"], query["max_amount"])
+            search.sort_transactions(txs, "date")
+
+        def indexed():
+            search.search_transactions("user0", **query)
+
+        indexed()  # build the table once, as the cached view would be
+        before = best_of(chained)
+        after = best_of(indexed)
+        report(f"Search, {rows} rows", [
+            ("chained filters", before, "ms"),
+            ("query engine on the table", after, "ms"),
+            ("speed-up", before / after, "x"),
+        ])
+
+def bench_table(rows):
+    """Columnar TransactionTable vs dict rows: memory, summary and filter+sort"""
+    import tracemalloc
+    import transactions as tx
+
+    def measure(build):
+        # Memory still held by the result once build() has returned
+        tracemalloc.start()
+        value = build()
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        return value, size / 1024 / 1024
+
+    with TempData(make_transactions(rows)) as data:
+        load = lambda: data.engine.load("transactions")
+        dict_rows, dict_mb = measure(load)
+        table, table_mb = measure(lambda: data_handler.TransactionTable(load()))
+
+    start, end = datetime.date(2017, 1, 1), datetime.date(2018, 12, 31)
+    def dict_filter_sort():
+        out = [t for t in dict_rows if t["category"] == "Food" and t["type"] == "expense"
+               and start.isoformat() <= t["date"] <= end.isoformat()]
+        out.sort(key=lambda t: t["amount"], reverse=True)
+
+    def table_filter_sort():
+        table.filter(category="Food", type="expense", start=start, end=end).argsort("amount", True)
+
+    before = best_of(lambda: tx.summarize_transactions(dict_rows))
+    after = best_of(lambda: tx.summarize_transactions(table))
+    filter_before = best_of(dict_filter_sort)
+    filter_after = best_of(table_filter_sort)
+    backend = "numpy" if data_handler.np is not None else "array module"
+    report(f"Columnar table ({backend}), {rows} rows", [
+        ("dict rows memory", dict_mb, "MB"),
+        ("table memory", table_mb, "MB"),
+        ("summary over dict rows", before, "ms"),
+        ("summary over table", after, "ms"),
+        ("summary speed-up", before / after, "x"),
+        ("filter + sort dict rows", filter_before, "ms"),
+        ("filter + sort table", filter_after, "ms"),
+        ("filter + sort speed-up", filter_before / filter_after, "x"),
+    ])
+
+def bench_loader(rows):
+    """Transactions loading: DictReader vs tuned row reader vs column readers vs binary snapshot"""
+    import csv
+    import storage
+
+    def dict_reader(path):
+        # The loader FileStorage used before the tuned reader
+        transactions = []
+        with open(path, mode="r", newline='', encoding="utf-8") as file:
+            for row in csv.DictReader(file):
+                row.setdefault("payment", "cash")
+                row["amount"] = float(row["amount"]) if row["amount"] else 0.0
+                transactions.append(row)
+        return transactions
+
+    def row_reader(path):
+        with open(path, mode="r", newline='', encoding="utf-8") as file:
+            return list(data.engine._iter_csv(file))
+
+    def pure_columns(path):
+        arrow, storage.pa_csv = storage.pa_csv, None
+        try:
+            return storage.read_csv_columns(path)
+        finally:
+            storage.pa_csv = arrow
+
+    with TempData(make_transactions(rows)) as data:
+        path = data.engine.files["transactions"]
+        repeat = 3 if rows >= 1000000 else 5
+        results = [
+            ("csv.DictReader rows", best_of(lambda: dict_reader(path), repeat), "ms"),
+            ("tuned csv.reader rows", best_of(lambda: row_reader(path), repeat), "ms"),
+            ("csv.reader columns", best_of(lambda: pure_columns(path), repeat), "ms"),
+        ]
+        if storage.pa_csv is not None:
+            results.append(("pyarrow rows (FileStorage loads)", best_of(lambda: storage.read_csv_rows(path), repeat), "ms"))
+            results.append(("pyarrow columns", best_of(lambda: storage.read_csv_columns(path), repeat), "ms"))
+        results.append(("columns -> TransactionTable",
+                        best_of(lambda: data_handler.TransactionTable.from_csv(path), repeat), "ms"))
+
+        snapshot = path + ".snap"
+        storage.write_binary_snapshot(data.engine._load_csv(path), snapshot)
+        results.append(("binary snapshot rows",
+                        best_of(lambda: storage.read_binary_snapshot(snapshot), repeat), "ms"))
+        results.append(("binary snapshot -> TransactionTable",
+                        best_of(lambda: data_handler.TransactionTable.from_snapshot(snapshot), repeat), "ms"))
+        report(f"Loading transactions.csv, {rows} rows", results)
+
+def bench_context(rows):
+    """AI prompt context: budgeted build per question, with index retrieval"""
+    import context_builder
+
+    user = {"username": "user0", "name": "User 0", "currency": "USD"}
+    questions = ["How much did I spend on food in March 2019?",
+                 "What were my bills last month?",
+                 "Am I saving enough?"]
+    with TempData(make_transactions(rows)):
+        def cold():
+            data_handler.clear_cache()
+            context_builder._history.clear()
+            context_builder.build_context(questions[0], user)
+
+        def warm():
+            for question in questions:
+                context_builder.build_context(question, user)
+
+        build = best_of(cold)
+        per_question = best_of(warm, repeat=20) / len(questions)
+        text = context_builder.build_context(questions[0], user)
+        report(f"AI prompt context, {rows} rows", [
+            ("cold build (load + indexes + views)", build, "ms"),
+            ("warm build per question", per_question, "ms"),
+            ("context size", context_builder.measure(text, "tokens"), "tokens"),
+            ("budget", context_builder.CONTEXT_BUDGET, context_builder.CONTEXT_UNIT),
+        ])
+
+def bench_login(rows, logins=500):
+    """Web login: patched CLI login_user vs auth.authenticate, over rows accounts"""
+    import io
+    import json
+    import hashlib
+    import getpass
+    import builtins
+    import auth
+    import passwords
+    from concurrent.futures import ThreadPoolExecutor
+
+    # Legacy hashes keep the KDF out of the numbers, this is about the path around it
+    users = {f"user{i}": {"user_id": str(i), "full_name": f"User {i}", "currency": "USD",
+                          "password_hash": hashlib.sha256(f"Password{i}!".encode()).hexdigest()}
+             for i in range(rows)}
+    rng = random.Random(7)
+    burst = [rng.randrange(rows) for _ in range(logins)]
+    with TempData() as data:
+        data_handler.save_users(users)
+        session_file = f"{data.dir}/session.json"
+        patch_lock = threading.Lock()
+
+        def old_login(i):
+            # What /login did: patch input/getpass/stdout process-wide (so only
+            # one login at a time), load every user, write the session file
+            with patch_lock:
+                inputs = iter([f"user{i}", f"Password{i}!"])
+                old_input, old_getpass, old_stdout = builtins.input, getpass.getpass, sys.stdout
+                builtins.input = lambda _: next(inputs)
+                getpass.getpass = lambda _: next(inputs)
+                sys.stdout = io.StringIO()
+                try:
+                    all_users = data_handler.load_users()
+                    username = input("Username: ").strip()
+                    password = getpass.getpass("Password: ")
+                    ok = all_users[username]["password_hash"] == hashlib.sha256(password.encode()).hexdigest()
+                    with open(session_file, "w") as f:
+                        json.dump({"current_user": username}, f)
+                finally:
+                    builtins.input, getpass.getpass, sys.stdout = old_input, old_getpass, old_stdout
+            return ok
+
+        def new_login(i):
+            return auth.authenticate(f"user{i}", f"Password{i}!") is not None
+
+        def burst_of(login):
+            def run():
+                passwords.clear_verify_cache()
+                with ThreadPoolExecutor(max_workers=8) as pool:
+                    if not all(pool.map(login, burst)):
+                        raise SystemExit("a correct password was rejected")
+            return run
+
+        data_handler.get_user("user0")  # warm the users cache for both
+        before = best_of(burst_of(old_login), repeat=3)
+        after = best_of(burst_of(new_login), repeat=3)
+        report(f"Login, {logins} logins on 8 threads, {rows} accounts", [
+            ("patched login_user", logins / before * 1000, "/s"),
+            ("auth.authenticate", logins / after * 1000, "/s"),
+            ("speed-up", before / after, "x"),
+        ])
+
+def bench_users(rows, registrations=200):
+    """User directory: whole-file users.json rewrite vs appended records"""
+    import json
+    from storage import _write_json
+
+    users = {f"user{i}": {"user_id": str(uuid.UUID(int=i)), "full_name": f"User {i}",
+                          "password_hash": "x" * 64, "currency": "USD"} for i in range(rows)}
+    with TempData() as data:
+        data_handler.save_users(users)
+        path = f"{data.dir}/users.json"
+
+        def rewrite():
+            # What put_user did: load users.json, add the record, rewrite it
+            for i in range(registrations):
+                with open(path) as f:
+                    current = json.load(f)
+                current[f"new{i}"] = users["user0"]
+                _write_json(current, path)
+        before = best_of(rewrite, repeat=1) / registrations
+        data_handler.save_users(users)
+
+        def append():
+            for i in range(registrations):
+                data_handler.save_user(f"new{i}", users["user0"])
+        data_handler.get_user("user0")
+        after = best_of(append, repeat=1) / registrations
+
+        # Another process registers one user; this one only replays the log tail
+        other = FileStorage(path, None, f"{data.dir}/goals.json", f"{data.dir}/reminders.json")
+        def catch_up():
+            other.put_user("outsider", users["user1"])
+            data_handler.get_user("outsider")
+        refresh = best_of(catch_up)
+
+        wanted = str(uuid.UUID(int=rows - 1))
+        scan = best_of(lambda: next(u for u, r in data_handler.load_users().items()
+                                    if r["user_id"] == wanted))
+        data_handler.get_user_by_id(wanted)
+        indexed = best_of(lambda: data_handler.get_user_by_id(wanted), repeat=50)
+        report(f"User directory, {rows} accounts", [
+            ("register, rewrite users.json", before, "ms"),
+            ("register, append to users.log", after, "ms"),
+            ("read after another process registers", refresh, "ms"),
+            ("find by user_id, scan", scan, "ms"),
+            ("find by user_id, index", indexed, "ms"),
+        ])
+
+def bench_digest(rows):
+    """AI context digest: cold build vs cached vs rebuild after one insert"""
+    import digest
+
+    transactions = make_transactions(rows)
+    with TempData(transactions):
+        def cold():
+            data_handler.clear_cache()
+            digest._digests.clear()
+            digest.get_digest("user0")
+
+        def after_insert():
+            row = dict(transactions[0], id=str(uuid.uuid4()), username="user0")
+            data_handler.add_transaction_record(row)
+            digest.get_digest("user0")
+
+        build = best_of(cold)
+        warm = best_of(lambda: digest.get_digest("user0"), repeat=50)
+        insert = best_of(after_insert)
+        report(f"AI context digest, {rows} rows", [
+            ("cold build (load + views + digest)", build, "ms"),
+            ("cached digest per question", warm, "ms"),
+            ("insert + incremental rebuild", insert, "ms"),
+            ("digest size", digest.estimate_tokens(digest.get_digest("user0")), "tokens"),
+        ])
+
+# ==================== STRESS TEST ====================
+# Several processes hammer one data directory the way gunicorn workers
+# would: appends, JSON inserts and a read-modify-write counter that every
+# worker increments under the per-user lock. Any lost update shows up as a
+# missing row or a short count.
+
+STRESS_USER = "stress"
+
+def _stress_engine(directory, engine):
+    if engine == "sharded":
+        from storage import ShardedFileStorage
+        return ShardedFileStorage(f"{directory}/users.json", f"{directory}/transactions/",
+                                  f"{directory}/goals.json", f"{directory}/reminders.json",
+                                  compact_threshold=16 * 1024)
+    return FileStorage(f"{directory}/users.json", f"{directory}/transactions.csv",
+                       f"{directory}/goals.json", f"{directory}/reminders.json",
+                       compact_threshold=16 * 1024)
+
+def _stress_worker(job):
+    directory, engine, worker, operations = job
+    data_handler.set_engine(_stress_engine(directory, engine))
+    data_handler.LOCKS_DIR = f"{directory}/locks/"
+    rng = random.Random(worker)
+    for i in range(operations):
+        op = rng.randrange(4)
+        if op == 0:
+            data_handler.add_transaction_record(dict(make_transactions(1, seed=worker * operations + i)[0],
+                                                     id=f"tx-{worker}-{i}", username=f"user{i % 4}"))
+        elif op == 1:
+            data_handler.add_reminder_record({"id": f"rem-{worker}-{i}", "username": STRESS_USER,
+                                              "title": "stress", "amount": 1.0, "deadline": "2030-01-01"})
+        elif op == 2:
+            data_handler.save_user(f"worker{worker}-{i}", {"full_name": "Stress Test"})
+        else:
+            with data_handler.user_lock(STRESS_USER):
+                goal = data_handler.load_user_goals(STRESS_USER)[0]
+                goal["current_amount"] += 1
+                data_handler.update_goal_record(goal)
+    counts = [0, 0, 0, 0]
+    rng = random.Random(worker)
+    for i in range(operations):
+        counts[rng.randrange(4)] += 1
+    return counts
+
+def stress_test(rows, workers=4):
+    """Concurrent writers from several processes must not lose updates"""
+    import multiprocessing
+    operations = max(rows // workers, 1)
+    for engine in ("csv", "sharded"):
+        directory = tempfile.mkdtemp(prefix="spendlify-stress-")
+        try:
+            data_handler.set_engine(_stress_engine(directory, engine))
+            data_handler.add_goal_record({"id": "counter", "username": STRESS_USER, "title": "counter",
+                                          "target_amount": 1e9, "current_amount": 0, "deadline": "2030-01-01",
+                                          "status": "active"})
+            jobs = [(directory, engine, w, operations) for w in range(workers)]
+            start = time.perf_counter()
+            with multiprocessing.get_context("spawn").Pool(workers) as pool:
+                counts = [sum(c) for c in zip(*pool.map(_stress_worker, jobs))]
+            elapsed = time.perf_counter() - start
+
+            data_handler.set_engine(_stress_engine(directory, engine))
+            transactions = len({t["id"] for t in data_handler.load_transactions()})
+            reminders = len(data_handler.load_user_reminders(STRESS_USER))
+            users = len(data_handler.load_users())
+            counter = int(data_handler.load_user_goals(STRESS_USER)[0]["current_amount"])
+            lost = (counts[0] - transactions) + (counts[1] - reminders) + (counts[2] - users) + (counts[3] - counter)
+            report(f"Stress test, {engine} engine, {workers} processes x {operations} writes", [
+                ("writes per second", sum(counts) / elapsed, "ops/s"),
+                ("transactions stored / written", transactions, f"/ {counts[0]}"),
+                ("reminders stored / written", reminders, f"/ {counts[1]}"),
+                ("users stored / written", users, f"/ {counts[2]}"),
+                ("counter value / increments", counter, f"/ {counts[3]}"),
+                ("lost updates", lost, ""),
+            ])
+            if lost:
+                raise SystemExit(f"Lost {lost} updates with the {engine} engine")
+        finally:
+            data_handler.set_engine(data_handler.STORAGE_ENGINE)
+            shutil.rmtree(directory, ignore_errors=True)
+
+# ==================== PASSWORD HASHING ====================
+
+def kdf_test(logins, target_ms=50.0):
+    """Calibrate scrypt for target_ms per hash, then time a burst of logins
+    verified on the hashing thread pool, without and with the login cache"""
+    import hashlib
+    import passwords
+    from concurrent.futures import ThreadPoolExecutor
+
+    results, n = passwords.calibrate(target_ms)
+    report(f"scrypt calibration, target {target_ms:.0f} ms per hash", [
+        (f"n={size} ({128 * size * passwords.SCRYPT_R >> 20} MiB)", ms, "ms")
+        for size, ms in results
+    ] + [("suggested SPENDLIFY_SCRYPT_N", n, "")])
+
+    hasher = passwords.ScryptHasher(n)
+    users = [f"Password{i}!" for i in range(max(logins // 4, 1))]
+    stored = {pw: hasher.hash(pw) for pw in users}
+    legacy = {pw: hashlib.sha256(pw.encode()).hexdigest() for pw in users}
+    burst = [users[i % len(users)] for i in range(logins)]
+
+    def run(hashes):
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=16) as requests:
+            ok = all(requests.map(lambda pw: passwords.verify_password(pw, hashes[pw]), burst))
+        if not ok:
+            raise SystemExit("a correct password failed to verify")
+        return (time.perf_counter() - start) * 1000
+
+    # A request thread stays responsive while the pool hashes
+    ticks = []
+    stop = threading.Event()
+    def ticker():
+        while not stop.is_set():
+            start = time.perf_counter()
+            time.sleep(0.001)
+            ticks.append((time.perf_counter() - start) * 1000)
+    passwords.clear_verify_cache()
+    thread = threading.Thread(target=ticker)
+    thread.start()
+    cold = run(stored)
+    stop.set()
+    thread.join()
+    cached = run(stored)
+    sha = run(legacy)
+    report(f"Login burst, {logins} logins, {len(users)} accounts, "
+           f"{passwords.HASH_THREADS} hashing threads", [
+        ("legacy sha256", sha, "ms"),
+        ("scrypt, first login per account", cold, "ms"),
+        ("scrypt, with the login cache warm", cached, "ms"),
+        ("scrypt logins per second (cold)", logins / cold * 1000, "/s"),
+        ("worst 1 ms sleep on another thread", max(ticks), "ms"),
+    ])
+
+# ==================== AI CHAT LOAD ====================
+
+def chat_load_test(questions, delay=0.5):
+    """Chat requests against a stub Gemini must return at once and leave the
+    dashboard API responsive while the answers are computed"""
+    import gemini_stub
+    import simple_gemini
+    import app as web
+
+    server = gemini_stub.serve(delay=delay)
+    simple_gemini.API_URL = (f"http://127.0.0.1:{server.server_address[1]}"
+                             f"/v1beta/models/{simple_gemini.MODEL}:generateContent")
+    jobs_dir = tempfile.mkdtemp(prefix="spendlify-jobs-")
+    simple_gemini.JOBS_DIR = jobs_dir
+    try:
+        with TempData(make_transactions(1000)):
+            client = web.app.test_client()
+            with client.session_transaction() as sess:
+                sess["username"] = "user0"
+
+            submitted = []
+            rejected = 0
+            post_times = []
+            start = time.perf_counter()
+            for i in range(questions):
+                t = time.perf_counter()
+                response = client.post("/api/ai/chat", json={"question": f"question {i}"})
+                post_times.append(time.perf_counter() - t)
+                if response.status_code == 202:
+                    submitted.append(response.get_json()["job_id"])
+                else:
+                    rejected += 1
+
+            summary_ms = best_of(lambda: client.get("/api/summary"), 3)
+            answered = 0
+            while answered < len(submitted):
+                answered = sum(client.get(f"/api/ai/chat/{job}").get_json()["status"] != "pending"
+                               for job in submitted)
+                time.sleep(0.05)
+            elapsed = time.perf_counter() - start
+
+        report(f"AI chat, {questions} questions, stub delay {delay}s, "
+               f"{simple_gemini.MAX_CONCURRENCY} concurrent calls", [
+            ("slowest POST /api/ai/chat", max(post_times) * 1000, "ms"),
+            ("GET /api/summary while chats run", summary_ms, "ms"),
+            ("all answers in", elapsed * 1000, "ms"),
+            ("blocking calls would take", len(submitted) * delay * 1000, "ms"),
+            ("rejected (over GEMINI_MAX_PENDING)", rejected, ""),
+        ])
+    finally:
+        server.shutdown()
+        shutil.rmtree(jobs_dir, ignore_errors=True)
+
+BENCHMARKS = {
+    "context": bench_context,
+    "digest": bench_digest,
+    "loader": bench_loader,
+    "login": bench_login,
+    "search": bench_search,
+    "summary": bench_summary,
+    "table": bench_table,
+    "users": bench_users,
+}
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Spendlify micro benchmarks")
+    parser.add_argument("name", choices=sorted(BENCHMARKS) + ["stress", "ai", "kdf", "all"])
+    parser.add_argument("--rows", type=int, nargs="+", default=[100000],
+                        help="one or more data set sizes, e.g. --rows 10000 100000 1000000 "
+                             "(for stress: the total number of writes, for ai: the number of questions, "
+                             "for kdf: the number of logins)")
+    parser.add_argument("--workers", type=int, default=4,
+                        help="processes used by the stress test")
+    parser.add_argument("--target-ms", type=float, default=50.0,
+                        help="scrypt time per hash the kdf calibration aims for")
+    args = parser.parse_args(argv)
+
+    if args.name == "stress":
+        for rows in args.rows:
+            stress_test(rows, args.workers)
+        return 0
+    if args.name == "ai":
+        for rows in args.rows:
+            chat_load_test(rows)
+        return 0
+    if args.name == "kdf":
+        for rows in args.rows:
+            kdf_test(rows, args.target_ms)
+        return 0
+    names = sorted(BENCHMARKS) if args.name == "all" else [args.name]
+    for name in names:
+        for rows in args.rows:
+            BENCHMARKS[name](rows)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -1,13 +1,12 @@
 from datetime import datetime, date
 import datetime
 import uuid
-from data_handler import load_reminders, save_reminders
+from data_handler import load_user_reminders, add_reminder_record, update_reminder_record, delete_reminder_record
 
 # Function to add new reminder
 def add_reminder(username):
     """ Add a new reminder for a specific user """
     try:
-        reminders = load_reminders()
         while True:
             title = input("Enter reminder title: ")
             if title:
@@ -42,16 +41,15 @@ def add_reminder(username):
             "deadline": deadline
         }
         
-        reminders.append(reminder)
-        save_reminders(reminders)
+        add_reminder_record(reminder)
         print("Reminder saved successfully!")
     
     except Exception as e:
         print(f"Error adding new reminder: {e}")
     
-def get_user_reminders(username, reminders):
+def get_user_reminders(username):
     """Return list of reminders for a user or [] if none exist."""
-    user_reminders = [r for r in reminders if r["username"] == username]
+    user_reminders = load_user_reminders(username)
     if not user_reminders:
         print("🔔 No reminders found.")
         return []
@@ -61,8 +59,7 @@ def get_user_reminders(username, reminders):
 def view_reminders(username):
     """ Display all reminders belonging to a given user """
     try:
-        reminders = load_reminders()   
-        user_reminders = get_user_reminders(username, reminders)
+        user_reminders = get_user_reminders(username)
 
         if len(user_reminders) == 0:
             return
@@ -80,8 +77,7 @@ def view_reminders(username):
 def delete_reminder(username):
     """Delete a specific reminder for a user using its ID (short or full)."""
     try:
-        reminders = load_reminders()
-        user_reminders = get_user_reminders(username, reminders)
+        user_reminders = get_user_reminders(username)
         
         if not user_reminders:
             return
@@ -106,8 +102,7 @@ def delete_reminder(username):
         des = input(f"Are you sure you want to delete this reminder: {target['title']}? (y/n): ").lower()
         
         if des == 'y':
-            reminders.remove(target)
-            save_reminders(reminders)
+            delete_reminder_record(target)
             print("Reminder deleted successfully.")
         elif des == 'n':
             print("Skipping deleting reminder...")
@@ -120,8 +115,7 @@ def delete_reminder(username):
 # Function to check reminders due automatically
 def check_due_reminders(username):
     try:
-        reminders = load_reminders()
-        user_reminders = get_user_reminders(username, reminders)
+        user_reminders = get_user_reminders(username)
         
         if not user_reminders:
             return
@@ -147,8 +141,7 @@ def check_due_reminders(username):
 def edit_reminder(username):
     """Edit an existing reminder for the specified user"""
     try:
-        reminders = load_reminders()
-        user_reminders = [r for r in reminders if r["username"] == username]
+        user_reminders = load_user_reminders(username)
 
         if not user_reminders:
             print("No reminders found to edit")
@@ -195,7 +188,7 @@ def edit_reminder(username):
             except ValueError:
                 print("Invalid date format. Keeping old value")
 
-        save_reminders(reminders)
+        update_reminder_record(target_reminder)
         print(f"Reminder '{target_reminder['title']}' updated successfully!\n")
 
     except Exception as e:
@@ -0,0 +1,122 @@
+import bisect
+import datetime
+from data_handler import register_view, get_view
+
+# Chart series are sums over a per-user daily view: for every date with
+# transactions, the total per (currency, type, category). A sorted list of
+# the dates lets a window be cut out with two bisects, so building a chart
+# costs O(days in window x categories) instead of a scan of the history.
+
+INTERVALS = ("day", "week", "month")
+
+def _amount(t):
+    try:
+        return float(t.get('amount', 0.0))
+    except (TypeError, ValueError):
+        return 0.0
+
+def _day_key(t):
+    return (t.get('currency', 'USD'), t.get('type', '').lower(), t.get('category', 'Other'))
+
+def _add(state, t, sign):
+    day = str(t.get('date', ''))
+    cells = state['days'].get(day)
+    if cells is None:
+        cells = state['days'][day] = {}
+        bisect.insort(state['dates'], day)
+    key = _day_key(t)
+    cell = cells.get(key)
+    if cell is None:
+        cell = cells[key] = [0.0, 0]
+    cell[0] += sign * _amount(t)
+    cell[1] += sign
+    if cell[1] <= 0:
+        del cells[key]
+        if not cells:
+            del state['days'][day]
+            del state['dates'][bisect.bisect_left(state['dates'], day)]
+
+def build_daily(transactions):
+    """Build the daily totals view from scratch"""
+    state = {'dates': [], 'days': {}}
+    for t in transactions:
+        _add(state, t, 1)
+    return state
+
+def apply_delta(state, old, new):
+    """Move one changed transaction between days"""
+    if old is not None:
+        _add(state, old, -1)
+    if new is not None:
+        _add(state, new, 1)
+
+register_view("daily_totals", build_daily, apply_delta)
+
+def parse_day(value):
+    """Validate an optional YYYY-MM-DD window bound"""
+    if not value:
+        return None
+    try:
+        return datetime.datetime.strptime(value, "%Y-%m-%d").date().isoformat()
+    except ValueError:
+        raise ValueError(f"Invalid date '{value}', expected YYYY-MM-DD")
+
+def _window(username, start=None, end=None):
+    """Yield (date, cells) for the days between start and end inclusive"""
+    state = get_view("daily_totals", username)
+    dates = state['dates']
+    lo = bisect.bisect_left(dates, start) if start else 0
+    hi = bisect.bisect_right(dates, end) if end else len(dates)
+    for day in dates[lo:hi]:
+        yield day, state['days'][day]
+
+def _bucket(day, interval):
+    if interval == "month":
+        return day[:7]
+    if interval == "week":
+        try:
+            date = datetime.date.fromisoformat(day)
+        except ValueError:
+            return day
+        return (date - datetime.timedelta(days=date.weekday())).isoformat()
+    return day
+
+def category_totals(username, start=None, end=None, currency=None):
+    """Expense totals per category, largest first, as [{category, total, count}]"""
+    totals = {}
+    for day, cells in _window(username, start, end):
+        for (cur, typ, cat), (amount, count) in cells.items():
+            if typ != 'expense' or (currency and cur != currency):
+                continue
+            entry = totals.setdefault(cat, [0.0, 0])
+            entry[0] += amount
+            entry[1] += count
+    return [{'category': cat, 'total': total, 'count': count}
+            for cat, (total, count) in sorted(totals.items(), key=lambda kv: -kv[1][0])]
+
+def trend(username, interval="month", start=None, end=None, currency=None):
+    """Income and expense per day, week (starting Monday) or month.
+
+    Returns {'labels': [...], 'income': [...], 'expense': [...]} with one
+    entry per bucket that has transactions, in date order.
+    """
+    if interval not in INTERVALS:
+        raise ValueError(f"interval must be one of {', '.join(INTERVALS)}")
+    buckets = {}
+    labels = []
+    for day, cells in _window(username, start, end):
+        label = _bucket(day, interval)
+        bucket = buckets.get(label)
+        if bucket is None:
+            bucket = buckets[label] = [0.0, 0.0]
+            labels.append(label)
+        for (cur, typ, cat), (amount, count) in cells.items():
+            if currency and cur != currency:
+                continue
+            bucket[0 if typ == 'income' else 1] += amount
+    # Days arrive sorted, so the buckets do too
+    return {
+        'labels': labels,
+        'income': [buckets[label][0] for label in labels],
+        'expense': [buckets[label][1] for label in labels],
+    }
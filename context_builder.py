@@ -0,0 +1,321 @@
+import os
+import re
+import datetime
+import threading
+import rollups
+from data_handler import get_engine
+from digest import get_digest
+from search import get_query_engine
+
+# Assembles the context sent to Gemini with a question, in priority order:
+# the user profile, the transactions the question is about (found through
+# the search query engine from a category or date mentioned in it), the
+# financial digest, and a summary of the whole history that gets coarser
+# with age (last months by category, then months, then years). Lines are
+# collected in a list and joined once, and each section only gets the
+# lines that still fit in the budget.
+
+# Size limit of the context, counted in CONTEXT_UNIT ("tokens" or "bytes")
+CONTEXT_BUDGET = int(os.getenv("SPENDLIFY_CONTEXT_BUDGET", 1000))
+CONTEXT_UNIT = os.getenv("SPENDLIFY_CONTEXT_UNIT", "tokens")
+UNITS = ("tokens", "bytes")
+# Rough size of a token in characters, as in digest.estimate_tokens
+CHARS_PER_TOKEN = 4
+
+# Matching transactions listed one by one, newest first
+RELEVANT_ROWS = 15
+# History levels: months broken down by category, then months, then years
+CATEGORY_MONTHS = 3
+DETAIL_MONTHS = 12
+
+def measure(text, unit=CONTEXT_UNIT):
+    """Size of text in the budget unit"""
+    if unit == "bytes":
+        return len(text.encode("utf-8"))
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+class ContextBuilder:
+    """Collects context lines until the budget is spent"""
+
+    def __init__(self, budget=CONTEXT_BUDGET, unit=CONTEXT_UNIT):
+        if unit not in UNITS:
+            raise ValueError(f"unit must be one of {', '.join(UNITS)}")
+        self.budget = budget
+        self.unit = unit
+        self.used = 0
+        self.lines = []
+        self._seen = set()
+
+    def cost(self, line):
+        # The newline joining it to the next line is counted too
+        return measure(line + "\n", self.unit)
+
+    def add(self, line):
+        """Append line if it fits, returns whether it did"""
+        cost = self.cost(line)
+        if self.used + cost > self.budget:
+            return False
+        self.lines.append(line)
+        self._seen.add(line)
+        self.used += cost
+        return True
+
+    def section(self, title, lines):
+        """Append a titled section with as many of its lines as fit, skipping
+        lines an earlier section already has; the title is left out when no
+        line is added. Returns the number of lines added."""
+        added = []
+        used = self.used + self.cost(title)
+        for line in lines:
+            if line in self._seen:
+                continue
+            cost = self.cost(line)
+            if used + cost > self.budget:
+                break
+            added.append(line)
+            used += cost
+        if added:
+            self.lines.append(title)
+            self.lines.extend(added)
+            self._seen.update(added)
+            self.used = used
+        return len(added)
+
+    def text(self):
+        return "\n".join(self.lines)
+
+# ==================== RETRIEVAL ====================
+
+MONTH_NAMES = {name: i + 1 for i, name in enumerate([
+    "january", "february", "march", "april", "may", "june", "july",
+    "august", "september", "october", "november", "december",
+])}
+MONTH_NAMES.update({name[:3]: number for name, number in list(MONTH_NAMES.items())})
+MONTH_NAMES["sept"] = 9
+
+_ISO_DAY = re.compile(r"\b(\d{4})-(\d{2})-(\d{2})\b")
+_ISO_MONTH = re.compile(r"\b(\d{4})-(\d{2})\b")
+_MONTH = re.compile(r"\b(in |during |of |for )?([a-z]+)\.?(?: (\d{4}))?\b")
+_YEAR = re.compile(r"\b((?:19|20)\d{2})\b")
+
+def _month_range(year, month):
+    start = datetime.date(year, month, 1)
+    end = datetime.date(year + month // 12, month % 12 + 1, 1) - datetime.timedelta(days=1)
+    return start, end
+
+def question_dates(question, today=None):
+    """(start, end) dates a question refers to, or (None, None)"""
+    today = today or datetime.date.today()
+    text = " ".join(question.lower().split())
+    try:
+        m = _ISO_DAY.search(text)
+        if m:
+            day = datetime.date(int(m.group(1)), int(m.group(2)), int(m.group(3)))
+            return day, day
+        m = _ISO_MONTH.search(text)
+        if m:
+            return _month_range(int(m.group(1)), int(m.group(2)))
+    except ValueError:
+        pass
+
+    if "yesterday" in text:
+        day = today - datetime.timedelta(days=1)
+        return day, day
+    if "today" in text:
+        return today, today
+    if "last week" in text:
+        start = today - datetime.timedelta(days=today.weekday() + 7)
+        return start, start + datetime.timedelta(days=6)
+    if "this week" in text:
+        return today - datetime.timedelta(days=today.weekday()), today
+    if "last month" in text:
+        return _month_range(*((today.year, today.month - 1) if today.month > 1 else (today.year - 1, 12)))
+    if "this month" in text:
+        return _month_range(today.year, today.month)
+    if "last year" in text:
+        return datetime.date(today.year - 1, 1, 1), datetime.date(today.year - 1, 12, 31)
+    if "this year" in text:
+        return datetime.date(today.year, 1, 1), today
+
+    for m in _MONTH.finditer(text):
+        month = MONTH_NAMES.get(m.group(2))
+        # "may" is only a month with a year or a preposition in front
+        if month is None or (m.group(2) == "may" and not (m.group(1) or m.group(3))):
+            continue
+        if m.group(3):
+            year = int(m.group(3))
+        else:
+            # The latest such month that is not in the future
+            year = today.year if month <= today.month else today.year - 1
+        return _month_range(year, month)
+
+    m = _YEAR.search(text)
+    if m:
+        year = int(m.group(1))
+        return datetime.date(year, 1, 1), datetime.date(year, 12, 31)
+    return None, None
+
+def question_categories(question, categories):
+    """Categories (from the user's own) mentioned in a question"""
+    words = set(re.findall(r"[a-z]+", question.lower()))
+    text = " ".join(question.lower().split())
+    found = []
+    for category in sorted(categories):
+        if not category:
+            continue
+        if " " in category:
+            if category in text:
+                found.append(category)
+        elif category in words or category.rstrip("s") in words or category + "s" in words:
+            found.append(category)
+    return found
+
+def relevant_transactions(username, question, today=None):
+    """(filters, rows) for the transactions a question is about, newest
+    first; ({}, []) when it mentions no category or date"""
+    engine = get_query_engine(username)
+    start, end = question_dates(question, today)
+    categories = question_categories(question, engine.categories)
+    if start is None and not categories:
+        return {}, []
+    filters = {"start_date": start.isoformat() if start else None,
+               "end_date": end.isoformat() if end else None,
+               "categories": categories}
+    rows = []
+    for category in categories or [None]:
+        rows.extend(engine.query(filters["start_date"], filters["end_date"], category,
+                                 sort_by="date", reverse=True))
+    if len(categories) > 1:
+        rows.sort(key=lambda t: str(t.get("date", "")), reverse=True)
+    return filters, rows
+
+def _match_lines(filters, rows):
+    what = []
+    if filters["categories"]:
+        what.append(", ".join(filters["categories"]))
+    if filters["start_date"]:
+        span = filters["start_date"]
+        if filters["end_date"] != filters["start_date"]:
+            span += f" to {filters['end_date']}"
+        what.append(span)
+    totals = {}
+    for t in rows:
+        try:
+            amount = float(t.get("amount", 0.0))
+        except (TypeError, ValueError):
+            continue
+        key = (t.get("currency", "USD"), t.get("type", "").lower())
+        totals[key] = totals.get(key, 0.0) + amount
+    lines = [f"- {len(rows)} transactions for {' / '.join(what)}"]
+    lines.extend(f"- {typ or 'other'} total: {amount:.2f} {cur}"
+                 for (cur, typ), amount in sorted(totals.items()))
+    return lines
+
+def _row_line(t):
+    line = f"- {t.get('date', '')}: {t.get('amount', '')} {t.get('currency', '')} {t.get('type', '')}, {t.get('category', '')}"
+    description = str(t.get("description") or "").strip()
+    return f"{line} ({description})" if description else line
+
+# ==================== HISTORY SUMMARY ====================
+
+def _ago(month, today):
+    year, number = (int(part) for part in month.split("-"))
+    return (today.year - year) * 12 + today.month - number
+
+def history_levels(username, today=None):
+    """Summary lines of the whole history from the rollup cells, as three
+    levels: [years before the detailed months, months, last months by category]"""
+    today = today or datetime.date.today()
+    years = {}
+    months = {}
+    categories = {}
+    for (month, cur, typ, cat), (amount, count) in rollups.get_rollup(username).items():
+        try:
+            ago = _ago(month, today)
+        except ValueError:
+            continue
+        kind = "income" if typ == "income" else "expense"
+        if ago >= DETAIL_MONTHS:
+            entry = years.setdefault((month[:4], cur), {"income": 0.0, "expense": 0.0})
+        else:
+            entry = months.setdefault((month, cur), {"income": 0.0, "expense": 0.0})
+        entry[kind] += amount
+        if ago < CATEGORY_MONTHS and kind == "expense":
+            key = (month, cur, cat)
+            categories[key] = categories.get(key, 0.0) + amount
+
+    def totals(name, t):
+        return f"- {name}: income {t['income']:.2f}, expenses {t['expense']:.2f}"
+    # Newest month first, biggest category first within it
+    spent = sorted(categories.items(), key=lambda item: -item[1])
+    spent.sort(key=lambda item: item[0][0], reverse=True)
+    return [
+        [totals(f"{year} {cur}", t) for (year, cur), t in sorted(years.items(), reverse=True)],
+        [totals(f"{month} {cur}", t) for (month, cur), t in sorted(months.items(), reverse=True)],
+        [f"- {month} {cur} {cat}: {amount:.2f}" for (month, cur, cat), amount in spent],
+    ]
+
+_history = {}
+_history_lock = threading.Lock()
+
+def get_history_levels(username, today=None):
+    """history_levels, cached until the user's transactions or the day change"""
+    today = today or datetime.date.today()
+    key = (get_engine().fingerprint("transactions", username), today)
+    with _history_lock:
+        entry = _history.get(username)
+        if entry is not None and entry[0] == key:
+            return entry[1]
+    levels = history_levels(username, today)
+    with _history_lock:
+        _history[username] = (key, levels)
+    return levels
+
+# ==================== ASSEMBLY ====================
+
+def _digest_sections(text):
+    sections = []
+    for line in text.splitlines():
+        if line.startswith("- ") and sections:
+            sections[-1][1].append(line)
+        else:
+            sections.append((line, []))
+    return sections
+
+def build_context(question, current_user, budget=CONTEXT_BUDGET, unit=CONTEXT_UNIT, today=None):
+    """The context for a question, at most budget tokens or bytes"""
+    today = today or datetime.date.today()
+    username = current_user["username"]
+    builder = ContextBuilder(budget, unit)
+    builder.add(f"Current date: {today.strftime('%B %d, %Y')}")
+    profile = f"User: {username}"
+    if current_user.get("name") and current_user["name"] != username:
+        profile += f" ({current_user['name']})"
+    if current_user.get("currency"):
+        profile += f", preferred currency {current_user['currency']}"
+    builder.add(profile)
+
+    filters, rows = relevant_transactions(username, question, today)
+    if filters:
+        builder.section("Transactions matching the question:", _match_lines(filters, rows))
+        builder.section("Matching transactions, newest first:",
+                        [_row_line(t) for t in rows[:RELEVANT_ROWS]])
+
+    for title, lines in _digest_sections(get_digest(username)):
+        builder.section(title, lines)
+
+    years, months, categories = get_history_levels(username, today)
+    builder.section("History by year:", years)
+    builder.section("History by month:", months)
+    builder.section("Spending by category, last months:", categories)
+    return builder.text()
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) < 3:
+        print("usage: python context_builder.py <username> <question>")
+        sys.exit(2)
+    text = build_context(" ".join(sys.argv[2:]), {"username": sys.argv[1]})
+    print(text)
+    print(f"\n{measure(text, 'tokens')} tokens, {measure(text, 'bytes')} bytes")
@@ -1,98 +1,760 @@
 import os
-import json
 import csv
-import shutil
+import math
+import datetime
+import threading
+from array import array
+from storage import (
+    BinarySnapshot,
+    FileStorage,
+    ShardedFileStorage,
+    SqliteStorage,
+    TRANSACTION_FIELDS,
+    content_hash,
+    file_lock,
+    read_csv_columns,
+    shard_name,
+)
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 USERS_FILE = "data/users.json"
+USERS_LOG = "data/users.log"
 TRANSACTION_FILE = 'data/transactions.csv'
+TRANSACTION_LOG = "data/transactions.log"
+# Binary copy of TRANSACTION_FILE, used once created with `migrate.py snapshot`
+TRANSACTION_SNAPSHOT = "data/transactions.snap"
+TRANSACTION_SHARDS = "data/transactions/"
 BACKUP = "data/backup/"
 GOALS_FILE = "data/goals.json"
 REMINDERS_FILE = "data/reminders.json"
+DATABASE_FILE = "data/spendlify.db"
+# Lock files serializing each user's read-modify-write requests
+LOCKS_DIR = "data/locks/"
+
+# "csv" keeps the original CSV/JSON files, "sharded" keeps one transactions
+# file per user in TRANSACTION_SHARDS and "sqlite" uses DATABASE_FILE
+STORAGE_ENGINE = os.getenv("SPENDLIFY_STORAGE", "csv")
+# Size in bytes at which TRANSACTION_LOG is folded back into TRANSACTION_FILE
+LOG_COMPACT_BYTES = int(os.getenv("SPENDLIFY_LOG_COMPACT_BYTES", 1024 * 1024))
+
+_engine = None
+
+def create_engine(name):
+    """Build a storage engine by name"""
+    if name == "csv":
+        return FileStorage(USERS_FILE, TRANSACTION_FILE, GOALS_FILE, REMINDERS_FILE,
+                           TRANSACTION_LOG, LOG_COMPACT_BYTES, TRANSACTION_SNAPSHOT, USERS_LOG)
+    if name == "sharded":
+        return ShardedFileStorage(USERS_FILE, TRANSACTION_SHARDS, GOALS_FILE, REMINDERS_FILE,
+                                  LOG_COMPACT_BYTES, USERS_LOG)
+    if name == "sqlite":
+        return SqliteStorage(DATABASE_FILE)
+    raise ValueError(f"Unknown storage engine: {name}")
+
+def get_engine():
+    """Return the storage engine used by all load_/save_ functions"""
+    global _engine
+    if _engine is None:
+        _engine = create_engine(STORAGE_ENGINE)
+    return _engine
+
+def set_engine(engine):
+    """Switch storage engine, either by name or with an engine instance"""
+    global _engine
+    _engine = create_engine(engine) if isinstance(engine, str) else engine
+    clear_cache()
+
+def user_lock(username):
+    """Lock serializing one user's read-modify-write operations across the
+    threads and processes (e.g. gunicorn workers) of the app"""
+    return file_lock(os.path.join(LOCKS_DIR, shard_name(username)))
+
+# ==================== CACHE ====================
+# Parsed data sets are kept in memory, keyed by (dataset, username), together
+# with the storage fingerprint (file mtime and size) they were read from. A
+# read whose fingerprint still matches is served from memory; every write
+# through this module updates the cached copy in place.
+
+_cache = {}
+_cache_stats = {"hits": 0, "misses": 0}
+_cache_lock = threading.RLock()
+
+def clear_cache():
+    """Drop every cached data set"""
+    global _user_ids
+    with _cache_lock:
+        _cache.clear()
+        _view_state.clear()
+        _user_ids = (None, {})
+
+def get_cache_stats():
+    """Return cache hit and miss counters"""
+    with _cache_lock:
+        return dict(_cache_stats, entries=len(_cache))
+
+def _copy(data):
+    if isinstance(data, dict):
+        return {k: dict(v) for k, v in data.items()}
+    return [dict(r) for r in data]
+
+def _cached(dataset, username=None):
+    """Return the cached data set, loading it from storage on a miss"""
+    engine = get_engine()
+    key = (dataset, username)
+    with _cache_lock:
+        fingerprint = engine.fingerprint(dataset, username)
+        entry = _cache.get(key)
+        if entry is not None and entry[0] == fingerprint:
+            _cache_stats["hits"] += 1
+            return entry[1]
+
+        if dataset == "users" and entry is not None and hasattr(engine, "user_changes"):
+            # Another process wrote users: replay just its appended records
+            found = engine.user_changes(entry[0])
+            if found is not None:
+                changes, fingerprint = found
+                for username, record in changes:
+                    _set_user(entry[1], username, record)
+                _cache_stats["hits"] += 1
+                _cache[key] = (fingerprint, entry[1])
+                return entry[1]
+
+        _cache_stats["misses"] += 1
+        if dataset == "users":
+            data = engine.load_users()
+        elif username is None:
+            data = engine.load(dataset)
+        elif dataset not in engine.partitioned:
+            # Same file as the whole data set, so filter the cached copy
+            data = [r for r in _cached(dataset) if r.get("username") == username]
+        else:
+            data = engine.load_for_user(dataset, username)
+        _cache[key] = (fingerprint, data)
+        return data
+
+def _write(dataset, usernames, write, apply, changes=()):
+    """Run a storage write and apply the same change to fresh cache entries.
+
+    changes lists (old_row, new_row) pairs that are fed to derived views.
+    """
+    engine = get_engine()
+    # The engine lock keeps other processes from writing between the
+    # fingerprints taken before and after this write
+    with _cache_lock, engine.lock(dataset, [u for u in usernames if u is not None]):
+        users = [None] + sorted(u for u in usernames if u is not None)
+        before = {u: engine.fingerprint(dataset, u) for u in users}
+        fresh = []
+        for u in users:
+            entry = _cache.pop((dataset, u), None)
+            if entry is not None and entry[0] == before[u]:
+                fresh.append((u, entry[1]))
+        views = []
+        if dataset == "transactions":
+            for name in _views:
+                for u in users[1:]:
+                    entry = _view_state.pop((name, u), None)
+                    if entry is not None and entry[0] == before[u]:
+                        views.append((name, u, entry[1]))
+
+        result = write()
+
+        after = {u: engine.fingerprint(dataset, u) for u in users}
+        for u, data in fresh:
+            # An unchanged fingerprint means the write failed or matched nothing
+            if after[u] != before[u]:
+                apply(data, u)
+            _cache[(dataset, u)] = (after[u], data)
+        for name, u, state in views:
+            if after[u] != before[u]:
+                view_apply = _views[name][1]
+                if view_apply is None:
+                    continue
+                for old, new in changes:
+                    old = old if old is not None and old.get("username") == u else None
+                    new = new if new is not None and new.get("username") == u else None
+                    if old is not None or new is not None:
+                        view_apply(state, old, new)
+            _view_state[(name, u)] = (after[u], state)
+        return result
+
+def _usernames(rows):
+    return {r.get("username") for r in rows}
+
+def _load(dataset, username=None):
+    return _copy(_cached(dataset, username))
+
+def _save(dataset, rows):
+    engine = get_engine()
+    with _cache_lock, engine.lock(dataset):
+        for key in [k for k in _cache if k[0] == dataset]:
+            del _cache[key]
+        if dataset == "transactions":
+            _view_state.clear()
+        engine.save(dataset, rows)
+        _cache[(dataset, None)] = (engine.fingerprint(dataset), _copy(rows))
+
+def _stored(dataset, row):
+    """The currently stored version of row, used as the old side of a change"""
+    if dataset != "transactions" or not _views:
+        return row
+    rows = _cached(dataset, row.get("username"))
+    return next((r for r in rows if r.get("id") == row["id"]), None)
+
+def _insert(dataset, rows):
+    rows = _copy(rows)
+
+    def apply(data, username):
+        data.extend(r for r in rows if username is None or r.get("username") == username)
+
+    _write(dataset, _usernames(rows), lambda: get_engine().insert_many(dataset, rows), apply,
+           [(None, r) for r in rows])
+
+def _update(dataset, row):
+    row = dict(row)
+
+    def apply(data, username):
+        for i, r in enumerate(data):
+            if r.get("id") == row["id"]:
+                data[i] = row
+                break
+
+    with _cache_lock:
+        old = _stored(dataset, row)
+        return _write(dataset, _usernames([row]), lambda: get_engine().update(dataset, row),
+                      apply, [(old, row)] if old is not None else [])
+
+def _delete(dataset, row):
+    def apply(data, username):
+        data[:] = [r for r in data if r.get("id") != row["id"]]
+
+    with _cache_lock:
+        old = _stored(dataset, row)
+        return _write(dataset, _usernames([row]), lambda: get_engine().delete(dataset, row),
+                      apply, [(old, None)] if old is not None else [])
+
+# ==================== DERIVED VIEWS ====================
+# Other modules register views computed from one user's transactions, such as
+# rollups or indexes. A view is built once from the cached rows and then kept
+# up to date with the (old, new) row deltas of every write made through this
+# module, so reading it does not rescan the user's history.
+
+_views = {}
+_view_state = {}
+
+def register_view(name, build, apply=None):
+    """Register a per-user view of the transactions data set.
+
+    build(rows) returns the view state. apply(state, old, new) updates the
+    state in place for one changed row, where old is None for inserts and new
+    is None for deletes. Views without apply are rebuilt after each write.
+    """
+    with _cache_lock:
+        _views[name] = (build, apply)
+        for key in [k for k in _view_state if k[0] == name]:
+            del _view_state[key]
+
+def get_view(name, username):
+    """Return the up to date view state for username"""
+    engine = get_engine()
+    with _cache_lock:
+        fingerprint = engine.fingerprint("transactions", username)
+        entry = _view_state.get((name, username))
+        if entry is not None and entry[0] == fingerprint:
+            return entry[1]
+        state = _views[name][0](_cached("transactions", username))
+        _view_state[(name, username)] = (fingerprint, state)
+        return state
+
+# ==================== DUPLICATE INDEX ====================
+# Content hashes (storage.content_hash) of every stored transaction, so an
+# import can tell in O(1) per row whether a statement line is already there.
+# The engines keep them in storage: SQLite in an indexed column, the file
+# engines in a HashIndex file next to each transactions log.
+
+def find_duplicates(username, transactions):
+    """Return the content hashes of transactions that username already has stored"""
+    hashes = {content_hash(t) for t in transactions}
+    if not hashes:
+        return set()
+    return get_engine().existing_hashes(username, hashes)
+
+# ==================== COLUMNAR TABLE ====================
+# A TransactionTable holds transactions column by column instead of as one
+# dict per row: amounts as float64, dates as int32 day ordinals and the
+# low-cardinality strings as small integer codes into a per-column
+# dictionary. Filters, sorts and summaries work on whole columns, with numpy
+# when it is installed and with the array module otherwise. Dict rows are
+# only built on demand for callers that need them.
+
+ENCODED_COLUMNS = ("username", "currency", "category", "type", "payment")
+
+if np is not None:
+    # Layout of storage.SNAPSHOT_RECORD
+    SNAPSHOT_DTYPE = np.dtype([(f, "<f8" if f == "amount" else "<u4") for f in TRANSACTION_FIELDS])
+
+def _column(typecode, values):
+    if np is not None:
+        return np.array(values, dtype=np.float64 if typecode == "d" else np.int32)
+    return array(typecode, values)
+
+def _day_ordinal(value):
+    # Parsed like search._parse_date, so filters agree with the row search
+    try:
+        return datetime.datetime.strptime(value, "%Y-%m-%d").toordinal()
+    except (TypeError, ValueError):
+        return 0
+
+def _exact_date(value, day):
+    # Whether row() can give value back from its ordinal alone
+    return bool(day) and datetime.date.fromordinal(day).isoformat() == value
+
+class _Dictionary:
+    """Dictionary encoding of one string column"""
+
+    def __init__(self, values=()):
+        self.values = []
+        self.codes = {}
+        for value in values:
+            self.encode(value)
+
+    def encode(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def matching(self, test):
+        """Codes of the values for which test(value) is true"""
+        return [code for code, value in enumerate(self.values) if test(value)]
+
+    def ranks(self):
+        """Position of every code in sorted (case-insensitive) value order;
+        values differing only in case share a rank, so they stay in row order"""
+        folded = [str(value).lower() for value in self.values]
+        positions = {key: rank for rank, key in enumerate(sorted(set(folded)))}
+        return [positions[key] for key in folded]
+
+class TransactionTable:
+    """Columnar, read-only set of transactions.
+
+    With keep_rows the table also keeps a reference to the rows it was built
+    from, and its row views are copies of those instead of being rebuilt
+    from the columns.
+    """
+
+    def __init__(self, rows=(), keep_rows=False):
+        rows = list(rows)
+        self.source = rows if keep_rows else None
+        self.dictionaries = {c: _Dictionary() for c in ENCODED_COLUMNS}
+        self.ids = []
+        self.descriptions = []
+        # Dates that are not canonical YYYY-MM-DD keep their original text, keyed by row
+        self.raw_dates = {}
+        amounts = []
+        days = []
+        ordinals = {}
+        codes = {c: [] for c in ENCODED_COLUMNS}
+        for i, t in enumerate(rows):
+            self.ids.append(t.get("id", ""))
+            self.descriptions.append(t.get("description", ""))
+            try:
+                amounts.append(float(t.get("amount", 0.0)))
+            except (TypeError, ValueError):
+                amounts.append(0.0)
+            date = t.get("date", "")
+            day = ordinals.get(date)
+            if day is None:
+                day = ordinals[date] = _day_ordinal(date)
+            if not _exact_date(date, day):
+                self.raw_dates[i] = date
+            days.append(day)
+            for c in ENCODED_COLUMNS:
+                codes[c].append(self.dictionaries[c].encode(t.get(c, "")))
+        self.amount = _column("d", amounts)
+        self.day = _column("i", days)
+        self.codes = {c: _column("i", v) for c, v in codes.items()}
+
+    @classmethod
+    def from_columns(cls, columns):
+        """Build a table from {field: list} columns, as read by storage.read_csv_columns.
+
+        Dates and the encoded columns are converted once per distinct value
+        rather than once per row.
+        """
+        table = cls.__new__(cls)
+        table.source = None
+        table.ids = list(columns["id"])
+        table.descriptions = list(columns["description"])
+        table.amount = _column("d", columns["amount"])
+
+        dates = columns["date"]
+        ordinals = {value: _day_ordinal(value) for value in dict.fromkeys(dates)}
+        table.day = _column("i", list(map(ordinals.__getitem__, dates)))
+        exact = {value: _exact_date(value, day) for value, day in ordinals.items()}
+        table.raw_dates = {}
+        if not all(exact.values()):
+            table.raw_dates = {i: d for i, d in enumerate(dates) if not exact[d]}
+
+        table.dictionaries = {}
+        table.codes = {}
+        for c in ENCODED_COLUMNS:
+            values = columns[c]
+            dictionary = _Dictionary(dict.fromkeys(values))
+            table.dictionaries[c] = dictionary
+            table.codes[c] = _column("i", list(map(dictionary.codes.__getitem__, values)))
+        return table
+
+    @classmethod
+    def from_csv(cls, path):
+        """Load a transactions CSV file straight into a table"""
+        return cls.from_columns(read_csv_columns(path))
+
+    @classmethod
+    def from_snapshot(cls, path):
+        """Load a binary transactions snapshot straight into a table.
+
+        With numpy the records are viewed in place and the string codes of
+        the snapshot are turned into column codes without building rows.
+        """
+        with BinarySnapshot(path) as snapshot:
+            if np is None:
+                return cls.from_columns(snapshot.columns())
+            strings = snapshot.strings()
+            records = np.frombuffer(snapshot.map, dtype=SNAPSHOT_DTYPE, count=len(snapshot),
+                                    offset=snapshot.records_offset)
+            table = cls.__new__(cls)
+            table.source = None
+            table.ids = list(map(strings.__getitem__, records["id"].tolist()))
+            table.descriptions = list(map(strings.__getitem__, records["description"].tolist()))
+            table.amount = records["amount"].copy()
+
+            dates, positions = np.unique(records["date"], return_inverse=True)
+            ordinals = [_day_ordinal(strings[code]) for code in dates.tolist()]
+            exact = [_exact_date(strings[code], day) for code, day in zip(dates.tolist(), ordinals)]
+            table.day = np.array(ordinals, dtype=np.int32)[positions]
+            table.raw_dates = {}
+            if not all(exact):
+                table.raw_dates = {int(i): strings[records["date"][i]]
+                                   for i in np.flatnonzero(~np.array(exact, dtype=bool)[positions])}
+
+            table.dictionaries = {}
+            table.codes = {}
+            for c in ENCODED_COLUMNS:
+                values, codes = np.unique(records[c], return_inverse=True)
+                table.dictionaries[c] = _Dictionary(strings[code] for code in values.tolist())
+                table.codes[c] = codes.astype(np.int32)
+            # The map cannot be closed while a view of it is alive
+            del records
+            return table
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __iter__(self):
+        return (self.row(i) for i in range(len(self.ids)))
+
+    def row(self, i):
+        """Materialize row i as the usual transaction dict"""
+        if self.source is not None:
+            return dict(self.source[i])
+        values = {c: self.dictionaries[c].values[self.codes[c][i]] for c in ENCODED_COLUMNS}
+        values.update(
+            id=self.ids[i],
+            amount=float(self.amount[i]),
+            date=self.raw_dates[i] if i in self.raw_dates else datetime.date.fromordinal(int(self.day[i])).isoformat(),
+            description=self.descriptions[i],
+        )
+        return {f: values[f] for f in TRANSACTION_FIELDS}
+
+    def rows(self, indices=None):
+        """Materialize the given rows, or all of them, as dicts"""
+        if indices is None:
+            indices = range(len(self.ids))
+        return [self.row(int(i)) for i in indices]
+
+    def take(self, indices):
+        """A new table with the given rows, sharing this table's dictionaries"""
+        indices = [int(i) for i in indices] if np is None else np.asarray(indices, dtype=np.intp)
+        table = TransactionTable.__new__(TransactionTable)
+        table.source = [self.source[i] for i in indices] if self.source is not None else None
+        table.dictionaries = self.dictionaries
+        table.ids = [self.ids[i] for i in indices]
+        table.descriptions = [self.descriptions[i] for i in indices]
+        table.raw_dates = {n: self.raw_dates[i] for n, i in enumerate(indices) if i in self.raw_dates}
+        if np is not None:
+            table.amount = self.amount[indices]
+            table.day = self.day[indices]
+            table.codes = {c: v[indices] for c, v in self.codes.items()}
+        else:
+            table.amount = array("d", (self.amount[i] for i in indices))
+            table.day = array("i", (self.day[i] for i in indices))
+            table.codes = {c: array("i", (v[i] for i in indices)) for c, v in self.codes.items()}
+        return table
+
+    def where(self, username=None, currency=None, category=None, type=None,
+              start=None, end=None, min_amount=None, max_amount=None):
+        """Indices of the rows matching every given predicate.
+
+        category and type compare case-insensitively, start and end are
+        inclusive datetime.date bounds.
+        """
+        tests = []
+        for column, value, fold in (("username", username, False), ("currency", currency, False),
+                                    ("category", category, True), ("type", type, True)):
+            if value is None:
+                continue
+            if fold:
+                wanted = self.dictionaries[column].matching(
+                    lambda v, value=value: str(v).strip().lower() == value.strip().lower())
+            else:
+                wanted = self.dictionaries[column].matching(lambda v, value=value: v == value)
+            tests.append((self.codes[column], "in", wanted))
+        if start is not None:
+            tests.append((self.day, ">=", start.toordinal()))
+        if end is not None:
+            tests.append((self.day, "<=", end.toordinal()))
+        if start is not None or end is not None:
+            tests.append((self.day, ">=", 1))
+        if min_amount is not None:
+            tests.append((self.amount, ">=", min_amount))
+        if max_amount is not None:
+            tests.append((self.amount, "<=", max_amount))
+
+        if np is not None:
+            mask = np.ones(len(self.ids), dtype=bool)
+            for values, op, operand in tests:
+                if op == "in":
+                    mask &= np.isin(values, operand)
+                elif op == ">=":
+                    mask &= values >= operand
+                else:
+                    mask &= values <= operand
+            return np.flatnonzero(mask)
+
+        indices = range(len(self.ids))
+        for values, op, operand in tests:
+            if op == "in":
+                operand = set(operand)
+                indices = [i for i in indices if values[i] in operand]
+            elif op == ">=":
+                indices = [i for i in indices if values[i] >= operand]
+            else:
+                indices = [i for i in indices if values[i] <= operand]
+        return list(indices)
+
+    def filter(self, **predicates):
+        """A new table with the rows matching where(**predicates)"""
+        return self.take(self.where(**predicates))
+
+    def argsort(self, column="date", reverse=False):
+        """Row order by column, ties kept in storage order like sorted()"""
+        if column == "date":
+            keys = self.day
+        elif column == "amount":
+            keys = self.amount
+        elif column in ENCODED_COLUMNS:
+            ranks = self.dictionaries[column].ranks()
+            codes = self.codes[column]
+            keys = np.array(ranks, dtype=np.int32)[codes] if np is not None and ranks else [ranks[c] for c in codes]
+        else:
+            raise ValueError(f"Cannot sort by {column}")
+
+        if np is not None:
+            keys = np.asarray(keys)
+            return np.argsort(-keys if reverse else keys, kind="stable")
+        return sorted(range(len(self.ids)), key=keys.__getitem__, reverse=reverse)
+
+    def sort(self, column="date", reverse=False):
+        """A new table ordered by column"""
+        return self.take(self.argsort(column, reverse))
+
+    def total(self, indices=None):
+        """Sum of the amount column, over the given rows or all of them"""
+        if np is not None:
+            return float(self.amount[indices].sum() if indices is not None else self.amount.sum())
+        if indices is None:
+            return math.fsum(self.amount)
+        return math.fsum(self.amount[i] for i in indices)
+
+    def currency_totals(self):
+        """Return (totals, categories) like rollups.currency_totals, from the columns"""
+        currencies = self.dictionaries["currency"].values
+        categories_dict = self.dictionaries["category"].values
+        types = self.dictionaries["type"]
+        income = set(types.matching(lambda v: str(v).lower() == "income"))
+        expense = set(types.matching(lambda v: str(v).lower() == "expense"))
+        ncur, ncat = len(currencies), len(categories_dict)
+        cur_codes, cat_codes, type_codes = (self.codes["currency"], self.codes["category"],
+                                            self.codes["type"])
+
+        if np is not None:
+            is_income = np.isin(type_codes, list(income))
+            is_expense = np.isin(type_codes, list(expense))
+            seen = np.bincount(cur_codes, minlength=ncur)
+            income_sum = np.bincount(cur_codes, weights=np.where(is_income, self.amount, 0.0),
+                                     minlength=ncur)
+            spent_sum = np.bincount(cur_codes, weights=np.where(is_income, 0.0, self.amount),
+                                    minlength=ncur)
+            cells = cur_codes[is_expense].astype(np.int64) * ncat + cat_codes[is_expense]
+            cell_count = np.bincount(cells, minlength=ncur * ncat)
+            cell_sum = np.bincount(cells, weights=self.amount[is_expense], minlength=ncur * ncat)
+        else:
+            seen = [0] * ncur
+            income_sum = [0.0] * ncur
+            spent_sum = [0.0] * ncur
+            cell_count = [0] * (ncur * ncat)
+            cell_sum = [0.0] * (ncur * ncat)
+            amounts = self.amount
+            for i, cur in enumerate(cur_codes):
+                seen[cur] += 1
+                typ = type_codes[i]
+                if typ in income:
+                    income_sum[cur] += amounts[i]
+                else:
+                    spent_sum[cur] += amounts[i]
+                    if typ in expense:
+                        cell = cur * ncat + cat_codes[i]
+                        cell_count[cell] += 1
+                        cell_sum[cell] += amounts[i]
+
+        totals = {}
+        for code, cur in enumerate(currencies):
+            if seen[code]:
+                totals[cur] = {'income': float(income_sum[code]), 'expense': float(spent_sum[code]),
+                               'net': float(income_sum[code] - spent_sum[code])}
+        categories = {}
+        for cell in range(ncur * ncat):
+            if cell_count[cell]:
+                cur, cat = divmod(cell, ncat)
+                categories.setdefault(currencies[cur], {})[categories_dict[cat]] = float(cell_sum[cell])
+        return totals, categories
+
+# The rows are held by the cache anyway, so the view keeps them for row()
+register_view("table", lambda rows: TransactionTable(rows, keep_rows=True))
+
+def load_transaction_table(username=None):
+    """The cached columnar table of a user's transactions, or of everyone's.
+    search runs its filters and sorts on it.
+
+    The table is shared, treat it as read-only.
+    """
+    return get_view("table", username)
 
 # Save users to the JSON file
 def save_users(users):
     """Save all users to json file"""
-    try:
-        if not os.path.exists("data"):
-            os.makedirs("data")
-        
-        with open(USERS_FILE, "w") as file:
-            json.dump(users, file, indent=2)
-    except Exception as e:
-        print(f"Error saving users: {e}")
+    engine = get_engine()
+    with _cache_lock, engine.lock("users"):
+        _cache.pop(("users", None), None)
+        engine.save_users(users)
+        _cache[("users", None)] = (engine.fingerprint("users"), _copy(users))
         
 # Load users from the JSON file
 def load_users():
     """Load all users from json file"""
-    try:
-        if not os.path.exists("data"):
-            os.makedirs("data")
-            
-        if not os.path.exists(USERS_FILE):
-            with open(USERS_FILE, "w") as f:
-                json.dump({}, f)
-            return {}
-        
-        with open(USERS_FILE, "r") as file:
-            if os.path.getsize(USERS_FILE) == 0:
-                return {}
-            return json.load(file)
-    except json.JSONDecodeError:
-        print("Corrupted users file detected. Starting fresh...")
-        return {}
-    except PermissionError:
-        print("Permission denied when accessing user data.")
-        return {}
-    except Exception as e:
-        print(f"Unexpected error: {e}")
-        return {}
+    return _load("users")
+
+# Load a single user record
+def get_user(username):
+    """Return one user record or None"""
+    record = _cached("users").get(username)
+    return dict(record) if record is not None else None
+
+# user_id -> username over the cached users dict it was built from, kept up
+# to date by every change made to that dict
+_user_ids = (None, {})
+
+def _user_index(users):
+    global _user_ids
+    if _user_ids[0] is not users:
+        _user_ids = (users, {r.get("user_id"): u for u, r in users.items() if r.get("user_id")})
+    return _user_ids[1]
+
+def _set_user(users, username, record):
+    """Put (or with record None, remove) one user in a cached users dict"""
+    old = users.pop(username, None) if record is None else users.get(username)
+    if record is not None:
+        users[username] = record
+    if _user_ids[0] is users:
+        index = _user_ids[1]
+        if old is not None and index.get(old.get("user_id")) == username:
+            del index[old.get("user_id")]
+        if record is not None and record.get("user_id"):
+            index[record["user_id"]] = username
+
+# Find a user by user_id
+def get_user_by_id(user_id):
+    """Return (username, record) for the user with user_id, or None"""
+    with _cache_lock:
+        users = _cached("users")
+        username = _user_index(users).get(user_id)
+        return (username, dict(users[username])) if username is not None else None
+
+# Save a single user record
+def save_user(username, record):
+    """Insert or replace one user record"""
+    record = dict(record)
+    with _cache_lock, get_engine().lock("users"):
+        # Catch up with other processes first, so the cached copy can be
+        # updated in place instead of dropped
+        _cached("users")
+        _write("users", [], lambda: get_engine().put_user(username, record),
+               lambda users, _: _set_user(users, username, record))
+
+# Delete a single user record
+def delete_user_record(username):
+    """Delete one user record, returns True if it existed"""
+    with _cache_lock, get_engine().lock("users"):
+        _cached("users")
+        return _write("users", [], lambda: get_engine().delete_user(username),
+                      lambda users, _: _set_user(users, username, None))
 
 # Save transactions in csv file
 def save_transactions(transactions):
     """Save all transactions to CSV using DictWriter"""
-    try:
-        if not os.path.exists("data"):
-            os.makedirs("data")
-            
-        fieldnames = [
-            "id", "username", "amount", "currency",
-            "category", "date", "description", "type", "payment"
-        ]
-        with open(TRANSACTION_FILE, mode="w", newline='', encoding="utf-8") as file:
-            writer = csv.DictWriter(file, fieldnames=fieldnames)
-            writer.writeheader()
-            writer.writerows(transactions)
-        
-    except Exception as e:
-        print(f"Error saving transactions: {e}")
+    _save("transactions", transactions)
 
 # Load transactions from csv file
 def load_transactions():
     """Load all transactions from CSV using DictReader"""
-    try:
-        if not os.path.exists("data"):
-            os.makedirs("data")
-            
-        if not os.path.exists(TRANSACTION_FILE):
-            with open(TRANSACTION_FILE, "w", newline='', encoding="utf-8") as f:
-                writer = csv.writer(f)
-                writer.writerow([
-                    "id", "username", "amount", "currency",
-                    "category", "date", "description", "type", "payment"
-                ])
-            return []
-        
-        transactions = []
-        with open(TRANSACTION_FILE, mode="r", newline='', encoding="utf-8") as file:
-            reader = csv.DictReader(file)
-            for row in reader:
-                row.setdefault("payment", "cash")
-                row["amount"] = float(row["amount"]) if row["amount"] else 0.0
-                transactions.append(row)
-        return transactions
-    except Exception as e:
-        print(f"Error loading transactions: {e}")
-        return []
+    return _load("transactions")
+
+# Load one user's transactions
+def load_user_transactions(username):
+    """Load only the transactions that belong to username"""
+    return _load("transactions", username)
+
+# Stream one user's transactions
+def iter_user_transactions(username, chunk_size=1000):
+    """Yield username's transactions from storage in lists of up to chunk_size.
+
+    Rows are read lazily and bypass the cache, so the whole history is never
+    held in memory at once.
+    """
+    return get_engine().iter_for_user("transactions", username, chunk_size)
+
+# Row level transaction writes
+def add_transaction_record(transaction):
+    """Store one new transaction"""
+    _insert("transactions", [transaction])
+
+def add_transaction_records(transactions):
+    """Store a batch of new transactions in one write"""
+    if transactions:
+        _insert("transactions", transactions)
+
+def update_transaction_record(transaction):
+    """Replace the stored transaction with the same id"""
+    return _update("transactions", transaction)
+
+def delete_transaction_record(transaction):
+    """Delete the stored transaction with the same id"""
+    return _delete("transactions", transaction)
 
 # Auto saving and backup the users and transactions
 def auto_save(users, transactions, goals, reminders):
@@ -109,120 +771,71 @@ def auto_save(users, transactions, goals, reminders):
 
 # Backup users and transactions files
 def backup():
-    """Create backup copies of the users and transactions data files"""
+    """Start an incremental backup of the data files in the background"""
+    # backup.py builds on this module, so import it on first use
+    from backup import schedule_backup
     try:
-        if not os.path.exists(BACKUP):
-            os.makedirs(BACKUP)
-        
-        # Backup users file
-        if os.path.exists(USERS_FILE):
-            shutil.copy2(USERS_FILE, os.path.join(BACKUP, "users_backup.json"))
-            print("Users backup updated.")
-        else:
-            print("No users file found to backup.")
-        
-        # Backup transactions file
-        if os.path.exists(TRANSACTION_FILE):
-            shutil.copy2(TRANSACTION_FILE, os.path.join(BACKUP, "transactions_backup.csv"))
-            print("Transactions backup updated.")
-        else:
-            print("No transactions file found to backup.")
-        
-        # Backup Goals file
-        if os.path.exists(GOALS_FILE):
-            shutil.copy2(GOALS_FILE, os.path.join(BACKUP, "goals_backup.csv"))
-            print("Goals backup updated.")
-        else:
-            print("No goals file found to backup.")
-        
-        # Backup bills reminder file
-        if os.path.exists(REMINDERS_FILE):
-            shutil.copy2(REMINDERS_FILE, os.path.join(BACKUP, "reminders_backup.csv"))
-            print("Reminders backup updated.")
-        else:
-            print("No reminders file found to backup.")
-        
+        schedule_backup()
         return True
-    
     except Exception as e:
         print(f"Error during backup: {e}")
         return False
-    
+
 # Save reminders to the JSON file
 def save_reminders(reminders):
     """Save all reminders to json file"""
-    try:
-        if not os.path.exists("data"):
-            os.makedirs("data")
-        
-        with open(REMINDERS_FILE, "w") as file:
-            json.dump(reminders, file, indent=2)
-    except Exception as e:
-        print(f"Error saving reminders: {e}")
+    _save("reminders", reminders)
         
 # Load reminders from the JSON file
 def load_reminders():
     """Load all reminders from json file"""
-    try:
-        if not os.path.exists("data"):
-            os.makedirs("data")
-            
-        if not os.path.exists(REMINDERS_FILE):
-            with open(REMINDERS_FILE, "w") as f:
-                json.dump([], f)
-            return []
-        
-        with open(REMINDERS_FILE, "r") as file:
-            if os.path.getsize(REMINDERS_FILE) == 0:
-                return []
-            return json.load(file)
-    except json.JSONDecodeError:
-        print("Corrupted reminders file detected. Starting fresh...")
-        return []
-    except PermissionError:
-        print("Permission denied when accessing reminders data.")
-        return []
-    except Exception as e:
-        print(f"Unexpected error: {e}")
-        return []
+    return _load("reminders")
+
+# Load one user's reminders
+def load_user_reminders(username):
+    """Load only the reminders that belong to username"""
+    return _load("reminders", username)
+
+# Row level reminder writes
+def add_reminder_record(reminder):
+    """Store one new reminder"""
+    _insert("reminders", [reminder])
+
+def update_reminder_record(reminder):
+    """Replace the stored reminder with the same id"""
+    return _update("reminders", reminder)
+
+def delete_reminder_record(reminder):
+    """Delete the stored reminder with the same id"""
+    return _delete("reminders", reminder)
     
 # Save goals to the JSON file
 def save_goals(goals):
     """Save all goals to json file"""
-    try:
-        if not os.path.exists("data"):
-            os.makedirs("data")
-            
-        with open(GOALS_FILE, "w") as file:
-            json.dump(goals, file, indent=2)
-    except Exception as e:
-        print(f"Error saving goals: {e}")
+    _save("goals", goals)
         
 # Load goals from the JSON file
 def load_goals():
     """Load all goals from json file"""
-    try:
-        if not os.path.exists("data"):
-            os.makedirs("data")
-            
-        if not os.path.exists(GOALS_FILE):
-            with open(GOALS_FILE, "w") as f:
-                json.dump([], f)
-            return []
-        
-        with open(GOALS_FILE, "r") as file:
-            if os.path.getsize(GOALS_FILE) == 0:
-                return []
-            return json.load(file)
-    except json.JSONDecodeError:
-        print("Corrupted goals file detected. Starting fresh...")
-        return []
-    except PermissionError:
-        print("Permission denied when accessing goal data.")
-        return []
-    except Exception as e:
-        print(f"Unexpected error: {e}")
-        return []
+    return _load("goals")
+
+# Load one user's goals
+def load_user_goals(username):
+    """Load only the goals that belong to username"""
+    return _load("goals", username)
+
+# Row level goal writes
+def add_goal_record(goal):
+    """Store one new goal"""
+    _insert("goals", [goal])
+
+def update_goal_record(goal):
+    """Replace the stored goal with the same id"""
+    return _update("goals", goal)
+
+def delete_goal_record(goal):
+    """Delete the stored goal with the same id"""
+    return _delete("goals", goal)
 
 def import_transactions(username, import_path):
     """Import user's transactions from a CSV file."""
@@ -231,7 +844,7 @@ def import_transactions(username, import_path):
             print(f"File not found: {import_path}")
             return
         
-        transactions = load_transactions()
+        transactions = []
         with open(import_path, mode="r", newline='', encoding="utf-8") as file:
             reader = csv.DictReader(file)
             for row in reader:
@@ -239,8 +852,21 @@ def import_transactions(username, import_path):
                 row["amount"] = float(row.get("amount", 0))
                 transactions.append(row)
 
-        save_transactions(transactions)
+        # Skip rows that are already stored or repeated within the file
+        stored = find_duplicates(username, transactions)
+        seen = set()
+        new_transactions = []
+        for row in transactions:
+            h = content_hash(row)
+            if h not in stored and h not in seen:
+                seen.add(h)
+                new_transactions.append(row)
+        skipped = len(transactions) - len(new_transactions)
+
+        add_transaction_records(new_transactions)
         print(f"Transactions imported successfully for {username}.")
+        if skipped:
+            print(f"Skipped {skipped} duplicate transactions.")
     except Exception as e:
         print(f"Error importing user transactions: {e}")
 
@@ -248,9 +874,9 @@ def import_transactions(username, import_path):
 def export_transactions(username, output_path=None):
     """Export only the given user's transactions to a CSV file."""
     try:
-        transactions = load_transactions()
-        user_tx = [t for t in transactions if t["username"] == username]
-        if not user_tx:
+        chunks = iter_user_transactions(username)
+        first = next(chunks, None)
+        if not first:
             print(f"No transactions found for user {username}.")
             return
         
@@ -260,13 +886,11 @@ def export_transactions(username, output_path=None):
             output_path = f"exports/{username}_transactions.csv"
 
         with open(output_path, "w", newline='', encoding="utf-8") as file:
-            fieldnames = [
-                "id", "username", "amount", "currency",
-                "category", "date", "description", "type", "payment"
-            ]
-            writer = csv.DictWriter(file, fieldnames=fieldnames)
+            writer = csv.DictWriter(file, fieldnames=TRANSACTION_FIELDS)
             writer.writeheader()
-            writer.writerows(user_tx)
+            writer.writerows(first)
+            for chunk in chunks:
+                writer.writerows(chunk)
 
         print(f"Transactions for {username} exported to {output_path}")
     except Exception as e:
@@ -0,0 +1,252 @@
+import os
+import datetime
+import threading
+import rollups
+from data_handler import register_view, get_view, get_engine, load_user_goals, load_user_reminders
+from search import page_transactions
+
+# A short text summary of a user's finances for the AI assistant: totals,
+# the last months, top categories, goals, upcoming reminders, recurring
+# payees and the latest transactions. Every figure comes from an
+# incrementally maintained view, and the finished text is cached per user
+# under the storage fingerprints it was built from, so asking a question
+# only costs a few stat calls until the user's data or the day changes.
+
+# Upper bound on the digest size, in estimated tokens
+TOKEN_BUDGET = int(os.getenv("SPENDLIFY_DIGEST_TOKENS", 400))
+# Rough size of a token in characters, for English text and numbers
+CHARS_PER_TOKEN = 4
+
+MONTHS = 6
+TOP_CATEGORIES = 5
+REMINDER_DAYS = 30
+RECURRING_MONTHS = 3
+RECURRING_PAYEES = 5
+LATEST_TRANSACTIONS = 5
+
+# ==================== PAYEES VIEW ====================
+# Per user, every (payee, type) seen in transaction descriptions with the
+# number of transactions per month and [total, count] per currency.
+
+def payee_name(description):
+    """Normalize a description to a payee: lower case, without the words
+    holding digits (card numbers, references, dates)"""
+    words = str(description or "").lower().split()
+    kept = [w for w in words if not any(c.isdigit() for c in w)]
+    return " ".join(kept or words)
+
+def _amount(t):
+    try:
+        return float(t.get('amount', 0.0))
+    except (TypeError, ValueError):
+        return 0.0
+
+def _add(payees, t, sign):
+    name = payee_name(t.get('description'))
+    if not name:
+        return
+    key = (name, t.get('type', '').lower())
+    entry = payees.get(key)
+    if entry is None:
+        entry = payees[key] = {'count': 0, 'months': {}, 'totals': {}}
+    entry['count'] += sign
+    if entry['count'] <= 0:
+        del payees[key]
+        return
+    month = str(t.get('date', ''))[:7]
+    months = entry['months']
+    months[month] = months.get(month, 0) + sign
+    if months[month] <= 0:
+        del months[month]
+    currency = t.get('currency', 'USD')
+    total = entry['totals'].get(currency)
+    if total is None:
+        total = entry['totals'][currency] = [0.0, 0]
+    total[0] += sign * _amount(t)
+    total[1] += sign
+    if total[1] <= 0:
+        del entry['totals'][currency]
+
+def build_payees(transactions):
+    """Build the payees view from scratch"""
+    payees = {}
+    for t in transactions:
+        _add(payees, t, 1)
+    return payees
+
+def apply_delta(payees, old, new):
+    """Move one changed transaction between payees"""
+    if old is not None:
+        _add(payees, old, -1)
+    if new is not None:
+        _add(payees, new, 1)
+
+register_view("payees", build_payees, apply_delta)
+
+def recurring_payees(username, min_months=RECURRING_MONTHS):
+    """(payee, type, months seen, average amount, currency) for payees seen
+    in at least min_months different months, most regular first"""
+    found = []
+    for (name, typ), entry in get_view("payees", username).items():
+        if len(entry['months']) < min_months:
+            continue
+        # Averaged in the currency the payee is paid in most often
+        currency, (total, count) = max(entry['totals'].items(), key=lambda item: item[1][1])
+        found.append((name, typ, len(entry['months']), total / count, currency))
+    found.sort(key=lambda p: (-p[2], -abs(p[3]), p[0]))
+    return found
+
+# ==================== DIGEST ====================
+
+def estimate_tokens(text):
+    """Token count estimate used for the budget"""
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+def _money(amount):
+    return f"{amount:.2f}"
+
+def _totals_section(cells):
+    totals = {}
+    for (month, cur, typ, cat), (amount, count) in cells.items():
+        entry = totals.setdefault(cur, {'income': 0.0, 'expense': 0.0})
+        entry['income' if typ == 'income' else 'expense'] += amount
+    return [f"- {cur}: income {_money(t['income'])}, expenses {_money(t['expense'])}, "
+            f"net {_money(t['income'] - t['expense'])}"
+            for cur, t in sorted(totals.items())]
+
+def _monthly_section(cells):
+    months = {}
+    for (month, cur, typ, cat), (amount, count) in cells.items():
+        entry = months.setdefault((month, cur), {'income': 0.0, 'expense': 0.0})
+        entry['income' if typ == 'income' else 'expense'] += amount
+    latest = sorted({month for month, cur in months}, reverse=True)[:MONTHS]
+    return [f"- {month} {cur}: income {_money(t['income'])}, expenses {_money(t['expense'])}"
+            for month in latest
+            for (m, cur), t in sorted(months.items()) if m == month]
+
+def _categories_section(cells):
+    spent = {}
+    for (month, cur, typ, cat), (amount, count) in cells.items():
+        if typ == 'expense':
+            spent[(cur, cat)] = spent.get((cur, cat), 0.0) + amount
+    totals = {}
+    for (cur, cat), amount in spent.items():
+        totals[cur] = totals.get(cur, 0.0) + amount
+    top = sorted(spent.items(), key=lambda item: -item[1])[:TOP_CATEGORIES]
+    return [f"- {cat}: {_money(amount)} {cur} ({amount / totals[cur] * 100:.0f}% of {cur} spending)"
+            for (cur, cat), amount in top if totals[cur]]
+
+def _goals_section(goals):
+    lines = []
+    for g in sorted(goals, key=lambda g: str(g.get('deadline', ''))):
+        try:
+            target = float(g.get('target_amount', 0))
+            current = float(g.get('current_amount', 0))
+        except (TypeError, ValueError):
+            continue
+        percent = current / target * 100 if target else 0.0
+        lines.append(f"- {g.get('title', '')}: {_money(current)} of {_money(target)} "
+                     f"({percent:.0f}%), deadline {g.get('deadline', '')}, {g.get('status', '')}")
+    return lines
+
+def _reminders_section(reminders, today):
+    upcoming = []
+    for r in reminders:
+        try:
+            due = datetime.datetime.strptime(r['deadline'], "%Y-%m-%d").date()
+        except (KeyError, TypeError, ValueError):
+            continue
+        days = (due - today).days
+        if days <= REMINDER_DAYS:
+            upcoming.append((due, r))
+    upcoming.sort(key=lambda item: item[0])
+    lines = []
+    for due, r in upcoming:
+        days = (due - today).days
+        when = f"overdue by {-days} days" if days < 0 else "due today" if days == 0 else f"due in {days} days"
+        lines.append(f"- {r.get('title', '')}: {r.get('amount', '')} on {due.isoformat()} ({when})")
+    return lines
+
+def _payees_section(username):
+    return [f"- {name} ({typ}): {months} months, about {_money(average)} {cur} each"
+            for name, typ, months, average, cur in recurring_payees(username)[:RECURRING_PAYEES]]
+
+def recent_transactions(username, limit=LATEST_TRANSACTIONS):
+    """The user's last limit transactions, oldest first"""
+    # Read from the insertion-ordered index instead of loading the history
+    rows, _ = page_transactions(username, sort_by="created", order="desc", limit=limit)
+    return rows[::-1]
+
+def _latest_section(username):
+    return [f"- {tx['date']}: {tx['amount']} {tx['currency']} for {tx['category']}"
+            for tx in recent_transactions(username)]
+
+def fit_budget(sections, budget):
+    """Join (title, lines) sections in priority order, dropping the lines
+    (and then whole sections) that would take the text over budget"""
+    out = []
+    used = 0
+    for title, lines in sections:
+        if not lines:
+            continue
+        cost = estimate_tokens(title + "\n")
+        if used + cost > budget:
+            break
+        section = [title]
+        for line in lines:
+            line_cost = estimate_tokens(line + "\n")
+            if used + cost + line_cost > budget:
+                break
+            section.append(line)
+            cost += line_cost
+        if len(section) > 1:
+            out.extend(section)
+            used += cost
+    return "\n".join(out)
+
+def build_digest(username, today=None, budget=TOKEN_BUDGET):
+    """Build the digest text from the user's views, goals and reminders"""
+    today = today or datetime.date.today()
+    cells = rollups.get_rollup(username)
+    sections = [
+        ("Totals:", _totals_section(cells)),
+        ("Monthly totals:", _monthly_section(cells)),
+        ("Top spending categories:", _categories_section(cells)),
+        ("Savings goals:", _goals_section(load_user_goals(username))),
+        ("Upcoming reminders:", _reminders_section(load_user_reminders(username), today)),
+        ("Recurring payees:", _payees_section(username)),
+        ("Latest transactions:", _latest_section(username)),
+    ]
+    return fit_budget(sections, budget)
+
+_digests = {}
+_digests_lock = threading.Lock()
+
+def get_digest(username, budget=TOKEN_BUDGET):
+    """The user's digest, rebuilt only when their transactions, goals or
+    reminders changed or the day rolled over"""
+    engine = get_engine()
+    today = datetime.date.today()
+    key = (
+        engine.fingerprint("transactions", username),
+        engine.fingerprint("goals", username),
+        engine.fingerprint("reminders", username),
+        today, budget,
+    )
+    with _digests_lock:
+        entry = _digests.get(username)
+        if entry is not None and entry[0] == key:
+            return entry[1]
+    text = build_digest(username, today, budget)
+    with _digests_lock:
+        _digests[username] = (key, text)
+    return text
+
+if __name__ == "__main__":
+    import sys
+    from data_handler import load_users
+
+    for username in sys.argv[1:] or list(load_users()):
+        text = get_digest(username)
+        print(f"== {username} ({estimate_tokens(text)} tokens)")
+        print(text)
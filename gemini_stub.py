@@ -0,0 +1,72 @@
+import sys
+import json
+import time
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Stand-in for the Gemini generateContent endpoint, for trying the AI chat
+# without an API key or network:
+#
+#   python gemini_stub.py --port 8765 --delay 2
+#   GEMINI_BASE_URL=http://127.0.0.1:8765 python app.py
+#
+# Every answer echoes the end of the prompt after `delay` seconds.
+
+class StubHandler(BaseHTTPRequestHandler):
+    # Keep-alive, like the real API, so the client's connection pool is used
+    protocol_version = "HTTP/1.1"
+    delay = 0.0
+
+    def do_POST(self):
+        if not self.path.endswith(":generateContent"):
+            self.send_error(404)
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            prompt = json.loads(self.rfile.read(length))["contents"][0]["parts"][0]["text"]
+        except (ValueError, KeyError, IndexError):
+            self.send_error(400)
+            return
+        time.sleep(self.delay)
+        question = prompt.rsplit("User's question:", 1)[-1].strip()
+        body = json.dumps({
+            "candidates": [{"content": {"parts": [{"text": f"Stub answer to: {question}"}]}}]
+        }).encode("utf-8")
+        try:
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            # The client gave up (timed out) first
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+def serve(port=0, delay=0.0):
+    """Start the stub on a background thread, returns the server
+    (server.server_address has the port when 0 was asked for)"""
+    handler = type("Handler", (StubHandler,), {"delay": delay})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Local stand-in for the Gemini API")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--delay", type=float, default=1.0, help="seconds before each answer")
+    args = parser.parse_args(argv)
+    server = serve(args.port, args.delay)
+    print(f"Gemini stub on http://127.0.0.1:{server.server_address[1]} (delay {args.delay}s)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -1,12 +1,11 @@
 import datetime
 import uuid
-from data_handler import save_goals, load_goals
+from data_handler import load_user_goals, add_goal_record, update_goal_record, delete_goal_record
 
 # function to add goal for specific user
 def add_goal(username):
     """ Add a new goal for a specific user """
     try:
-        goals = load_goals()
         while True:
             title = input("Enter goal title: ")
             if title:
@@ -59,8 +58,7 @@ def add_goal(username):
         "status": status
         }
         
-        goals.append(goal)
-        save_goals(goals)
+        add_goal_record(goal)
         print("Goals saved successfully!")
         
     except Exception as e:
@@ -70,8 +68,7 @@ def add_goal(username):
 def view_goals(username):
     """ Display all goals belonging to a given user """
     try:
-        goals = load_goals()   
-        user_goals = [g for g in goals if g["username"] == username]
+        user_goals = load_user_goals(username)
 
         if len(user_goals) == 0:
             print(f"No goals found for this user {username}")
@@ -91,8 +88,7 @@ def view_goals(username):
 def delete_goal(username):
     """Delete a specific goal for a user using its ID (short or full)."""
     try:
-        goals = load_goals()
-        user_goals = [g for g in goals if g["username"] == username]
+        user_goals = load_user_goals(username)
         
         if not user_goals:
             print("No goals found to delete.")
@@ -118,8 +114,7 @@ def delete_goal(username):
         des = input(f"Are you sure you want to delete this goal: {target['title']}? (y/n): ").lower()
         
         if des == 'y':
-            goals.remove(target)
-            save_goals(goals)
+            delete_goal_record(target)
             print("Goal deleted successfully.")
         elif des == 'n':
             print("Skipping deleting goal...")
@@ -133,8 +128,7 @@ def delete_goal(username):
 def edit_goal(username):
     """Edit an existing goal for the specified user"""
     try:
-        goals = load_goals()
-        user_goals = [g for g in goals if g["username"] == username]
+        user_goals = load_user_goals(username)
 
         if not user_goals:
             print("No goals found to edit")
@@ -201,7 +195,7 @@ def edit_goal(username):
         elif new_status:
             print("Invalid status. Keeping old value")
 
-        save_goals(goals)
+        update_goal_record(target_goal)
         print("Goal updated successfully")
 
     except Exception as e:
@@ -0,0 +1,287 @@
+import io
+import os
+import sys
+import csv
+import uuid
+import zipfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+from data_handler import add_transaction_records, find_duplicates
+from storage import content_hash
+
+# Uploads are decoded and parsed a line at a time and stored in batches, so
+# memory use depends on BATCH_SIZE rather than on the size of the file.
+
+BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 10
+
+REQUIRED_FIELDS = [
+    "amount",
+    "currency",
+    "category",
+    "date",
+    "description",
+    "type",
+    "payment",
+]
+
+def _parse_date(value):
+    # fromisoformat is much cheaper than strptime for the usual zero-padded
+    # YYYY-MM-DD; anything else still gets strptime's exact rules
+    if len(value) == 10 and value[4] == value[7] == "-":
+        return date.fromisoformat(value)
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
+def validate_row(row, row_num, username):
+    """Return (transaction, None) for a valid CSV row or (None, error message)"""
+    missing_fields = [field for field in REQUIRED_FIELDS if field not in row or not row[field]]
+    if missing_fields:
+        return None, f"Row {row_num}: Missing fields: {', '.join(missing_fields)}"
+
+    # Validate amount
+    try:
+        amount = float(row["amount"])
+        if amount <= 0:
+            return None, f"Row {row_num}: Amount must be greater than 0"
+    except ValueError:
+        return None, f"Row {row_num}: Invalid amount value"
+
+    # Validate date format
+    try:
+        _parse_date(row["date"])
+    except ValueError:
+        return None, f"Row {row_num}: Invalid date format (use YYYY-MM-DD)"
+
+    # Validate type
+    if row["type"].lower() not in ["income", "expense"]:
+        return None, f"Row {row_num}: Type must be 'income' or 'expense'"
+
+    return {
+        "id": str(uuid.uuid4()),
+        "username": username,
+        "amount": amount,
+        "currency": row["currency"].upper(),
+        "category": row["category"],
+        "date": row["date"],
+        "description": row["description"],
+        "type": row["type"].lower(),
+        "payment": row["payment"],
+    }, None
+
+def drop_duplicates(username, transactions, keep=False):
+    """Split off rows already stored for username or repeated in transactions.
+
+    Returns (rows to store, number of duplicates). With keep=True duplicates
+    are only counted (flagged) and every row is kept.
+    """
+    stored = find_duplicates(username, transactions)
+    seen = set()
+    unique = []
+    duplicates = 0
+    for t in transactions:
+        h = content_hash(t)
+        if h in stored or h in seen:
+            duplicates += 1
+            if not keep:
+                continue
+        seen.add(h)
+        unique.append(t)
+    return unique, duplicates
+
+def import_csv_stream(username, stream, batch_size=BATCH_SIZE, on_batch=None,
+                      keep_duplicates=False):
+    """Validate and store the transactions of a binary CSV stream.
+
+    Valid rows are stored every batch_size rows. Rows that are already
+    stored (including by earlier batches) are skipped, or only counted when
+    keep_duplicates is true. on_batch, if given, is called with the running
+    summary after each stored batch. Returns a dict with 'count' (rows
+    imported), 'rows' (rows read), 'duplicates', 'batches', 'error_count'
+    and 'errors' (the first MAX_REPORTED_ERRORS messages).
+
+    Undecodable bytes or malformed CSV stop the import there. The rows
+    before that point are still stored, since earlier batches already are,
+    and 'error' in the summary says where it stopped (None otherwise).
+    """
+    summary = {"count": 0, "rows": 0, "duplicates": 0, "batches": 0,
+               "error_count": 0, "errors": [], "error": None}
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    batch = []
+
+    def flush():
+        rows, duplicates = drop_duplicates(username, batch, keep_duplicates)
+        add_transaction_records(rows)
+        summary["duplicates"] += duplicates
+        summary["count"] += len(rows)
+        summary["batches"] += 1
+        batch.clear()
+        if on_batch:
+            on_batch(dict(summary))
+
+    try:
+        try:
+            for row_num, row in enumerate(csv.DictReader(text), start=2):
+                summary["rows"] += 1
+                try:
+                    transaction, error = validate_row(row, row_num, username)
+                except Exception as e:
+                    transaction, error = None, f"Row {row_num}: {str(e)}"
+                if error:
+                    summary["error_count"] += 1
+                    if len(summary["errors"]) < MAX_REPORTED_ERRORS:
+                        summary["errors"].append(error)
+                    continue
+                batch.append(transaction)
+                if len(batch) >= batch_size:
+                    flush()
+        except (UnicodeDecodeError, csv.Error) as e:
+            summary["error"] = f"Could not read past row {summary['rows'] + 1}: {str(e)}"
+        if batch:
+            flush()
+    finally:
+        # Leave the underlying stream open for its owner
+        text.detach()
+
+    return summary
+
+
+# ==================== BULK IMPORT ====================
+# Many statements at once: every CSV file (or CSV inside a zip archive) is
+# parsed and validated in a worker process, the results are merged in input
+# order, rows that appear more than once are dropped and the rest are stored
+# with a single write. Workers are given file paths and stream the files
+# themselves, so no file is ever held in memory whole.
+
+# Workers are spawned rather than forked: the web app's process already
+# runs the backup scheduler and Gemini threads, and a forked child would
+# inherit their locks in whatever state they were in
+_MP_CONTEXT = multiprocessing.get_context("spawn")
+
+def expand_sources(sources):
+    """Turn (name, path) pairs into CSV sources, listing the CSV files
+    inside zip archives.
+
+    Returns (csv_sources, errors), csv_sources being (name, path, zip member
+    or None) tuples.
+    """
+    expanded = []
+    errors = []
+    for name, path in sources:
+        if name.lower().endswith(".zip"):
+            try:
+                with zipfile.ZipFile(path) as archive:
+                    for member in archive.infolist():
+                        if not member.is_dir() and member.filename.lower().endswith(".csv"):
+                            expanded.append((f"{name}/{member.filename}", path, member.filename))
+            except (zipfile.BadZipFile, OSError):
+                errors.append(f"{name}: Not a valid zip archive")
+        elif name.lower().endswith(".csv"):
+            expanded.append((name, path, None))
+        else:
+            errors.append(f"{name}: File must be a CSV or a zip of CSVs")
+    return expanded, errors
+
+def _open_source(path, member):
+    if member is None:
+        return open(path, "rb")
+    archive = zipfile.ZipFile(path)
+    try:
+        stream = archive.open(member)
+    except BaseException:
+        archive.close()
+        raise
+    # The member stream keeps the archive's file open until it is closed
+    archive.close()
+    return stream
+
+def parse_source(source):
+    """Validate one CSV file in a worker process, returns (name, transactions, rows, errors)"""
+    name, path, member, username = source
+    transactions = []
+    errors = []
+    rows = 0
+    try:
+        with _open_source(path, member) as stream:
+            text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+            for row_num, row in enumerate(csv.DictReader(text), start=2):
+                rows += 1
+                try:
+                    transaction, error = validate_row(row, row_num, username)
+                except Exception as e:
+                    transaction, error = None, f"Row {row_num}: {str(e)}"
+                if error:
+                    errors.append(f"{name}: {error}")
+                else:
+                    transactions.append(transaction)
+    except Exception as e:
+        errors.append(f"{name}: Error reading file: {str(e)}")
+    return name, transactions, rows, errors
+
+def bulk_import(username, sources, workers=None, keep_duplicates=False):
+    """Import many CSV files or zip archives for username in one write.
+
+    sources is a list of (filename, path). Files are parsed in parallel on
+    up to workers spawned processes (one per CPU by default). Rows repeated across
+    files or already stored are skipped, or only counted when
+    keep_duplicates is true. Returns a summary with 'files', 'count',
+    'rows', 'duplicates', 'error_count' and 'errors' (the first
+    MAX_REPORTED_ERRORS messages).
+    """
+    files, errors = expand_sources(sources)
+    jobs = [(name, path, member, username) for name, path, member in files]
+    if workers is None:
+        workers = min(len(jobs), os.cpu_count() or 1)
+
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=_MP_CONTEXT) as pool:
+            results = list(pool.map(parse_source, jobs))
+    else:
+        results = [parse_source(job) for job in jobs]
+
+    summary = {"files": len(files), "count": 0, "rows": 0, "duplicates": 0,
+               "error_count": len(errors), "errors": errors[:MAX_REPORTED_ERRORS]}
+    merged = []
+    for name, transactions, rows, file_errors in results:
+        summary["rows"] += rows
+        summary["error_count"] += len(file_errors)
+        room = MAX_REPORTED_ERRORS - len(summary["errors"])
+        summary["errors"].extend(file_errors[:max(room, 0)])
+        merged.extend(transactions)
+
+    merged, summary["duplicates"] = drop_duplicates(username, merged, keep_duplicates)
+    add_transaction_records(merged)
+    summary["count"] = len(merged)
+    return summary
+
+def path_sources(paths):
+    """Files on disk as (filename, path) sources"""
+    return [(os.path.basename(path), path) for path in paths]
+
+USAGE = """Usage: python importer.py [--keep-duplicates] <username> <file.csv|archive.zip> [...]
+
+Imports every CSV file given (or contained in a zip archive) for username.
+Rows that are already stored are skipped unless --keep-duplicates is given.
+"""
+
+def main(argv):
+    keep_duplicates = "--keep-duplicates" in argv
+    argv = [a for a in argv if a != "--keep-duplicates"]
+    if len(argv) < 2:
+        print(USAGE)
+        return 1
+    username, paths = argv[0], argv[1:]
+    missing = [p for p in paths if not os.path.exists(p)]
+    if missing:
+        print(f"File not found: {', '.join(missing)}")
+        return 1
+
+    summary = bulk_import(username, path_sources(paths), keep_duplicates=keep_duplicates)
+    print(f"Imported {summary['count']} of {summary['rows']} rows from {summary['files']} files "
+          f"for {username} ({summary['duplicates']} duplicates, {summary['error_count']} errors).")
+    for error in summary["errors"]:
+        print(f"  {error}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -2,8 +2,10 @@ import os
 import datetime
 from auth import *
 import transactions as tx
+import rollups
 from search import run_search
-from data_handler import load_transactions, import_transactions, export_transactions
+from data_handler import import_transactions, export_transactions, get_user
+from backup import start_scheduler, schedule_backup, wait_for_backup
 from goals import *
 from bill_reminders import *
 
@@ -12,61 +14,6 @@ def clear_screen():
     
     os.system('cls' if os.name == 'nt' else 'clear')
 
-def monthly_reports(user):
-    """Generate and display monthly report for current user's transactions"""
-    # Get current month's start and end dates
-    today = datetime.datetime.now()
-    start_date = today.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    if today.month == 12:
-        end_date = today.replace(year=today.year + 1, month=1, day=1) - datetime.timedelta(days=1)
-    else:
-        end_date = today.replace(month=today.month + 1, day=1) - datetime.timedelta(days=1)
-    
-    # Load and filter transactions
-    all_transactions = load_transactions()
-    monthly_transactions = [
-        t for t in all_transactions 
-        if t['username'] == user['username'] 
-        and start_date <= datetime.datetime.strptime(t['date'], '%Y-%m-%d') <= end_date
-    ]
-    
-    # Calculate totals
-    income = sum(float(t['amount']) for t in monthly_transactions if float(t['amount']) > 0)
-    expenses = abs(sum(float(t['amount']) for t in monthly_transactions if float(t['amount']) < 0))
-    net_balance = income - expenses
-    
-    # Group transactions by category
-    categories = {}
-    for transaction in monthly_transactions:
-        category = transaction['category']
-        amount = float(transaction['amount'])
-        if category not in categories:
-            categories[category] = {'total': 0, 'count': 0}
-        categories[category]['total'] += amount
-        categories[category]['count'] += 1
-    
-    # Display report
-    clear_screen()
-    print(f"\n{'=' * 50}")
-    print(f"Monthly Report for {user['username']} - {today.strftime('%B %Y')}")
-    print(f"{'=' * 50}")
-    
-    print(f"\nSummary:")
-    print(f"{'─' * 30}")
-    print(f"Total Income:  ${income:,.2f}")
-    print(f"Total Expenses: ${expenses:,.2f}")
-    print(f"Net Balance:    ${net_balance:,.2f}")
-    
-    print(f"\nBreakdown by Category:")
-    print(f"{'─' * 50}")
-    print(f"{'Category':<20} {'Amount':>10} {'Count':>8}")
-    print(f"{'─' * 50}")
-    for category, data in sorted(categories.items()):
-        print(f"{category:<20} ${data['total']:>9,.2f} {data['count']:>8}")
-    
-    print(f"\n{'=' * 50}")
-    input("\nPress Enter to continue...")
-
 def display_header():
     print("""
 ███████╗██████╗ ███████╗███╗   ██╗██████╗ ██╗     ██╗███████╗██╗   ██╗
@@ -127,8 +74,7 @@ def user_login_menu():
             continue
 
         # Build the current_user dict expected by display_user_info()
-        users = load_users()
-        user_record = users.get(username)
+        user_record = get_user(username)
         if user_record:
             return {
                 "username": username,
@@ -162,12 +108,12 @@ def dashboard_summary(current_user):
     clear_screen()
     print("\n📈 DASHBOARD SUMMARY\n")
     pref_cur = current_user.get('currency', 'USD')
-    summary = tx.get_user_summary(current_user['username'])
-    totals = summary.get(pref_cur, {'income': 0.0, 'expense': 0.0, 'net': 0.0})
+    summary = tx.get_dashboard_summary(current_user['username'], currency=pref_cur, top_n=3)
+    totals = summary['totals'].get(pref_cur, {'income': 0.0, 'expense': 0.0, 'net': 0.0})
     income = totals['income']
     expense = totals['expense']
     net = totals['net']
-    top_cats = tx.get_top_categories(current_user['username'], currency=pref_cur, top_n=3)
+    top_cats = summary['top_categories']
     cur_symbols = {'USD': '$', 'EUR': '€', 'GBP': '£', 'JPY': '¥', 'EGP': 'E£'}
     sym = cur_symbols.get(pref_cur, '')
     box_w = 62
@@ -199,31 +145,12 @@ def dashboard_summary(current_user):
 
 def monthly_reports(user):
     today = datetime.datetime.now()
-    start_date = today.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    if today.month == 12:
-        end_date = today.replace(year=today.year + 1, month=1, day=1) - datetime.timedelta(days=1)
-    else:
-        end_date = today.replace(month=today.month + 1, day=1) - datetime.timedelta(days=1)
-    
-    all_transactions = load_transactions()
-    monthly_transactions = [
-        t for t in all_transactions 
-        if t['username'] == user['username'] 
-        and start_date <= datetime.datetime.strptime(t['date'], '%Y-%m-%d') <= end_date
-    ]
+    report = rollups.monthly_totals(user['username'], today.strftime('%Y-%m'))
 
-    income = sum(float(t['amount']) for t in monthly_transactions if float(t['amount']) > 0)
-    expenses = abs(sum(float(t['amount']) for t in monthly_transactions if float(t['amount']) < 0))
-    net_balance = income - expenses
-
-    categories = {}
-    for transaction in monthly_transactions:
-        category = transaction['category']
-        amount = float(transaction['amount'])
-        if category not in categories:
-            categories[category] = {'total': 0, 'count': 0}
-        categories[category]['total'] += amount
-        categories[category]['count'] += 1
+    income = report['income']
+    expenses = report['expense']
+    net_balance = report['net']
+    categories = report['categories']
     
     # Display report
     clear_screen()
@@ -250,6 +177,9 @@ def monthly_reports(user):
 # ==================== MAIN PROGRAM ====================
 
 def main():
+    # Periodic backups run in the background while the menu is open
+    start_scheduler()
+
     # Login or register
     current_user = user_login_menu()
 
@@ -355,6 +285,9 @@ def main():
                 print("✨ Thank you for using Spendlify! ✨".center(80))
                 print("💰 Keep tracking, keep saving! 💰".center(80))
                 print("=" * 80 + "\n")
+                # Back up this session's changes before the process ends
+                schedule_backup()
+                wait_for_backup()
                 break
             case _:
                 print("\n❌ Invalid choice! Please enter a number between 1 and 15.")
@@ -0,0 +1,64 @@
+import os
+import sys
+from data_handler import create_engine, TRANSACTION_FILE, TRANSACTION_SNAPSHOT
+from storage import migrate
+
+USAGE = """Usage: python migrate.py <command>
+
+Commands:
+  sqlite    Copy the CSV/JSON files in data/ into data/spendlify.db
+  shards    Split data/transactions.csv into one file per user
+  snapshot  Convert data/transactions.csv into the binary data/transactions.snap
+  csv       Rebuild data/transactions.csv from data/transactions.snap
+            (--force to do it even if the CSV changed since the snapshot)
+"""
+
+def migrate_to_sqlite():
+    """One-shot copy of the CSV/JSON data files into the SQLite database"""
+    migrate(create_engine("csv"), create_engine("sqlite"))
+    print("Done. Set SPENDLIFY_STORAGE=sqlite to use the database.")
+
+def migrate_to_shards():
+    """Split the single transactions file into per-user shards"""
+    transactions = create_engine("csv").load("transactions")
+    target = create_engine("sharded")
+    target.save("transactions", transactions)
+    print(f"Split {len(transactions)} transactions into {len(target.load_index())} user shards.")
+    print("Done. Set SPENDLIFY_STORAGE=sharded to use the shards.")
+
+def csv_to_snapshot():
+    """Write the binary snapshot of the transactions file"""
+    count = create_engine("csv").csv_to_binary()
+    print(f"Wrote {count} transactions to {TRANSACTION_SNAPSHOT}.")
+    print("Done. The snapshot is kept up to date from now on; delete it to stop using it.")
+
+def snapshot_to_csv(*options):
+    """Rebuild the transactions file from the binary snapshot"""
+    if not os.path.exists(TRANSACTION_SNAPSHOT):
+        print(f"No snapshot found at {TRANSACTION_SNAPSHOT}.")
+        return 1
+    try:
+        count = create_engine("csv").binary_to_csv(force="--force" in options)
+    except ValueError as e:
+        print(f"{e}. Run with --force to overwrite it anyway.")
+        return 1
+    print(f"Wrote {count} transactions to {TRANSACTION_FILE}.")
+
+COMMANDS = {
+    "sqlite": migrate_to_sqlite,
+    "shards": migrate_to_shards,
+    "snapshot": csv_to_snapshot,
+    "csv": snapshot_to_csv,
+}
+
+# Options each command accepts
+OPTIONS = {"csv": ("--force",)}
+
+def main(argv):
+    if not argv or argv[0] not in COMMANDS or any(o not in OPTIONS.get(argv[0], ()) for o in argv[1:]):
+        print(USAGE)
+        return 1
+    return COMMANDS[argv[0]](*argv[1:]) or 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
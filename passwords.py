@@ -0,0 +1,237 @@
+import os
+import hmac
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# Password hashing. Stored hashes are versioned strings
+#
+#   $scrypt$n=16384,r=8,p=1$<salt hex>$<hash hex>
+#   $pbkdf2_sha256$i=600000$<salt hex>$<hash hex>
+#
+# so the scheme and its parameters can change without breaking existing
+# accounts. Hashes from before this format are a bare unsalted SHA-256 hex
+# digest; they still verify, and needs_rehash() tells the caller to
+# replace them with a hash from the current hasher after a good login.
+
+# The scheme used for new hashes
+PASSWORD_HASHER = os.getenv("SPENDLIFY_PASSWORD_HASHER", "scrypt" if hasattr(hashlib, "scrypt") else "pbkdf2_sha256")
+# scrypt cost: CPU/memory cost n (a power of 2), block size r, parallelism p.
+# Memory per hash is about 128 * n * r bytes (16 MiB with the defaults).
+SCRYPT_N = int(os.getenv("SPENDLIFY_SCRYPT_N", 2 ** 14))
+SCRYPT_R = int(os.getenv("SPENDLIFY_SCRYPT_R", 8))
+SCRYPT_P = int(os.getenv("SPENDLIFY_SCRYPT_P", 1))
+PBKDF2_ITERATIONS = int(os.getenv("SPENDLIFY_PBKDF2_ITERATIONS", 600000))
+SALT_SIZE = 16
+KEY_SIZE = 32
+
+# KDF runs allowed at once per process. Callers still block until their
+# hash is done; the pool only makes extra ones queue, which caps the CPU
+# and the memory scrypt uses during a login burst
+HASH_THREADS = int(os.getenv("SPENDLIFY_HASH_THREADS", os.cpu_count() or 2))
+# Seconds a successful verification is remembered, and how many are kept
+# (0 turns the cache off)
+VERIFY_CACHE_TTL = float(os.getenv("SPENDLIFY_LOGIN_CACHE_TTL", 300))
+VERIFY_CACHE_SIZE = int(os.getenv("SPENDLIFY_LOGIN_CACHE_SIZE", 1024))
+
+class Sha256Hasher:
+    """The legacy unsalted SHA-256 hashes, only ever verified"""
+    scheme = "sha256"
+
+    def identify(self, stored):
+        return len(stored) == 64 and all(c in "0123456789abcdef" for c in stored)
+
+    def verify(self, password, stored):
+        digest = hashlib.sha256(password.encode()).hexdigest()
+        return hmac.compare_digest(digest, stored)
+
+    def params(self):
+        return None
+
+class ScryptHasher:
+    """Salted, memory-hard scrypt from hashlib"""
+    scheme = "scrypt"
+
+    def __init__(self, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P):
+        if n < 2 or n & (n - 1):
+            raise ValueError("scrypt n must be a power of 2")
+        self.n, self.r, self.p = n, r, p
+
+    def identify(self, stored):
+        return stored.startswith(f"${self.scheme}$")
+
+    def params(self):
+        return f"n={self.n},r={self.r},p={self.p}"
+
+    def _derive(self, password, salt, n, r, p):
+        # hashlib refuses more than 32 MiB unless maxmem is raised
+        maxmem = 128 * r * (n + p + 2) + 1024 * 1024
+        return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p,
+                              maxmem=maxmem, dklen=KEY_SIZE)
+
+    def hash(self, password):
+        salt = os.urandom(SALT_SIZE)
+        key = self._derive(password, salt, self.n, self.r, self.p)
+        return f"${self.scheme}${self.params()}${salt.hex()}${key.hex()}"
+
+    def verify(self, password, stored):
+        try:
+            _, _, params, salt, key = stored.split("$")
+            values = dict(item.split("=") for item in params.split(","))
+            derived = self._derive(password, bytes.fromhex(salt),
+                                   int(values["n"]), int(values["r"]), int(values["p"]))
+        except (ValueError, KeyError):
+            return False
+        return hmac.compare_digest(derived.hex(), key)
+
+class Pbkdf2Hasher:
+    """Salted PBKDF2-HMAC-SHA256, for builds of OpenSSL without scrypt"""
+    scheme = "pbkdf2_sha256"
+
+    def __init__(self, iterations=PBKDF2_ITERATIONS):
+        self.iterations = iterations
+
+    def identify(self, stored):
+        return stored.startswith(f"${self.scheme}$")
+
+    def params(self):
+        return f"i={self.iterations}"
+
+    def hash(self, password):
+        salt = os.urandom(SALT_SIZE)
+        key = hashlib.pbkdf2_hmac("sha256", password.encode(), salt, self.iterations, KEY_SIZE)
+        return f"${self.scheme}${self.params()}${salt.hex()}${key.hex()}"
+
+    def verify(self, password, stored):
+        try:
+            _, _, params, salt, key = stored.split("$")
+            iterations = int(params.split("=", 1)[1])
+            derived = hashlib.pbkdf2_hmac("sha256", password.encode(), bytes.fromhex(salt),
+                                          iterations, KEY_SIZE)
+        except (ValueError, IndexError):
+            return False
+        return hmac.compare_digest(derived.hex(), key)
+
+_hashers = {}
+
+def register_hasher(hasher):
+    """Make a hasher available by its scheme name"""
+    _hashers[hasher.scheme] = hasher
+
+register_hasher(Sha256Hasher())
+register_hasher(Pbkdf2Hasher())
+if hasattr(hashlib, "scrypt"):
+    register_hasher(ScryptHasher())
+
+def get_hasher(scheme=None):
+    """The hasher for scheme, by default the one new hashes are made with"""
+    try:
+        return _hashers[scheme or PASSWORD_HASHER]
+    except KeyError:
+        raise ValueError(f"Unknown password hasher: {scheme or PASSWORD_HASHER}")
+
+def identify(stored):
+    """The hasher that made a stored hash, or None"""
+    if not isinstance(stored, str):
+        return None
+    for hasher in _hashers.values():
+        if hasher.identify(stored):
+            return hasher
+    return None
+
+def needs_rehash(stored):
+    """Whether a stored hash is not from the current hasher and parameters"""
+    hasher = identify(stored)
+    current = get_hasher()
+    return hasher is not current or stored.split("$")[2] != current.params()
+
+# ==================== VERIFICATION ====================
+
+_pool = ThreadPoolExecutor(max_workers=HASH_THREADS, thread_name_prefix="kdf")
+
+# Successful verifications, keyed by an HMAC of the stored hash and the
+# password under a key that only lives in this process, so a repeat login
+# skips the KDF. A changed password changes the stored hash and misses.
+_cache_key = os.urandom(32)
+_verified = OrderedDict()
+_verified_lock = threading.Lock()
+
+def _verified_key(password, stored):
+    return hmac.new(_cache_key, f"{stored}\x1f{password}".encode(), hashlib.sha256).digest()
+
+def _check(password, stored):
+    hasher = identify(stored)
+    return hasher is not None and hasher.verify(password, stored)
+
+def hash_password(password):
+    """Hash a new password with the current hasher (blocks until done)"""
+    return _pool.submit(get_hasher().hash, password).result()
+
+def verify_password(password, stored):
+    """Check password against a stored hash of any known scheme.
+
+    The calling thread blocks until the KDF finishes. The hashing pool only
+    caps how many run at once; other threads keep serving requests because
+    hashlib releases the GIL while it works (under gevent it blocks the hub).
+    """
+    if not password or not stored:
+        return False
+    key = _verified_key(password, stored) if VERIFY_CACHE_TTL > 0 else None
+    if key is not None:
+        with _verified_lock:
+            expires = _verified.get(key)
+            if expires is not None and expires > time.monotonic():
+                _verified.move_to_end(key)
+                return True
+
+    ok = _pool.submit(_check, password, stored).result()
+    if ok and key is not None:
+        with _verified_lock:
+            _verified[key] = time.monotonic() + VERIFY_CACHE_TTL
+            _verified.move_to_end(key)
+            while len(_verified) > VERIFY_CACHE_SIZE:
+                _verified.popitem(last=False)
+    return ok
+
+def clear_verify_cache():
+    with _verified_lock:
+        _verified.clear()
+
+# ==================== CALIBRATION ====================
+
+def time_hasher(hasher, repeat=3):
+    """Best time of one hash, in milliseconds"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        hasher.hash("calibration password")
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+def calibrate(target_ms=50.0, r=SCRYPT_R, p=SCRYPT_P, max_n=2 ** 20):
+    """Time scrypt for doubling n on this machine until one hash takes
+    target_ms. Returns ([(n, milliseconds)], the largest n within target_ms)"""
+    results = []
+    n = 2 ** 10
+    while n <= max_n:
+        ms = time_hasher(ScryptHasher(n, r, p))
+        results.append((n, ms))
+        if ms >= target_ms:
+            break
+        n *= 2
+    within = [n for n, ms in results if ms <= target_ms]
+    return results, max(within) if within else results[0][0]
+
+if __name__ == "__main__":
+    import sys
+
+    target = float(sys.argv[1]) if len(sys.argv) > 1 else 50.0
+    if not hasattr(hashlib, "scrypt"):
+        print("hashlib has no scrypt here, new hashes use pbkdf2_sha256")
+        sys.exit(1)
+    results, n = calibrate(target)
+    for size, ms in results:
+        print(f"n={size:<8} {ms:8.1f} ms  {128 * size * SCRYPT_R / 2 ** 20:6.1f} MiB")
+    print(f"\nSPENDLIFY_SCRYPT_N={n}")
@@ -0,0 +1,118 @@
+from data_handler import register_view, get_view, get_engine
+
+# A user's rollup is a dict of cells keyed by (month, currency, type, category)
+# holding [total amount, transaction count]. Every dashboard figure is a sum
+# over cells, so reading it costs O(months x categories) however long the
+# history is, and each write only adjusts the one cell it touches.
+
+def _amount(t):
+    try:
+        return float(t.get('amount', 0.0))
+    except (TypeError, ValueError):
+        return 0.0
+
+def _cell_key(t):
+    return (
+        str(t.get('date', ''))[:7],
+        t.get('currency', 'USD'),
+        t.get('type', '').lower(),
+        t.get('category', 'Other'),
+    )
+
+def _add(cells, t, sign):
+    key = _cell_key(t)
+    cell = cells.get(key)
+    if cell is None:
+        cell = cells[key] = [0.0, 0]
+    cell[0] += sign * _amount(t)
+    cell[1] += sign
+    if cell[1] <= 0:
+        del cells[key]
+
+def build_rollup(transactions):
+    """Build the rollup cells from scratch"""
+    cells = {}
+    for t in transactions:
+        _add(cells, t, 1)
+    return cells
+
+def apply_delta(cells, old, new):
+    """Move one changed transaction between cells"""
+    if old is not None:
+        _add(cells, old, -1)
+    if new is not None:
+        _add(cells, new, 1)
+
+register_view("rollups", build_rollup, apply_delta)
+
+def get_rollup(username):
+    """Return the materialized rollup cells for a user"""
+    return get_view("rollups", username)
+
+def currency_totals(username):
+    """Return (totals, categories) in the shape used by transactions.summarize_transactions"""
+    totals = {}
+    categories = {}
+    for (month, cur, typ, cat), (amount, count) in get_rollup(username).items():
+        cur_totals = totals.get(cur)
+        if cur_totals is None:
+            cur_totals = totals[cur] = {'income': 0.0, 'expense': 0.0, 'net': 0.0}
+        if typ == 'income':
+            cur_totals['income'] += amount
+            cur_totals['net'] += amount
+        else:
+            cur_totals['expense'] += amount
+            cur_totals['net'] -= amount
+            if typ == 'expense':
+                cats = categories.setdefault(cur, {})
+                cats[cat] = cats.get(cat, 0.0) + amount
+    return totals, categories
+
+def monthly_totals(username, month):
+    """Income, expenses and per-category totals/counts for one "YYYY-MM" month"""
+    report = {'income': 0.0, 'expense': 0.0, 'categories': {}}
+    for (cell_month, cur, typ, cat), (amount, count) in get_rollup(username).items():
+        if cell_month != month:
+            continue
+        if typ == 'income':
+            report['income'] += amount
+        else:
+            report['expense'] += amount
+        entry = report['categories'].setdefault(cat, {'total': 0.0, 'count': 0})
+        entry['total'] += amount
+        entry['count'] += count
+    report['net'] = report['income'] - report['expense']
+    return report
+
+def check_rollups(username, tolerance=1e-6):
+    """Rebuild a user's rollup from storage and diff it against the materialized one.
+
+    Returns a list of (cell, materialized, rebuilt) tuples; empty when consistent.
+    """
+    materialized = get_rollup(username)
+    # Read straight from storage so the check does not trust the cache either
+    rebuilt = build_rollup(get_engine().load_for_user("transactions", username))
+    problems = []
+    for key in set(materialized) | set(rebuilt):
+        have = materialized.get(key, [0.0, 0])
+        want = rebuilt.get(key, [0.0, 0])
+        if have[1] != want[1] or abs(have[0] - want[0]) > tolerance:
+            problems.append((key, list(have), list(want)))
+    return sorted(problems)
+
+if __name__ == "__main__":
+    import sys
+    from data_handler import load_users
+
+    usernames = sys.argv[1:] or list(load_users())
+    failed = 0
+    for username in usernames:
+        problems = check_rollups(username)
+        if problems:
+            failed += 1
+            print(f"{username}: {len(problems)} inconsistent cells")
+            for key, have, want in problems:
+                print(f"  {key}: materialized {have}, rebuilt {want}")
+        else:
+            print(f"{username}: OK")
+    sys.exit(1 if failed else 0)
@@ -1,5 +1,8 @@
 import datetime
-from data_handler import load_transactions
+import bisect
+import base64
+import json
+from data_handler import load_transactions, load_transaction_table, register_view, get_view
 
 def _parse_date(d):
     if not d:
@@ -73,27 +76,158 @@ def sort_transactions(transactions, sort_by="date", reverse=False):
 
     return sorted(list(transactions), key=key_fn, reverse=reverse)
 
+# ==================== QUERY ENGINE ====================
+# Searches run on the user's columnar data_handler.TransactionTable, which
+# is cached as a derived view. Dates were parsed once into day ordinals when
+# the table was built, so each predicate is a comparison over a whole column
+# and neither filtering nor sorting calls strptime per row.
+
+class TransactionQueryEngine:
+    """search_transactions over a TransactionTable"""
+
+    def __init__(self, table):
+        self.table = table
+
+    def __len__(self):
+        return len(self.table)
+
+    @property
+    def categories(self):
+        """The categories of the rows, stripped and lower-cased"""
+        return {str(c).strip().lower() for c in self.table.dictionaries["category"].values}
+
+    def query(self, start_date=None, end_date=None, category=None,
+              min_amount=None, max_amount=None, sort_by="date", reverse=False):
+        """Rows matching every given predicate, with the semantics of search_transactions"""
+        predicates = {}
+        if start_date or end_date:
+            # A bound that does not parse still leaves out the undated rows
+            predicates["start"] = _parse_date(start_date) or datetime.date.min
+            predicates["end"] = _parse_date(end_date)
+        if category:
+            predicates["category"] = category
+        if min_amount is not None:
+            predicates["min_amount"] = min_amount
+        if max_amount is not None:
+            predicates["max_amount"] = max_amount
+
+        table = self.table.filter(**predicates) if predicates else self.table
+        if not sort_by:
+            return table.rows()
+        column = sort_by if sort_by in ("amount", "category") else "date"
+        return table.rows(table.argsort(column, reverse))
+
+def get_query_engine(username=None):
+    """The query engine over a user's cached transaction table, or everyone's"""
+    return TransactionQueryEngine(load_transaction_table(username))
+
 def search_transactions(username=None, start_date=None, end_date=None,
                         category=None, min_amount=None, max_amount=None,
                         sort_by="date", reverse=False):
 
-    txs = load_transactions()
-    if username:
-        txs = [t for t in txs if t.get("username") == username]
-
-    if start_date or end_date:
-        txs = search_by_date_range(txs, start_date, end_date)
+    return get_query_engine(username or None).query(start_date, end_date, category,
+                                            min_amount, max_amount, sort_by, reverse)
 
-    if category:
-        txs = filter_by_category(txs, category)
+# ==================== PAGINATION ====================
+# One sorted index per sort key and user, kept as a derived view in
+# data_handler so writes update it with a bisect instead of a full re-sort.
+# A page is a bisect to the cursor plus a slice of `limit` ids.
 
-    if min_amount is not None or max_amount is not None:
-        txs = filter_by_amount_range(txs, min_amount, max_amount)
+SORT_KEYS = ("date", "amount", "category", "created")
 
-    if sort_by:
-        txs = sort_transactions(txs, sort_by=sort_by, reverse=reverse)
-
-    return txs
+def _sort_value(sort_by, t, seq):
+    if sort_by == "amount":
+        try:
+            return float(t.get("amount", 0.0))
+        except Exception:
+            return 0.0
+    if sort_by == "category":
+        return str(t.get("category", "")).lower()
+    if sort_by == "created":
+        return seq
+    return str(t.get("date", ""))
+
+def _index_builder(sort_by):
+    def build(rows):
+        index = {"keys": [], "rows": {}, "seq": {}, "next": len(rows)}
+        for seq, t in enumerate(rows):
+            index["rows"][t["id"]] = t
+            index["seq"][t["id"]] = seq
+            index["keys"].append((_sort_value(sort_by, t, seq), t["id"]))
+        index["keys"].sort()
+        return index
+    return build
+
+def _index_updater(sort_by):
+    def apply(index, old, new):
+        if old is not None:
+            seq = index["seq"].pop(old["id"])
+            key = (_sort_value(sort_by, old, seq), old["id"])
+            i = bisect.bisect_left(index["keys"], key)
+            if i < len(index["keys"]) and index["keys"][i] == key:
+                del index["keys"][i]
+            index["rows"].pop(old["id"], None)
+        if new is not None:
+            if old is not None:
+                index["seq"][new["id"]] = seq
+            else:
+                seq = index["seq"][new["id"]] = index["next"]
+                index["next"] += 1
+            bisect.insort(index["keys"], (_sort_value(sort_by, new, seq), new["id"]))
+            index["rows"][new["id"]] = new
+    return apply
+
+for _key in SORT_KEYS:
+    register_view(f"sorted:{_key}", _index_builder(_key), _index_updater(_key))
+
+def encode_cursor(sort_by, order, key):
+    return base64.urlsafe_b64encode(json.dumps([sort_by, order, *key]).encode()).decode()
+
+# Type of the sort value in a cursor, per sort key
+CURSOR_TYPES = {"date": (str,), "category": (str,), "amount": (int, float), "created": (int,)}
+
+def decode_cursor(cursor, sort_by, order):
+    """The (sort value, id) key in a cursor. The cursor records the sort and
+    order it was made for and is refused for any other, since its key would
+    be compared against another column's keys and skip or repeat rows."""
+    try:
+        made_by, made_order, value, tx_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if made_by not in CURSOR_TYPES or not isinstance(tx_id, str) or isinstance(value, bool) \
+            or not isinstance(value, CURSOR_TYPES[made_by]):
+        raise ValueError("Invalid cursor")
+    if made_by != sort_by or made_order != order:
+        raise ValueError(f"Cursor does not belong to sort={sort_by}&order={order}")
+    return (value, tx_id)
+
+def page_transactions(username, sort_by="date", order="desc", limit=50, cursor=None):
+    """Return (transactions, next_cursor) for one page of a user's history.
+
+    Pages are keyset based: next_cursor encodes the sort key of the last row,
+    so a page costs O(log n + limit) whatever the history length.
+    """
+    if sort_by not in SORT_KEYS:
+        raise ValueError(f"sort must be one of {', '.join(SORT_KEYS)}")
+    if order not in ("asc", "desc"):
+        raise ValueError("order must be 'asc' or 'desc'")
+
+    index = get_view(f"sorted:{sort_by}", username)
+    keys = index["keys"]
+    after = decode_cursor(cursor, sort_by, order) if cursor else None
+
+    if order == "asc":
+        start = bisect.bisect_right(keys, after) if after else 0
+        page = keys[start:start + limit]
+        more = start + limit < len(keys)
+    else:
+        end = bisect.bisect_left(keys, after) if after else len(keys)
+        page = keys[max(end - limit, 0):end][::-1]
+        more = end - limit > 0
+
+    rows = [dict(index["rows"][tx_id]) for _, tx_id in page]
+    next_cursor = encode_cursor(sort_by, order, page[-1]) if more and page else None
+    return rows, next_cursor
 
 def run_search(username=None):
     print("🔍 Search & Filter Transactions:")
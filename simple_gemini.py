@@ -1,44 +1,61 @@
 import os
+import json
+import time
+import uuid
+import hashlib
 import requests
 import datetime
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, Future
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
-from transactions import load_transactions
+from context_builder import build_context
 load_dotenv()
 
 API_KEY = os.getenv("GEMINI_API_KEY")
-API_URL = "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent"
+# Point GEMINI_BASE_URL at a local stub (python gemini_stub.py) to test without the real API
+BASE_URL = os.getenv("GEMINI_BASE_URL", "https://generativelanguage.googleapis.com").rstrip("/")
+MODEL = os.getenv("GEMINI_MODEL", "gemini-2.0-flash")
+API_URL = f"{BASE_URL}/v1beta/models/{MODEL}:generateContent"
 
-def ask_gemini(question, current_user):
+# Seconds to connect and to wait for the answer
+CONNECT_TIMEOUT = float(os.getenv("GEMINI_CONNECT_TIMEOUT", 5))
+READ_TIMEOUT = float(os.getenv("GEMINI_READ_TIMEOUT", 60))
+# Calls to Gemini running at once, and questions accepted but not yet
+# answered (running or queued) per process
+MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", 4))
+MAX_PENDING = int(os.getenv("GEMINI_MAX_PENDING", 32))
+
+# One pooled session, so calls reuse connections instead of a new TLS handshake each
+_session = requests.Session()
+_session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=MAX_CONCURRENCY))
+_session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=MAX_CONCURRENCY))
+
+def build_prompt(question, current_user, context=None):
+    """The question with the user's context in front of it"""
+    if context is None:
+        context = build_context(question, current_user)
+    return "\n".join([context, "", f"User's question: {question}"])
+
+def call_gemini(prompt):
+    """Send one prompt to Gemini and return the answer text, or an error message"""
+    return _generate(prompt)[0]
+
+def _generate(prompt):
+    # (answer, True) or (error message, False)
     headers = {
         "Content-Type": "application/json",
         "X-goog-api-key": API_KEY
     }
 
-    # Load user's transactions
-    all_transactions = load_transactions()
-    user_transactions = [tx for tx in all_transactions if tx['username'] == current_user['username']]
-
-    # Create context with user info and transactions
-    current_date = datetime.datetime.now().strftime("%B %d, %Y")
-    context = f"""Current date: {current_date}
-    User: {current_user['username']}
-    Recent transactions:
-    """
-    # Add last 5 transactions to context
-    for tx in user_transactions[-5:]:
-        context += f"- {tx['date']}: {tx['amount']} {tx['currency']} for {tx['category']}\n"
-
-    # Combine context with user's question
-    full_prompt = f"""{context}
-    User's question: {question}"""
-
     # Prepare the message in Gemini's format
     data = {
         "contents": [
             {
                 "parts": [
                     {
-                        "text": full_prompt
+                        "text": prompt
                     }
                 ]
             }
@@ -47,10 +64,11 @@ def ask_gemini(question, current_user):
 
     try:
         # Send request to Gemini
-        response = requests.post(
+        response = _session.post(
             API_URL,
             headers=headers,
-            json=data
+            json=data,
+            timeout=(CONNECT_TIMEOUT, READ_TIMEOUT)
         )
         
         # Check if request was successful
@@ -61,14 +79,240 @@ def ask_gemini(question, current_user):
         
         # Get the answer text from the response
         answer = result["candidates"][0]["content"]["parts"][0]["text"]
-        return answer
+        return answer, True
 
+    except requests.Timeout:
+        return "Gemini took too long to answer. Please try again.", False
     except requests.RequestException as e:
-        return f"Error connecting to Gemini: {str(e)}"
+        return f"Error connecting to Gemini: {str(e)}", False
     except KeyError as e:
-        return f"Error parsing Gemini response: {str(e)}"
+        return f"Error parsing Gemini response: {str(e)}", False
+    except Exception as e:
+        return f"Unexpected error: {str(e)}", False
+
+def ask_gemini(question, current_user):
+    """Answer a question, from the response cache when the same question
+    was asked recently with the same context"""
+    username = current_user['username']
+    context = build_context(question, current_user)
+    key = cache_key(question, username, context)
+    _count("requests")
+
+    answer = _responses.get(key)
+    if answer is not None:
+        _count("hits")
+        _count("saved_seconds", _average_call())
+        return answer
+
+    with _inflight_lock:
+        future = _inflight.get(key)
+        leader = future is None
+        if leader:
+            future = _inflight[key] = Future()
+    if not leader:
+        # The same question is already on its way to Gemini
+        _count("coalesced")
+        _count("saved_seconds", _average_call())
+        return future.result()
+
+    try:
+        start = time.perf_counter()
+        answer, ok = _generate(build_prompt(question, current_user, context))
+        _count("upstream_calls")
+        _count("upstream_seconds", time.perf_counter() - start)
+        if ok:
+            _responses.put(key, answer)
+        else:
+            _count("errors")
+        future.set_result(answer)
+        return answer
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    finally:
+        with _inflight_lock:
+            del _inflight[key]
+
+
+# ==================== RESPONSE CACHE ====================
+# Answers are cached by user, day, normalized question and the context in
+# the prompt, so a repeat is only served while the
+# context Gemini saw is unchanged. Identical questions arriving while one
+# is in flight wait for that call instead of making their own.
+
+# Seconds an answer stays valid and the number of answers kept
+CACHE_TTL = float(os.getenv("GEMINI_CACHE_TTL", 300))
+CACHE_SIZE = int(os.getenv("GEMINI_CACHE_SIZE", 256))
+
+class ResponseCache:
+    """LRU cache whose entries also expire ttl seconds after being stored"""
+
+    def __init__(self, maxsize=CACHE_SIZE, ttl=CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+def normalize_question(question):
+    """Case and whitespace do not change the question"""
+    return " ".join(str(question).lower().split())
+
+def cache_key(question, username, context):
+    """Cache key of a question asked with this context"""
+    parts = [username, datetime.date.today().isoformat(), normalize_question(question), context]
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+_responses = ResponseCache()
+_inflight = {}
+_inflight_lock = threading.Lock()
+_metrics = {"requests": 0, "hits": 0, "coalesced": 0, "upstream_calls": 0, "errors": 0,
+            "upstream_seconds": 0.0, "saved_seconds": 0.0}
+_metrics_lock = threading.Lock()
+
+def _count(name, amount=1):
+    with _metrics_lock:
+        _metrics[name] += amount
+
+def _average_call():
+    with _metrics_lock:
+        calls = _metrics["upstream_calls"]
+        return _metrics["upstream_seconds"] / calls if calls else 0.0
+
+def get_cache_metrics():
+    """Response cache counters of this process, with hit ratio and the
+    upstream time saved (answers not fetched x average call latency)"""
+    with _metrics_lock:
+        metrics = dict(_metrics)
+    served = metrics["hits"] + metrics["coalesced"]
+    metrics["hit_ratio"] = served / metrics["requests"] if metrics["requests"] else 0.0
+    metrics["average_call_seconds"] = (metrics["upstream_seconds"] / metrics["upstream_calls"]
+                                       if metrics["upstream_calls"] else 0.0)
+    metrics["entries"] = len(_responses)
+    return metrics
+
+
+# ==================== BACKGROUND JOBS ====================
+# The web app does not wait for Gemini inside a request. submit_question()
+# queues the question on a small thread pool and returns a job id at once;
+# the page polls get_job() until the answer is there. Jobs are kept as
+# files under JOBS_DIR so a poll can be answered by any worker process.
+
+JOBS_DIR = "data/ai_jobs/"
+# Finished jobs older than this many seconds are deleted
+JOB_TTL = 3600
+
+_executor = ThreadPoolExecutor(max_workers=MAX_CONCURRENCY, thread_name_prefix="gemini")
+_pending = threading.BoundedSemaphore(MAX_PENDING)
+
+def _job_path(job_id):
+    return os.path.join(JOBS_DIR, f"{job_id}.json")
+
+def _save_job(job):
+    os.makedirs(JOBS_DIR, exist_ok=True)
+    path = _job_path(job["id"])
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(job, f)
+    os.replace(tmp, path)
+
+def get_job(job_id, username):
+    """The job with job_id if it belongs to username, else None"""
+    # Job ids are uuid4 hex; anything else could point outside JOBS_DIR
+    if not job_id.isalnum():
+        return None
+    try:
+        with open(_job_path(job_id), "r") as f:
+            job = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return job if job.get("username") == username else None
+
+def _expire_jobs():
+    # Only finished jobs go; pending ones may still be polled and .tmp
+    # files are being written by another worker
+    now = time.time()
+    try:
+        names = os.listdir(JOBS_DIR)
+    except OSError:
+        return
+    for name in names:
+        if not name.endswith(".json"):
+            continue
+        path = os.path.join(JOBS_DIR, name)
+        try:
+            # A finished job was last written when it finished
+            if now - os.path.getmtime(path) <= JOB_TTL:
+                continue
+            with open(path, "r") as f:
+                job = json.load(f)
+            if job.get("status") in ("done", "error") and now - job.get("finished", now) > JOB_TTL:
+                os.remove(path)
+        except (OSError, ValueError, TypeError, AttributeError):
+            pass
+
+def _run_job(job, question, current_user):
+    try:
+        job["response"] = ask_gemini(question, current_user)
+        job["status"] = "done"
+    except Exception as e:
+        job["response"] = f"Unexpected error: {str(e)}"
+        job["status"] = "error"
+    finally:
+        _pending.release()
+    job["finished"] = time.time()
+    try:
+        _save_job(job)
     except Exception as e:
-        return f"Unexpected error: {str(e)}"
+        print(f"Error saving AI job {job['id']}: {e}")
+        # Without this the poll would see the job pending forever
+        try:
+            _save_job({**job, "status": "error", "response": f"Could not save the answer: {e}"})
+        except Exception:
+            pass
+
+def submit_question(question, current_user):
+    """Queue a question for Gemini and return its job, or None when
+    MAX_PENDING questions are already waiting"""
+    if not _pending.acquire(blocking=False):
+        return None
+    job = {"id": uuid.uuid4().hex, "username": current_user["username"],
+           "status": "pending", "created": time.time()}
+    try:
+        _expire_jobs()
+        _save_job(job)
+        _executor.submit(_run_job, dict(job), question, current_user)
+    except Exception:
+        _pending.release()
+        raise
+    return job
 
 def main(current_user=None):
     print("Simple Gemini Chat")
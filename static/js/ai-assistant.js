@@ -28,11 +28,14 @@ async function sendMessage() {
 
         const data = await response.json();
 
+        // The server answers in the background; poll until it is done
+        const answer = response.ok ? await waitForAnswer(data.job_id) : data.message;
+
         // Remove loading message
         document.getElementById(loadingId)?.remove();
 
         // Add AI response
-        addChatMessage(data.response, 'ai');
+        addChatMessage(answer, 'ai');
 
     } catch (error) {
         document.getElementById(loadingId)?.remove();
@@ -40,6 +43,20 @@ async function sendMessage() {
     }
 }
 
+const CHAT_POLL_INTERVAL = 1000;
+const CHAT_POLL_LIMIT = 120;
+
+async function waitForAnswer(jobId) {
+    for (let i = 0; i < CHAT_POLL_LIMIT; i++) {
+        await new Promise(resolve => setTimeout(resolve, CHAT_POLL_INTERVAL));
+        const response = await fetch(`/api/ai/chat/${jobId}`);
+        const job = await response.json();
+        if (!response.ok) return job.message;
+        if (job.status !== 'pending') return job.response;
+    }
+    return 'Sorry, the assistant took too long to answer. Please try again.';
+}
+
 function addChatMessage(text, type, id = null) {
     const container = document.getElementById('chatMessages');
     const div = document.createElement('div');
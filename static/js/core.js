@@ -1,6 +1,7 @@
 // Global variables
 let currentSection = 'dashboard';
 let transactions = [];
+const TRANSACTIONS_PAGE_SIZE = 50;
 let goals = [];
 let reminders = [];
 let currency = 'USD';
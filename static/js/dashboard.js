@@ -42,9 +42,8 @@ async function loadDashboardData() {
         document.getElementById('top-categories').innerHTML = categoriesHtml;
 
         // Load recent transactions for dashboard
-        const txResponse = await fetch('/api/transactions');
-        const allTx = await txResponse.json();
-        const recentTx = allTx.slice(-5).reverse();
+        const recentResponse = await fetch('/api/transactions?limit=5&sort=created&order=desc');
+        const recentTx = (await recentResponse.json()).transactions || [];
 
         const recentHtml = recentTx.length > 0
             ? `<div class="table-container"><table>
@@ -71,9 +70,17 @@ async function loadDashboardData() {
 
         document.getElementById('recent-transactions').innerHTML = recentHtml;
 
-        // Render charts
-        renderCategoryChart(data.top_categories, allTx);
-        renderTrendChart(allTx);
+        // Render charts from server-side aggregates; the trend only asks for
+        // the months it shows, from the first day of the month 5 months back
+        const now = new Date();
+        const since = new Date(now.getFullYear(), now.getMonth() - 5, 1);
+        const trendStart = `${since.getFullYear()}-${String(since.getMonth() + 1).padStart(2, '0')}-01`;
+        const [categoryResponse, trendResponse] = await Promise.all([
+            fetch('/api/charts/categories'),
+            fetch(`/api/charts/trend?interval=month&start=${trendStart}`)
+        ]);
+        renderCategoryChart((await categoryResponse.json()).categories || []);
+        renderTrendChart(await trendResponse.json());
 
         // Load dashboard reminders
         await loadDashboardReminders();
@@ -84,7 +91,7 @@ async function loadDashboardData() {
 }
 
 // Render Category Pie Chart
-function renderCategoryChart(categories, transactions) {
+function renderCategoryChart(categories) {
     const ctx = document.getElementById('categoryChart');
     if (!ctx) return;
 
@@ -93,18 +100,9 @@ function renderCategoryChart(categories, transactions) {
         categoryChart.destroy();
     }
 
-    // Get expense transactions only
-    const expenses = transactions.filter(tx => tx.type === 'expense');
-    
-    // Group by category
-    const categoryData = {};
-    expenses.forEach(tx => {
-        const cat = tx.category || 'Other';
-        categoryData[cat] = (categoryData[cat] || 0) + parseFloat(tx.amount);
-    });
-
-    const labels = Object.keys(categoryData);
-    const data = Object.values(categoryData);
+    // Expense totals per category, already summed by the server
+    const labels = categories.map(c => c.category);
+    const data = categories.map(c => c.total);
 
     if (labels.length === 0) {
         ctx.parentElement.innerHTML = '<div class="empty-state" style="padding: 40px;"><p>No expense data to visualize</p></div>';
@@ -159,7 +157,7 @@ function renderCategoryChart(categories, transactions) {
 }
 
 // Render Monthly Trend Line Chart
-function renderTrendChart(transactions) {
+function renderTrendChart(series) {
     const ctx = document.getElementById('trendChart');
     if (!ctx) return;
 
@@ -168,39 +166,22 @@ function renderTrendChart(transactions) {
         trendChart.destroy();
     }
 
-    if (transactions.length === 0) {
+    if (!series.labels || series.labels.length === 0) {
         ctx.parentElement.innerHTML = '<div class="empty-state" style="padding: 40px;"><p>No transaction data to visualize</p></div>';
         return;
     }
 
-    // Group transactions by month
-    const monthlyData = {};
-    transactions.forEach(tx => {
-        const date = new Date(tx.date);
-        const monthKey = `${date.getFullYear()}-${String(date.getMonth() + 1).padStart(2, '0')}`;
-        
-        if (!monthlyData[monthKey]) {
-            monthlyData[monthKey] = { income: 0, expense: 0 };
-        }
-        
-        const amount = parseFloat(tx.amount);
-        if (tx.type === 'income') {
-            monthlyData[monthKey].income += amount;
-        } else {
-            monthlyData[monthKey].expense += amount;
-        }
-    });
-
-    // Sort by month and get last 6 months
-    const sortedMonths = Object.keys(monthlyData).sort().slice(-6);
+    // Monthly buckets of the last 6 months arrive sorted; keep at most 6
+    // in case some are dated in the future
+    const sortedMonths = series.labels.slice(-6);
     const labels = sortedMonths.map(m => {
         const [year, month] = m.split('-');
         const date = new Date(year, month - 1);
         return date.toLocaleDateString('en-US', { month: 'short', year: 'numeric' });
     });
 
-    const incomeData = sortedMonths.map(m => monthlyData[m].income);
-    const expenseData = sortedMonths.map(m => monthlyData[m].expense);
+    const incomeData = series.income.slice(-6);
+    const expenseData = series.expense.slice(-6);
 
     trendChart = new Chart(ctx, {
         type: 'line',
@@ -1,10 +1,18 @@
-async function loadTransactions() {
+let transactionsCursor = null;
+
+async function loadTransactions(append = false) {
     try {
-        const response = await fetch('/api/transactions');
+        let url = `/api/transactions?sort=date&order=desc&limit=${TRANSACTIONS_PAGE_SIZE}`;
+        if (append && transactionsCursor) {
+            url += `&cursor=${encodeURIComponent(transactionsCursor)}`;
+        }
+        const response = await fetch(url);
         if (!response.ok) {
             throw new Error('Failed to load transactions');
         }
-        transactions = await response.json();
+        const page = await response.json();
+        transactions = append ? transactions.concat(page.transactions) : page.transactions;
+        transactionsCursor = page.next_cursor;
         renderTransactions();
     } catch (error) {
         console.error('Error loading transactions:', error);
@@ -15,6 +23,10 @@ async function loadTransactions() {
     }
 }
 
+function loadMoreTransactions() {
+    loadTransactions(true);
+}
+
 function renderTransactions() {
     const tbody = document.getElementById('transactions-tbody');
 
@@ -23,17 +35,18 @@ function renderTransactions() {
         return;
     }
 
+    const loadMore = document.getElementById('transactions-load-more');
+    if (loadMore) {
+        loadMore.style.display = transactionsCursor ? '' : 'none';
+    }
+
     if (!transactions || transactions.length === 0) {
         tbody.innerHTML = '<tr><td colspan="7" class="empty-state"><div class="icon">💳</div><p>No transactions yet</p></td></tr>';
         return;
     }
 
-    // Sort by date (newest first)
-    const sortedTransactions = [...transactions].sort((a, b) => {
-        return new Date(b.date) - new Date(a.date);
-    });
-
-    tbody.innerHTML = sortedTransactions.map(tx => {
+    // Rows arrive sorted by date (newest first) from the server
+    tbody.innerHTML = transactions.map(tx => {
         // Safely escape JSON for HTML attribute
         const txJson = JSON.stringify(tx).replace(/"/g, '&quot;');
         return `
@@ -202,7 +215,16 @@ async function importCSV(event) {
 
             if (response.ok) {
                 const result = await response.json();
-                alert(`Successfully imported ${result.count || 0} transactions!`);
+                let message = result.partial
+                    ? `Imported ${result.count || 0} transactions, then stopped:\n${result.error}`
+                    : `Successfully imported ${result.count || 0} transactions!`;
+                if (result.duplicates) {
+                    message += `\n\nSkipped ${result.duplicates} duplicate rows already in your history.`;
+                }
+                if (result.skipped) {
+                    message += `\n\nSkipped ${result.skipped} invalid rows:\n${(result.warnings || []).join('\n')}`;
+                }
+                alert(message);
                 await loadTransactions();
                 await loadDashboardData();
             } else {
@@ -0,0 +1,1522 @@
+import os
+import gc
+import sys
+import json
+import csv
+import re
+import mmap
+import struct
+import hashlib
+import sqlite3
+import threading
+import contextlib
+from array import array
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except ImportError:
+    pa = pa_csv = None
+
+TRANSACTION_FIELDS = [
+    "id", "username", "amount", "currency",
+    "category", "date", "description", "type", "payment"
+]
+GOAL_FIELDS = [
+    "id", "username", "title", "target_amount",
+    "current_amount", "deadline", "status"
+]
+REMINDER_FIELDS = ["id", "username", "title", "amount", "deadline"]
+
+FIELDS = {
+    "transactions": TRANSACTION_FIELDS,
+    "goals": GOAL_FIELDS,
+    "reminders": REMINDER_FIELDS,
+}
+
+# Labels used in the error messages of the JSON loaders
+_LABELS = {
+    "users": ("users", "user data"),
+    "goals": ("goals", "goal data"),
+    "reminders": ("reminders", "reminders data"),
+}
+
+
+def _ensure_dir(path):
+    folder = os.path.dirname(path)
+    if folder and not os.path.exists(folder):
+        os.makedirs(folder)
+
+
+def _stat(path):
+    """Return (mtime_ns, size) of a file, or None when it does not exist"""
+    try:
+        st = os.stat(path)
+        return (st.st_mtime_ns, st.st_size)
+    except OSError:
+        return None
+
+
+def _replace_file(write, path):
+    """Write a file next to path, flush it to disk, then move it over path in
+    one step, so a crash leaves either the old or the new file"""
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        write(tmp)
+        with open(tmp, "rb+") as f:
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    if hasattr(os, "O_DIRECTORY"):
+        # Make the rename itself durable
+        fd = os.open(os.path.dirname(path) or ".", os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+def _write_json(data, path):
+    def write(tmp):
+        with open(tmp, "w") as file:
+            json.dump(data, file, indent=2)
+
+    _ensure_dir(path)
+    _replace_file(write, path)
+
+
+class FileLock:
+    """Advisory lock on path + ".lock" for read-modify-write sequences.
+
+    Held by one thread of one process at a time and re-entrant for that
+    thread. Other processes are kept out with flock, where the platform has
+    it; elsewhere only the threads of this process are serialized.
+    """
+
+    def __init__(self, path):
+        self.path = path + ".lock"
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._file = None
+
+    def __enter__(self):
+        self._lock.acquire()
+        try:
+            if self._depth == 0:
+                _ensure_dir(self.path)
+                self._file = open(self.path, "a")
+                if fcntl is not None:
+                    fcntl.flock(self._file, fcntl.LOCK_EX)
+        except BaseException:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            self._lock.release()
+            raise
+        self._depth += 1
+        return self
+
+    def __exit__(self, *exc):
+        self._depth -= 1
+        if self._depth == 0:
+            if fcntl is not None:
+                fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+        self._lock.release()
+
+
+_file_locks = {}
+_file_locks_lock = threading.Lock()
+
+
+def file_lock(path):
+    """The process-wide FileLock for path"""
+    key = os.path.abspath(path)
+    with _file_locks_lock:
+        lock = _file_locks.get(key)
+        if lock is None:
+            lock = _file_locks[key] = FileLock(path)
+        return lock
+
+
+def content_hash(row):
+    """Hash of what makes two transactions the same statement line:
+    username, date, amount, currency and description"""
+    try:
+        amount = f"{float(row.get('amount') or 0.0):.2f}"
+    except (TypeError, ValueError):
+        amount = str(row.get("amount"))
+    key = "\x1f".join([
+        str(row.get("username", "")),
+        str(row.get("date", "")),
+        amount,
+        str(row.get("currency", "")).upper(),
+        str(row.get("description", "")).strip(),
+    ])
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+
+def _chunks(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _find_index(rows, row_id):
+    for i, r in enumerate(rows):
+        if r.get("id") == row_id:
+            return i
+    return -1
+
+
+def read_csv_columns(path):
+    """Parse a transactions CSV file straight into columns.
+
+    Returns {field: list of values} with amounts as floats. As with the row
+    loader, a missing payment column reads as "cash" and an empty amount as
+    0.0; other missing fields read as "". Uses pyarrow's multithreaded CSV
+    reader when it is installed and csv.reader otherwise.
+    """
+    if pa_csv is not None:
+        try:
+            return _finish_columns(*_read_columns_arrow(path))
+        except Exception:
+            # Ragged rows and other oddities pyarrow rejects
+            pass
+
+    # The rows are millions of short-lived lists without cycles; letting the
+    # cyclic collector rescan them while they pile up more than doubles the
+    # parse time
+    collecting = gc.isenabled()
+    gc.disable()
+    try:
+        with open(path, mode="r", newline='', encoding="utf-8") as file:
+            reader = csv.reader(file)
+            header = next(reader, [])
+            width = len(header)
+            rows = [r if len(r) == width else (r + [None] * width)[:width] for r in reader if r]
+        # Later duplicate headers win, like DictReader
+        positions = {name: i for i, name in enumerate(header)}
+        count = len(rows)
+        values = list(zip(*rows)) if rows else [()] * width
+        del rows
+        columns = {name: list(values[i]) for name, i in positions.items()}
+        return _finish_columns(columns, count)
+    finally:
+        if collecting:
+            gc.enable()
+
+
+def read_csv_rows(path):
+    """Rows of a transactions CSV file parsed by pyarrow's CSV reader.
+
+    Gives the same rows as FileStorage's csv.reader loop. Returns None
+    when pyarrow is not installed, or when the file needs the row reader:
+    ragged rows, missing columns other than payment, or bad amounts.
+    """
+    if pa_csv is None:
+        return None
+    # As in read_csv_columns, the rows are short-lived dicts without cycles
+    collecting = gc.isenabled()
+    gc.disable()
+    try:
+        try:
+            columns, count = _read_columns_arrow(path)
+            if any(f not in columns for f in TRANSACTION_FIELDS if f != "payment"):
+                return None
+            columns = _finish_columns(columns, count)
+        except Exception:
+            return None
+        names = list(columns)
+        return [dict(zip(names, values)) for values in zip(*columns.values())]
+    finally:
+        if collecting:
+            gc.enable()
+
+
+def _read_columns_arrow(path):
+    with open(path, "rb") as f:
+        header = next(csv.reader([f.readline().decode("utf-8")]), [])
+    if len(set(header)) != len(header):
+        raise ValueError("duplicate column names")
+    table = pa_csv.read_csv(
+        path,
+        parse_options=pa_csv.ParseOptions(newlines_in_values=True),
+        convert_options=pa_csv.ConvertOptions(
+            column_types={name: pa.string() for name in header},
+            strings_can_be_null=False,
+        ),
+    )
+    return {name: table.column(name).to_pylist() for name in header}, table.num_rows
+
+
+def _finish_columns(columns, count):
+    for field in TRANSACTION_FIELDS:
+        if field not in columns:
+            columns[field] = ["cash" if field == "payment" else ""] * count
+    columns["amount"] = [float(a) if a else 0.0 for a in columns["amount"]]
+    return columns
+
+
+# ==================== BINARY SNAPSHOT ====================
+# A copy of transactions.csv that can be memory-mapped and used without
+# parsing any text:
+#
+#   header    SNAPSHOT_HEADER: magic, version, row count, string count, the
+#             (mtime_ns, size) of the CSV it was made from and the offsets
+#             of the two sections below
+#   records   one fixed-width SNAPSHOT_RECORD per transaction, fields in
+#             TRANSACTION_FIELDS order: amount as float64, everything else
+#             as a uint32 index into the string table
+#   strings   string count + 1 little-endian uint32 byte offsets followed by
+#             the UTF-8 text of every distinct string
+#
+# String 0 stands for None (the padding of short CSV rows), so every row
+# the CSV loader returns comes back exactly.
+
+SNAPSHOT_MAGIC = b"SPNDSNAP"
+SNAPSHOT_VERSION = 1
+SNAPSHOT_HEADER = struct.Struct("<8sIIIqqQQ")
+SNAPSHOT_RECORD = struct.Struct("<IId" + "I" * (len(TRANSACTION_FIELDS) - 3))
+
+
+def write_binary_snapshot(rows, path, source=None):
+    """Write the transaction fields of rows as a binary snapshot.
+
+    source is the (mtime_ns, size) of the CSV file the snapshot mirrors;
+    readers that pass a different one get nothing back.
+    """
+    codes = {None: 0}
+    code = codes.setdefault
+    pack = SNAPSHOT_RECORD.pack
+    records = bytearray()
+    for t in rows:
+        amount = t.get("amount")
+        records += pack(
+            code(t.get("id"), len(codes)),
+            code(t.get("username"), len(codes)),
+            float(amount) if amount not in (None, "") else 0.0,
+            code(t.get("currency"), len(codes)),
+            code(t.get("category"), len(codes)),
+            code(t.get("date"), len(codes)),
+            code(t.get("description"), len(codes)),
+            code(t.get("type"), len(codes)),
+            code(t.get("payment"), len(codes)),
+        )
+
+    text = [b""] + [str(s).encode("utf-8") for s in list(codes)[1:]]
+    offsets = array("I", [0])
+    for data in text:
+        offsets.append(offsets[-1] + len(data))
+    if sys.byteorder != "little":
+        offsets.byteswap()
+
+    mtime, size = source or (-1, -1)
+    records_offset = SNAPSHOT_HEADER.size
+    strings_offset = records_offset + len(records)
+    _ensure_dir(path)
+    with open(path, "wb") as f:
+        f.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION,
+                                     len(records) // SNAPSHOT_RECORD.size, len(text),
+                                     mtime, size, records_offset, strings_offset))
+        f.write(records)
+        f.write(offsets.tobytes())
+        f.write(b"".join(text))
+
+
+class BinarySnapshot:
+    """Read-only, memory-mapped binary snapshot"""
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            (magic, version, self.count, self.string_count, mtime, size,
+             self.records_offset, strings_offset) = SNAPSHOT_HEADER.unpack_from(self.map)
+            if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+                raise ValueError(f"{path} is not a transactions snapshot")
+            self.source = (mtime, size) if mtime >= 0 else None
+            self.text_offset = strings_offset + 4 * (self.string_count + 1)
+            self.offsets = array("I", self.map[strings_offset:self.text_offset])
+            if sys.byteorder != "little":
+                self.offsets.byteswap()
+        except Exception:
+            self.map.close()
+            raise
+        self._strings = None
+
+    def close(self):
+        self.map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.count
+
+    def strings(self):
+        """The decoded string table, string 0 being None"""
+        if self._strings is None:
+            text = self.map[self.text_offset:self.text_offset + self.offsets[-1]]
+            offsets = self.offsets
+            strings = [text[offsets[i]:offsets[i + 1]].decode("utf-8")
+                       for i in range(self.string_count)]
+            strings[0] = None
+            self._strings = strings
+        return self._strings
+
+    def records(self):
+        """Iterate over the raw record tuples"""
+        end = self.records_offset + self.count * SNAPSHOT_RECORD.size
+        return SNAPSHOT_RECORD.iter_unpack(self.map[self.records_offset:end])
+
+    def rows(self):
+        """All transactions as dicts, the same rows the CSV loader returns"""
+        strings = self.strings()
+        return [{
+            "id": strings[id_],
+            "username": strings[username],
+            "amount": amount,
+            "currency": strings[currency],
+            "category": strings[category],
+            "date": strings[date],
+            "description": strings[description],
+            "type": strings[type_],
+            "payment": strings[payment],
+        } for (id_, username, amount, currency, category, date, description,
+               type_, payment) in self.records()]
+
+    def columns(self):
+        """All transactions as {field: list of values}, like read_csv_columns"""
+        strings = self.strings()
+        values = list(zip(*self.records())) or [()] * len(TRANSACTION_FIELDS)
+        return {field: list(column) if field == "amount" else list(map(strings.__getitem__, column))
+                for field, column in zip(TRANSACTION_FIELDS, values)}
+
+
+def read_binary_snapshot(path, source=None):
+    """Rows of the snapshot at path, or None when it is missing, unreadable
+    or (if source is given) was made from another version of the CSV"""
+    try:
+        with BinarySnapshot(path) as snapshot:
+            if source is not None and snapshot.source != source:
+                return None
+            return snapshot.rows()
+    except (OSError, ValueError, struct.error):
+        return None
+
+
+# ==================== APPEND-ONLY LOG ====================
+
+class AppendLog:
+    """Keyed rows stored as a snapshot file plus an append-only change log.
+
+    Every write appends one JSON line ("put", "update" or "delete") to the
+    log, so its cost does not depend on how many rows exist. Loads read the
+    snapshot and replay the log on top of it. Once the log grows past
+    threshold bytes a background thread folds it into a new snapshot.
+
+    Appends, loads and file swaps hold a FileLock on the log, so several
+    processes can share the files.
+    """
+
+    def __init__(self, snapshot_file, log_file, read_snapshot, write_snapshot,
+                 key="id", threshold=1024 * 1024, iter_snapshot=None):
+        self.snapshot_file = snapshot_file
+        self.log_file = log_file
+        self.pending_file = log_file + ".compacting"
+        self.read_snapshot = read_snapshot
+        self.write_snapshot = write_snapshot
+        # iter_snapshot(file) yields the rows of an open snapshot file
+        self.iter_snapshot = iter_snapshot
+        self.key = key
+        self.threshold = threshold
+        self.lock = file_lock(log_file)
+        self._compactor_lock = threading.Lock()
+        self._compactor = None
+
+    def files(self):
+        return (self.snapshot_file, self.pending_file, self.log_file)
+
+    def append(self, op, rows):
+        """Append one record per row, op is "put", "update" or "delete" """
+        lines = "".join(json.dumps({"op": op, "row": r}) + "\n" for r in rows)
+        with self.lock:
+            _ensure_dir(self.log_file)
+            with open(self.log_file, "a", encoding="utf-8") as f:
+                f.write(lines)
+                size = f.tell()
+        if self.threshold and size > self.threshold:
+            self.compact_async()
+
+    def load(self):
+        with self.lock:
+            return self._replay(self.read_snapshot(self.snapshot_file),
+                                (self.pending_file, self.log_file))
+
+    def changes_since(self, fingerprint):
+        """(records, fingerprint) with the log records appended since the
+        files had fingerprint (a tuple of _stat for files()), or None when
+        the snapshot was rewritten or compaction started since"""
+        with self.lock:
+            now = tuple(_stat(path) for path in self.files())
+            if fingerprint is None or len(fingerprint) != 3 or now[:2] != fingerprint[:2]:
+                return None
+            before, after = fingerprint[2], now[2]
+            offset = before[1] if before is not None else 0
+            if after is None or after[1] < offset:
+                return None
+            records = []
+            if after != before:
+                with open(self.log_file, "rb") as f:
+                    f.seek(offset)
+                    for line in f:
+                        try:
+                            records.append(json.loads(line))
+                        except ValueError:
+                            continue
+            return records, now
+
+    def iter_rows(self):
+        """Yield the same rows as load(), in the same order, one at a time.
+
+        Only the log is held in memory, the snapshot is streamed. Rows whose
+        key appears in the log are resolved by replaying their log records
+        twice, once assuming the snapshot has the key and once assuming it
+        does not, and picking the outcome that matches the snapshot.
+        """
+        with self.lock:
+            # Compaction swaps files under the same lock, so the logs and the
+            # snapshot handle below are one consistent state
+            records = []
+            for path in (self.pending_file, self.log_file):
+                if os.path.exists(path):
+                    with open(path, "r", encoding="utf-8") as f:
+                        for line in f:
+                            try:
+                                record = json.loads(line)
+                            except ValueError:
+                                continue
+                            records.append(record)
+            snapshot = (open(self.snapshot_file, "r", newline="", encoding="utf-8")
+                        if os.path.exists(self.snapshot_file) else None)
+
+        # key -> {in snapshot?: (present, appended at seq or None, row or None)}
+        outcomes = {}
+        for seq, record in enumerate(records):
+            op, row = record.get("op"), record.get("row", {})
+            key = row.get(self.key)
+            states = outcomes.setdefault(key, {True: (True, None, None), False: (False, None, None)})
+            for start, (present, appended, value) in states.items():
+                if op == "put":
+                    states[start] = (True, appended if present else seq, row)
+                elif op == "update" and present:
+                    states[start] = (True, appended, row)
+                elif op == "delete":
+                    states[start] = (False, None, None)
+
+        try:
+            if snapshot is not None:
+                for row in self.iter_snapshot(snapshot):
+                    key = row.get(self.key)
+                    states = outcomes.get(key)
+                    if states is None:
+                        yield row
+                        continue
+                    states[False] = None  # the key is in the snapshot
+                    present, appended, value = states[True]
+                    if present and appended is None:
+                        yield value if value is not None else row
+        finally:
+            if snapshot is not None:
+                snapshot.close()
+
+        tail = []
+        for key, states in outcomes.items():
+            present, appended, value = states[True] if states[False] is None else states[False]
+            if present and appended is not None:
+                tail.append((appended, value))
+        tail.sort(key=lambda item: item[0])
+        for _, value in tail:
+            yield value
+
+    def reset(self, rows):
+        """Replace everything with rows and start an empty log"""
+        with self.lock:
+            _replace_file(lambda tmp: self.write_snapshot(rows, tmp), self.snapshot_file)
+            for path in (self.pending_file, self.log_file):
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def compact_async(self):
+        """Start a background compaction unless one is already running"""
+        with self._compactor_lock:
+            if self._compactor is not None and self._compactor.is_alive():
+                return
+            self._compactor = threading.Thread(target=self.compact, daemon=True)
+            self._compactor.start()
+
+    def compact(self):
+        """Fold the log into a new snapshot"""
+        try:
+            with self.lock:
+                if not os.path.exists(self.pending_file):
+                    if not os.path.exists(self.log_file):
+                        return
+                    # New writes go to a fresh log while we fold the old one
+                    os.replace(self.log_file, self.pending_file)
+                before = (_stat(self.snapshot_file), _stat(self.pending_file))
+
+            # Replayed without the lock so writers are not held up
+            rows = self._replay(self.read_snapshot(self.snapshot_file), (self.pending_file,))
+
+            with self.lock:
+                if (_stat(self.snapshot_file), _stat(self.pending_file)) != before:
+                    # A reset or another process's compaction got there first
+                    return
+                _replace_file(lambda tmp: self.write_snapshot(rows, tmp), self.snapshot_file)
+                os.remove(self.pending_file)
+        except Exception as e:
+            print(f"Error compacting {self.log_file}: {e}")
+
+    def _replay(self, rows, logs):
+        index = {r.get(self.key): r for r in rows}
+        for path in logs:
+            if not os.path.exists(path):
+                continue
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # Torn line from an interrupted write
+                        continue
+                    op, row = record.get("op"), record.get("row", {})
+                    key = row.get(self.key)
+                    if op == "put" or (op == "update" and key in index):
+                        index[key] = row
+                    elif op == "delete":
+                        index.pop(key, None)
+        return list(index.values())
+
+
+# ==================== CONTENT HASH INDEX ====================
+
+class HashIndex:
+    """Content hashes (content_hash) of the rows of an AppendLog, for the
+    duplicate checks of imports.
+
+    The {id: hash} map is saved in path together with the fingerprint of
+    the log files it was built from. A process that finds it behind the
+    log replays only the records appended since (AppendLog.changes_since);
+    only a rewritten snapshot (compaction or reset) costs a full rebuild,
+    which is then saved for the other processes.
+    """
+
+    def __init__(self, log, path):
+        self.log = log
+        self.path = path
+        self._ids = None
+        self._counts = None
+        self._fingerprint = None
+        self._lock = threading.Lock()
+
+    def existing(self, hashes):
+        """The subset of hashes held by some row"""
+        with self._lock:
+            self._refresh()
+            return {h for h in hashes if h in self._counts}
+
+    def _refresh(self):
+        with self.log.lock:
+            if self._ids is None:
+                self._read()
+            if self._fingerprint == tuple(_stat(p) for p in self.log.files()):
+                return
+            found = self.log.changes_since(self._fingerprint) if self._ids is not None else None
+            if found is None:
+                self._rebuild()
+                return
+            records, self._fingerprint = found
+            for record in records:
+                op, row = record.get("op"), record.get("row", {})
+                key = row.get(self.log.key)
+                if op == "put" or (op == "update" and key in self._ids):
+                    self._set(key, content_hash(row))
+                elif op == "delete":
+                    self._set(key, None)
+
+    def _set(self, key, h):
+        old = self._ids.pop(key, None)
+        if old is not None:
+            self._counts[old] -= 1
+            if not self._counts[old]:
+                del self._counts[old]
+        if h is not None:
+            self._ids[key] = h
+            self._counts[h] = self._counts.get(h, 0) + 1
+
+    def _rebuild(self):
+        # Called with the log lock held, so the rows match the fingerprint
+        self._fingerprint = tuple(_stat(p) for p in self.log.files())
+        self._ids = {}
+        self._counts = {}
+        for row in self.log.load():
+            self._set(row.get(self.log.key), content_hash(row))
+        try:
+            _write_json({"fingerprint": self._fingerprint, "ids": self._ids}, self.path)
+        except Exception as e:
+            print(f"Error saving {self.path}: {e}")
+
+    def _read(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            fingerprint = tuple(tuple(st) if st is not None else None for st in data["fingerprint"])
+            ids = data["ids"]
+        except (OSError, ValueError, KeyError, TypeError):
+            return
+        self._ids = {}
+        self._counts = {}
+        for key, h in ids.items():
+            self._set(key, h)
+        self._fingerprint = fingerprint
+
+
+# ==================== CSV / JSON FILES ====================
+
+class FileStorage:
+    """Original layout: users/goals/reminders in JSON, transactions in CSV.
+
+    Transaction writes are appended to transaction_log and user writes to
+    users_log, and both logs are periodically compacted into their files.
+    Goal and reminder writes load and rewrite the whole JSON file.
+
+    Once a binary snapshot exists at binary_snapshot, it is rewritten along
+    with the CSV file and read instead of it whenever it was made from the
+    current CSV.
+    """
+
+    name = "csv"
+    # Data sets whose per-user rows can be read without loading everything
+    partitioned = ()
+
+    def __init__(self, users_file, transaction_file, goals_file, reminders_file,
+                 transaction_log=None, compact_threshold=1024 * 1024,
+                 binary_snapshot=None, users_log=None):
+        self.binary_snapshot = binary_snapshot
+        self.files = {
+            "users": users_file,
+            "transactions": transaction_file,
+            "goals": goals_file,
+            "reminders": reminders_file,
+        }
+        self.transaction_log = None
+        self.transaction_hashes = None
+        if transaction_file:
+            self.transaction_log = AppendLog(
+                transaction_file,
+                transaction_log or os.path.splitext(transaction_file)[0] + ".log",
+                self._read_transactions,
+                self._write_transactions,
+                threshold=compact_threshold,
+                iter_snapshot=self._iter_csv,
+            )
+            self.transaction_hashes = HashIndex(
+                self.transaction_log, os.path.splitext(transaction_file)[0] + ".hashes")
+        # users.json stays a {username: record} file; the log rows are
+        # {"username": ..., "record": ...}
+        self.user_log = AppendLog(
+            users_file,
+            users_log or os.path.splitext(users_file)[0] + ".log",
+            self._read_users,
+            self._write_users,
+            key="username",
+            threshold=compact_threshold,
+        )
+
+    # ---- users ----
+    def load_users(self):
+        try:
+            return {r["username"]: r["record"] for r in self.user_log.load()}
+        except Exception as e:
+            print(f"Error loading users: {e}")
+            return {}
+
+    def save_users(self, users):
+        try:
+            self.user_log.reset([{"username": u, "record": r} for u, r in users.items()])
+        except Exception as e:
+            print(f"Error saving users: {e}")
+
+    def get_user(self, username):
+        return self.load_users().get(username)
+
+    def put_user(self, username, record):
+        try:
+            self.user_log.append("put", [{"username": username, "record": record}])
+        except Exception as e:
+            print(f"Error saving user: {e}")
+
+    def delete_user(self, username):
+        with self.user_log.lock:
+            if username not in self.load_users():
+                return False
+            try:
+                self.user_log.append("delete", [{"username": username}])
+                return True
+            except Exception as e:
+                print(f"Error deleting user: {e}")
+                return False
+
+    def user_changes(self, fingerprint):
+        """([(username, record or None for a delete)], new fingerprint) for
+        the user writes made since fingerprint("users") returned fingerprint,
+        or None when the files were rewritten since and a full load is needed"""
+        found = self.user_log.changes_since(fingerprint)
+        if found is None:
+            return None
+        records, fingerprint = found
+        changes = []
+        for record in records:
+            row = record.get("row", {})
+            if record.get("op") == "put":
+                changes.append((row.get("username"), row.get("record")))
+            elif record.get("op") == "delete":
+                changes.append((row.get("username"), None))
+        return changes, fingerprint
+
+    # ---- goals, reminders and transactions ----
+    def load(self, dataset):
+        if dataset == "transactions":
+            try:
+                return self.transaction_log.load()
+            except Exception as e:
+                print(f"Error loading transactions: {e}")
+                return []
+        return self._load_json(dataset, [])
+
+    def save(self, dataset, rows):
+        if dataset == "transactions":
+            try:
+                self.transaction_log.reset(rows)
+            except Exception as e:
+                print(f"Error saving transactions: {e}")
+            return
+        try:
+            with file_lock(self.files[dataset]):
+                _write_json(rows, self.files[dataset])
+        except Exception as e:
+            print(f"Error saving {dataset}: {e}")
+
+    def load_for_user(self, dataset, username):
+        return [r for r in self.load(dataset) if r.get("username") == username]
+
+    def iter_for_user(self, dataset, username, chunk_size=1000):
+        """Yield one user's rows in lists of up to chunk_size"""
+        if dataset == "transactions":
+            rows = self.transaction_log.iter_rows()
+        else:
+            rows = iter(self.load(dataset))
+        return _chunks((r for r in rows if r.get("username") == username), chunk_size)
+
+    def insert(self, dataset, row):
+        self.insert_many(dataset, [row])
+
+    def insert_many(self, dataset, rows):
+        if dataset == "transactions":
+            return self._append("put", rows)
+        with file_lock(self.files[dataset]):
+            data = self.load(dataset)
+            data.extend(rows)
+            self.save(dataset, data)
+
+    def update(self, dataset, row):
+        if dataset == "transactions":
+            return self._append("update", [row])
+        with file_lock(self.files[dataset]):
+            data = self.load(dataset)
+            i = _find_index(data, row["id"])
+            if i < 0:
+                return False
+            data[i] = row
+            self.save(dataset, data)
+            return True
+
+    def delete(self, dataset, row):
+        if dataset == "transactions":
+            return self._append("delete", [{"id": row["id"], "username": row.get("username")}])
+        with file_lock(self.files[dataset]):
+            data = self.load(dataset)
+            i = _find_index(data, row["id"])
+            if i < 0:
+                return False
+            del data[i]
+            self.save(dataset, data)
+            return True
+
+    def existing_hashes(self, username, hashes):
+        """The subset of content hashes already stored for username"""
+        # The username is part of every hash, so one index serves all users
+        return self.transaction_hashes.existing(hashes)
+
+    def fingerprint(self, dataset, username=None):
+        if dataset == "transactions":
+            return tuple(_stat(path) for path in self.transaction_log.files())
+        if dataset == "users":
+            return tuple(_stat(path) for path in self.user_log.files())
+        return (_stat(self.files[dataset]),)
+
+    def lock(self, dataset, usernames=()):
+        """Lock keeping other processes from writing dataset while it is held"""
+        if dataset == "transactions":
+            return self.transaction_log.lock
+        if dataset == "users":
+            return self.user_log.lock
+        return file_lock(self.files[dataset])
+
+    # ---- binary snapshot ----
+    def csv_to_binary(self):
+        """Convert the transactions CSV file into the binary snapshot, which
+        is kept up to date from then on. Returns the number of rows."""
+        path = self.files["transactions"]
+        source = _stat(path)
+        rows = self._load_csv(path)
+        self._write_binary(rows, source)
+        return len(rows)
+
+    def binary_to_csv(self, force=False):
+        """Rebuild the transactions CSV file from the binary snapshot.
+        Returns the number of rows.
+
+        Raises ValueError when the CSV exists and the snapshot was not made
+        from it, since the snapshot would then overwrite newer rows, unless
+        force is set. The log lock is held so no write or compaction runs
+        in between.
+        """
+        path = self.files["transactions"]
+        with self.transaction_log.lock:
+            with BinarySnapshot(self.binary_snapshot) as snapshot:
+                source = _stat(path)
+                if not force and source is not None and snapshot.source != source:
+                    raise ValueError(f"{self.binary_snapshot} was not made from the current {path}")
+                rows = snapshot.rows()
+            _replace_file(lambda tmp: self._write_transactions(rows, tmp), path)
+        return len(rows)
+
+    # ---- file helpers ----
+    def _append(self, op, rows):
+        try:
+            if op != "delete":
+                rows = [{f: r.get(f, "") for f in TRANSACTION_FIELDS} for r in rows]
+            self.transaction_log.append(op, rows)
+            return True
+        except Exception as e:
+            print(f"Error saving transactions: {e}")
+            return False
+
+    def _read_users(self, path):
+        return [{"username": u, "record": r} for u, r in self._load_json("users", {}).items()]
+
+    def _write_users(self, rows, path):
+        with open(path, "w") as f:
+            json.dump({r["username"]: r["record"] for r in rows}, f, indent=2)
+
+    def _load_json(self, dataset, empty):
+        path = self.files[dataset]
+        corrupted, denied = _LABELS[dataset]
+        try:
+            _ensure_dir(path)
+            if not os.path.exists(path):
+                try:
+                    # "x" so a file another process just wrote is not truncated
+                    with open(path, "x") as f:
+                        json.dump(empty, f)
+                    return type(empty)()
+                except FileExistsError:
+                    pass
+
+            with open(path, "r") as file:
+                if os.path.getsize(path) == 0:
+                    return type(empty)()
+                return json.load(file)
+        except json.JSONDecodeError:
+            print(f"Corrupted {corrupted} file detected. Starting fresh...")
+            return type(empty)()
+        except PermissionError:
+            print(f"Permission denied when accessing {denied}.")
+            return type(empty)()
+        except Exception as e:
+            print(f"Unexpected error: {e}")
+            return type(empty)()
+
+    def _read_transactions(self, path):
+        if self.binary_snapshot and os.path.exists(self.binary_snapshot):
+            rows = read_binary_snapshot(self.binary_snapshot, _stat(path))
+            if rows is not None:
+                return rows
+            # Stale (the CSV was edited or written by an older version):
+            # bring it up to date for the next start
+            source = _stat(path)
+            rows = self._load_csv(path)
+            self._write_binary(rows, source)
+            return rows
+        return self._load_csv(path)
+
+    def _write_transactions(self, rows, path):
+        self._save_csv(rows, path)
+        if self.binary_snapshot and os.path.exists(self.binary_snapshot):
+            # path is about to be renamed over the CSV file, which keeps
+            # its mtime and size
+            self._write_binary(rows, _stat(path))
+
+    def _write_binary(self, rows, source):
+        try:
+            _replace_file(lambda tmp: write_binary_snapshot(rows, tmp, source),
+                          self.binary_snapshot)
+        except Exception as e:
+            print(f"Error saving transactions snapshot: {e}")
+
+    def _load_csv(self, path):
+        _ensure_dir(path)
+        if not os.path.exists(path):
+            try:
+                with open(path, "x", newline='', encoding="utf-8") as f:
+                    writer = csv.writer(f)
+                    writer.writerow(TRANSACTION_FIELDS)
+                return []
+            except FileExistsError:
+                pass
+
+        rows = read_csv_rows(path)
+        if rows is not None:
+            return rows
+        with open(path, mode="r", newline='', encoding="utf-8") as file:
+            return list(self._iter_csv(file))
+
+    def _iter_csv(self, file):
+        # csv.reader plus dict(zip()) gives the same rows as csv.DictReader
+        # (short rows padded with None, blank lines skipped) at a fraction
+        # of the per-row cost
+        reader = csv.reader(file)
+        header = next(reader, None)
+        if header is None:
+            return
+        width = len(header)
+        has_payment = "payment" in header
+        for values in reader:
+            if not values:
+                continue
+            row = dict(zip(header, values))
+            if len(values) != width:
+                if len(values) < width:
+                    for name in header[len(values):]:
+                        row.setdefault(name, None)
+                else:
+                    row[None] = values[width:]
+            if not has_payment:
+                row["payment"] = "cash"
+            amount = row["amount"]
+            row["amount"] = float(amount) if amount else 0.0
+            yield row
+
+    def _save_csv(self, transactions, path):
+        _ensure_dir(path)
+        with open(path, mode="w", newline='', encoding="utf-8") as file:
+            writer = csv.DictWriter(file, fieldnames=TRANSACTION_FIELDS)
+            writer.writeheader()
+            writer.writerows(transactions)
+
+
+# ==================== PER-USER SHARDS ====================
+
+def shard_name(username):
+    """File-system safe, collision free shard name for a username"""
+    safe = re.sub(r"[^A-Za-z0-9_-]", "_", username)[:40]
+    digest = hashlib.sha1(username.encode("utf-8")).hexdigest()[:8]
+    return f"{safe}-{digest}"
+
+
+class ShardedFileStorage(FileStorage):
+    """FileStorage with one CSV snapshot and change log per user.
+
+    shards_dir/index.json maps each username to its shard, so reading or
+    writing one user's transactions never touches another user's files.
+    """
+
+    name = "sharded"
+    partitioned = ("transactions",)
+
+    def __init__(self, users_file, shards_dir, goals_file, reminders_file,
+                 compact_threshold=1024 * 1024, users_log=None):
+        super().__init__(users_file, None, goals_file, reminders_file,
+                         compact_threshold=compact_threshold, users_log=users_log)
+        self.shards_dir = shards_dir
+        self.index_file = os.path.join(shards_dir, "index.json")
+        self.compact_threshold = compact_threshold
+        self._index = {}
+        self._index_stat = None
+        self._shards = {}
+        self._hashes = {}
+        self._index_lock = threading.Lock()
+
+    # ---- directory index ----
+    def load_index(self):
+        """Return {username: shard name}, reloading it if another process changed it"""
+        st = _stat(self.index_file)
+        if st != self._index_stat:
+            index = {}
+            if st is not None:
+                try:
+                    with open(self.index_file, "r", encoding="utf-8") as f:
+                        index = json.load(f)
+                except ValueError:
+                    print("Corrupted shard index detected. Starting fresh...")
+            self._index, self._index_stat = index, st
+        return self._index
+
+    def _save_index(self, index):
+        _write_json(index, self.index_file)
+        self._index, self._index_stat = index, _stat(self.index_file)
+
+    def _shard(self, username, create=False):
+        with self._index_lock:
+            index = self.load_index()
+            name = index.get(username)
+            if name is None:
+                if not create:
+                    return None
+                with file_lock(self.index_file):
+                    # Another process may have added shards since
+                    index = self.load_index()
+                    name = index.get(username) or shard_name(username)
+                    if username not in index:
+                        self._save_index(dict(index, **{username: name}))
+            shard = self._shards.get(name)
+            if shard is None:
+                base = os.path.join(self.shards_dir, name)
+                shard = AppendLog(base + ".csv", base + ".log", self._load_csv,
+                                  self._save_csv, threshold=self.compact_threshold,
+                                  iter_snapshot=self._iter_csv)
+                self._shards[name] = shard
+                self._hashes[name] = HashIndex(shard, base + ".hashes")
+            return shard
+
+    # ---- transactions ----
+    def load(self, dataset):
+        if dataset != "transactions":
+            return super().load(dataset)
+        rows = []
+        for username in list(self.load_index()):
+            rows.extend(self.load_for_user(dataset, username))
+        return rows
+
+    def save(self, dataset, rows):
+        if dataset != "transactions":
+            return super().save(dataset, rows)
+        try:
+            by_user = {}
+            for r in rows:
+                by_user.setdefault(r.get("username"), []).append(r)
+            for username in set(self.load_index()) | set(by_user):
+                self._shard(username, create=True).reset(by_user.get(username, []))
+        except Exception as e:
+            print(f"Error saving transactions: {e}")
+
+    def load_for_user(self, dataset, username):
+        if dataset != "transactions":
+            return super().load_for_user(dataset, username)
+        try:
+            shard = self._shard(username)
+            return shard.load() if shard else []
+        except Exception as e:
+            print(f"Error loading transactions: {e}")
+            return []
+
+    def iter_for_user(self, dataset, username, chunk_size=1000):
+        if dataset != "transactions":
+            return super().iter_for_user(dataset, username, chunk_size)
+        shard = self._shard(username)
+        return _chunks(shard.iter_rows() if shard else (), chunk_size)
+
+    def existing_hashes(self, username, hashes):
+        """The subset of content hashes already stored for username"""
+        shard = self._shard(username)
+        if shard is None:
+            return set()
+        with self._index_lock:
+            index = self._hashes[self.load_index()[username]]
+        return index.existing(hashes)
+
+    def fingerprint(self, dataset, username=None):
+        if dataset != "transactions":
+            return super().fingerprint(dataset, username)
+        if username is None:
+            usernames = list(self.load_index())
+            return (_stat(self.index_file),) + tuple(
+                self.fingerprint(dataset, u) for u in usernames
+            )
+        shard = self._shard(username)
+        return tuple(_stat(path) for path in shard.files()) if shard else None
+
+    def lock(self, dataset, usernames=()):
+        if dataset != "transactions":
+            return super().lock(dataset, usernames)
+        if not usernames:
+            return file_lock(self.index_file)
+        # Always taken in the same order, so two writers cannot deadlock
+        stack = contextlib.ExitStack()
+        try:
+            for username in sorted(usernames):
+                stack.enter_context(self._shard(username, create=True).lock)
+        except BaseException:
+            stack.close()
+            raise
+        return stack
+
+    def _append(self, op, rows):
+        try:
+            by_user = {}
+            for r in rows:
+                by_user.setdefault(r.get("username"), []).append(
+                    r if op == "delete" else {f: r.get(f, "") for f in TRANSACTION_FIELDS}
+                )
+            for username, user_rows in by_user.items():
+                self._shard(username, create=True).append(op, user_rows)
+            return True
+        except Exception as e:
+            print(f"Error saving transactions: {e}")
+            return False
+
+
+# ==================== SQLITE ====================
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    username TEXT PRIMARY KEY,
+    user_id TEXT,
+    record TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_users_user_id ON users(user_id);
+
+CREATE TABLE IF NOT EXISTS transactions (
+    id TEXT PRIMARY KEY,
+    username TEXT NOT NULL,
+    amount REAL NOT NULL DEFAULT 0,
+    currency TEXT,
+    category TEXT,
+    date TEXT,
+    description TEXT,
+    type TEXT,
+    payment TEXT NOT NULL DEFAULT 'cash',
+    content_hash TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_transactions_user_date ON transactions(username, date);
+-- Entries are ordered by (username, rowid), so per-user reads in insertion
+-- order can stream straight off the index without sorting
+CREATE INDEX IF NOT EXISTS idx_transactions_user ON transactions(username);
+
+CREATE TABLE IF NOT EXISTS goals (
+    id TEXT PRIMARY KEY,
+    username TEXT NOT NULL,
+    title TEXT,
+    target_amount REAL,
+    current_amount REAL,
+    deadline TEXT,
+    status TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_goals_user ON goals(username);
+
+CREATE TABLE IF NOT EXISTS reminders (
+    id TEXT PRIMARY KEY,
+    username TEXT NOT NULL,
+    title TEXT,
+    amount REAL,
+    deadline TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_reminders_user ON reminders(username);
+
+-- Write counters per data set: username '' counts every write, '*' counts
+-- full rewrites and any other username counts that user's row writes
+CREATE TABLE IF NOT EXISTS versions (
+    dataset TEXT NOT NULL,
+    username TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    PRIMARY KEY (dataset, username)
+);
+"""
+
+
+class SqliteStorage:
+    """Embedded SQLite database with one indexed table per data set.
+
+    Every row level operation touches a single row, and per-user reads use
+    the username index instead of scanning the whole data set.
+    """
+
+    name = "sqlite"
+    partitioned = ("transactions", "goals", "reminders")
+
+    def __init__(self, db_file):
+        self.db_file = db_file
+        self._local = threading.local()
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            _ensure_dir(self.db_file)
+            conn = sqlite3.connect(self.db_file, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._add_content_hash(conn)
+            self._local.conn = conn
+        return conn
+
+    def _add_content_hash(self, conn):
+        """Add and fill the content_hash column in databases created before it existed"""
+        columns = [r[1] for r in conn.execute("PRAGMA table_info(transactions)")]
+        if "content_hash" not in columns:
+            with conn:
+                conn.execute("ALTER TABLE transactions ADD COLUMN content_hash TEXT")
+                cols = ", ".join(TRANSACTION_FIELDS)
+                rows = self._rows("transactions", conn.execute(f"SELECT {cols} FROM transactions"))
+                conn.executemany("UPDATE transactions SET content_hash = ? WHERE id = ?",
+                                 [(content_hash(r), r["id"]) for r in rows])
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_transactions_user_hash "
+                     "ON transactions(username, content_hash)")
+
+    def _columns(self, dataset):
+        if dataset == "transactions":
+            return TRANSACTION_FIELDS + ["content_hash"]
+        return FIELDS[dataset]
+
+    def _values(self, dataset, row):
+        values = [row.get(f) for f in FIELDS[dataset]]
+        if dataset == "transactions":
+            amount = row.get("amount")
+            values[2] = float(amount) if amount not in (None, "") else 0.0
+            values[8] = row.get("payment") or "cash"
+            values.append(content_hash(row))
+        return values
+
+    def _rows(self, dataset, cursor):
+        fields = FIELDS[dataset]
+        return [dict(zip(fields, values)) for values in cursor]
+
+    def _bump(self, conn, dataset, usernames=(), full=False):
+        """Advance the write counters checked by fingerprint()"""
+        keys = {""} | set(usernames) | ({"*"} if full else set())
+        conn.executemany(
+            "INSERT INTO versions (dataset, username, version) VALUES (?, ?, 1) "
+            "ON CONFLICT(dataset, username) DO UPDATE SET version = version + 1",
+            [(dataset, k) for k in keys if k is not None],
+        )
+
+    # ---- users ----
+    def load_users(self):
+        try:
+            cur = self._connect().execute("SELECT username, record FROM users ORDER BY rowid")
+            return {username: json.loads(record) for username, record in cur}
+        except Exception as e:
+            print(f"Unexpected error: {e}")
+            return {}
+
+    def save_users(self, users):
+        try:
+            with self._connect() as conn:
+                conn.execute("DELETE FROM users")
+                conn.executemany(
+                    "INSERT INTO users (username, user_id, record) VALUES (?, ?, ?)",
+                    [(u, r.get("user_id"), json.dumps(r)) for u, r in users.items()],
+                )
+                self._bump(conn, "users", full=True)
+        except Exception as e:
+            print(f"Error saving users: {e}")
+
+    def get_user(self, username):
+        try:
+            row = self._connect().execute(
+                "SELECT record FROM users WHERE username = ?", (username,)
+            ).fetchone()
+            return json.loads(row[0]) if row else None
+        except Exception as e:
+            print(f"Unexpected error: {e}")
+            return None
+
+    def put_user(self, username, record):
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT INTO users (username, user_id, record) VALUES (?, ?, ?) "
+                    "ON CONFLICT(username) DO UPDATE SET user_id = excluded.user_id, record = excluded.record",
+                    (username, record.get("user_id"), json.dumps(record)),
+                )
+                self._bump(conn, "users")
+        except Exception as e:
+            print(f"Error saving user: {e}")
+
+    def delete_user(self, username):
+        try:
+            with self._connect() as conn:
+                cur = conn.execute("DELETE FROM users WHERE username = ?", (username,))
+                if cur.rowcount:
+                    self._bump(conn, "users")
+            return cur.rowcount > 0
+        except Exception as e:
+            print(f"Error deleting user: {e}")
+            return False
+
+    # ---- goals, reminders and transactions ----
+    def load(self, dataset):
+        try:
+            cols = ", ".join(FIELDS[dataset])
+            cur = self._connect().execute(f"SELECT {cols} FROM {dataset} ORDER BY rowid")
+            return self._rows(dataset, cur)
+        except Exception as e:
+            print(f"Error loading {dataset}: {e}")
+            return []
+
+    def save(self, dataset, rows):
+        try:
+            fields = self._columns(dataset)
+            sql = f"INSERT INTO {dataset} ({', '.join(fields)}) VALUES ({', '.join('?' * len(fields))})"
+            with self._connect() as conn:
+                conn.execute(f"DELETE FROM {dataset}")
+                conn.executemany(sql, [self._values(dataset, r) for r in rows])
+                self._bump(conn, dataset, full=True)
+        except Exception as e:
+            print(f"Error saving {dataset}: {e}")
+
+    def load_for_user(self, dataset, username):
+        try:
+            cols = ", ".join(FIELDS[dataset])
+            cur = self._connect().execute(
+                f"SELECT {cols} FROM {dataset} WHERE username = ? ORDER BY rowid", (username,)
+            )
+            return self._rows(dataset, cur)
+        except Exception as e:
+            print(f"Error loading {dataset}: {e}")
+            return []
+
+    def iter_for_user(self, dataset, username, chunk_size=1000):
+        """Yield one user's rows in lists of up to chunk_size, straight from a cursor"""
+        cols = ", ".join(FIELDS[dataset])
+        cur = self._connect().execute(
+            f"SELECT {cols} FROM {dataset} WHERE username = ? ORDER BY rowid", (username,)
+        )
+        try:
+            while True:
+                chunk = cur.fetchmany(chunk_size)
+                if not chunk:
+                    break
+                yield self._rows(dataset, chunk)
+        finally:
+            cur.close()
+
+    def insert(self, dataset, row):
+        self.insert_many(dataset, [row])
+
+    def insert_many(self, dataset, rows):
+        try:
+            fields = self._columns(dataset)
+            sql = f"INSERT INTO {dataset} ({', '.join(fields)}) VALUES ({', '.join('?' * len(fields))})"
+            with self._connect() as conn:
+                conn.executemany(sql, [self._values(dataset, r) for r in rows])
+                self._bump(conn, dataset, {r.get("username") for r in rows})
+        except Exception as e:
+            print(f"Error saving {dataset}: {e}")
+
+    def update(self, dataset, row):
+        try:
+            fields = self._columns(dataset)[1:]
+            assignments = ", ".join(f"{f} = ?" for f in fields)
+            values = self._values(dataset, row)[1:] + [row["id"]]
+            with self._connect() as conn:
+                cur = conn.execute(f"UPDATE {dataset} SET {assignments} WHERE id = ?", values)
+                if cur.rowcount:
+                    self._bump(conn, dataset, [row.get("username")])
+            return cur.rowcount > 0
+        except Exception as e:
+            print(f"Error updating {dataset}: {e}")
+            return False
+
+    def delete(self, dataset, row):
+        try:
+            with self._connect() as conn:
+                cur = conn.execute(f"DELETE FROM {dataset} WHERE id = ?", (row["id"],))
+                if cur.rowcount:
+                    self._bump(conn, dataset, [row.get("username")])
+            return cur.rowcount > 0
+        except Exception as e:
+            print(f"Error deleting from {dataset}: {e}")
+            return False
+
+    def existing_hashes(self, username, hashes):
+        """The subset of content hashes already stored for username"""
+        hashes = list(hashes)
+        found = set()
+        conn = self._connect()
+        # Stay well below SQLite's limit on bound parameters
+        for i in range(0, len(hashes), 500):
+            part = hashes[i:i + 500]
+            cur = conn.execute(
+                f"SELECT content_hash FROM transactions WHERE username = ? "
+                f"AND content_hash IN ({', '.join('?' * len(part))})",
+                [username] + part,
+            )
+            found.update(h for (h,) in cur)
+        return found
+
+    def fingerprint(self, dataset, username=None):
+        """Write counters of the data set (or one user's rows in it)"""
+        cur = self._connect().execute(
+            "SELECT username, version FROM versions WHERE dataset = ? AND username IN ('*', ?)",
+            (dataset, "" if username is None else username),
+        )
+        versions = dict(cur.fetchall())
+        return (versions.get("*", 0), versions.get("" if username is None else username, 0))
+
+    def lock(self, dataset, usernames=()):
+        """SQLite serializes the writes themselves; this also keeps other
+        processes out between a write and the fingerprints read around it"""
+        return file_lock(self.db_file)
+
+    def backup_to(self, path):
+        """Copy the database to path using SQLite's online backup API"""
+        _ensure_dir(path)
+        target = sqlite3.connect(path)
+        try:
+            self._connect().backup(target)
+        finally:
+            target.close()
+
+
+# ==================== MIGRATION ====================
+
+def migrate(source, target):
+    """Copy users, transactions, goals and reminders from one engine to another"""
+    users = source.load_users()
+    target.save_users(users)
+    print(f"Migrated {len(users)} users.")
+    for dataset in ("transactions", "goals", "reminders"):
+        rows = source.load(dataset)
+        target.save(dataset, rows)
+        print(f"Migrated {len(rows)} {dataset}.")
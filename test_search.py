@@ -0,0 +1,62 @@
+import shutil
+import tempfile
+import unittest
+import data_handler
+import search
+from storage import FileStorage
+
+class CursorTest(unittest.TestCase):
+    """Pagination cursors must only be accepted by the sort they came from"""
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp(prefix="spendlify-test-")
+        path = lambda name: f"{self.dir}/{name}"
+        data_handler.set_engine(FileStorage(path("users.json"), path("transactions.csv"),
+                                            path("goals.json"), path("reminders.json")))
+        data_handler.save_transactions([
+            {"id": f"t{i}", "username": "alice", "amount": 10.0 + i, "currency": "USD",
+             "category": "Food", "date": f"2024-01-{i + 1:02d}", "description": "",
+             "type": "expense", "payment": "cash"}
+            for i in range(5)
+        ])
+
+    def tearDown(self):
+        data_handler.set_engine(data_handler.STORAGE_ENGINE)
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def test_cursor_pages_through_its_own_sort(self):
+        rows, cursor = search.page_transactions("alice", sort_by="amount", limit=2)
+        more, _ = search.page_transactions("alice", sort_by="amount", limit=2, cursor=cursor)
+        self.assertEqual([r["id"] for r in rows + more], ["t4", "t3", "t2", "t1"])
+
+    def test_cursor_reused_across_sort_keys(self):
+        for made_for in search.SORT_KEYS:
+            _, cursor = search.page_transactions("alice", sort_by=made_for, limit=2)
+            for used_with in search.SORT_KEYS:
+                if used_with == made_for:
+                    continue
+                with self.assertRaises(ValueError):
+                    search.page_transactions("alice", sort_by=used_with, limit=2, cursor=cursor)
+
+    def test_cursor_reused_with_same_typed_sort(self):
+        # date and category values are both strings, created and amount both numbers
+        for made_for, used_with in (("date", "category"), ("category", "date"), ("created", "amount")):
+            _, cursor = search.page_transactions("alice", sort_by=made_for, limit=2)
+            with self.assertRaises(ValueError):
+                search.page_transactions("alice", sort_by=used_with, limit=2, cursor=cursor)
+
+    def test_cursor_reused_across_orders(self):
+        _, cursor = search.page_transactions("alice", sort_by="date", order="asc", limit=2)
+        with self.assertRaises(ValueError):
+            search.page_transactions("alice", sort_by="date", order="desc", limit=2, cursor=cursor)
+
+    def test_malformed_cursor(self):
+        for key in ([1.0, 2], [True, "t1"], ["x", "t1"]):
+            cursor = search.encode_cursor("amount", "desc", key)
+            with self.assertRaises(ValueError):
+                search.page_transactions("alice", sort_by="amount", cursor=cursor)
+        with self.assertRaises(ValueError):
+            search.page_transactions("alice", sort_by="date", cursor="not a cursor")
+
+if __name__ == "__main__":
+    unittest.main()
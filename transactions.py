@@ -1,12 +1,17 @@
 import uuid
 import datetime
-from data_handler import load_transactions, save_transactions
+import rollups
+from data_handler import (
+    load_user_transactions,
+    add_transaction_record,
+    update_transaction_record,
+    delete_transaction_record,
+    TransactionTable,
+)
 
 def add_transaction(username):
     """ Add a new transaction for a specific user """
     try:
-        transactions = load_transactions()
-        
         while True:
             amount_input = input("Enter transaction amount: ")
             try:
@@ -85,8 +90,7 @@ def add_transaction(username):
             "type": t_type,
             "payment": payment
         }
-        transactions.append(transaction)
-        save_transactions(transactions)
+        add_transaction_record(transaction)
         print("Transaction saved successfully!")
     
     except Exception as e:
@@ -94,8 +98,7 @@ def add_transaction(username):
 
 def view_transactions(username):
     """ Display all transactions belonging to a given user """
-    transactions = load_transactions()
-    user_transactions = [t for t in transactions if t["username"] == username]
+    user_transactions = load_user_transactions(username)
 
     if not user_transactions:
         print("No transactions found for this user.")
@@ -110,8 +113,7 @@ def view_transactions(username):
 def delete_transaction(username):
     """ Delete a transaction by its unique ID """
     try:
-        transactions = load_transactions()
-        user_transactions = [t for t in transactions if t["username"] == username]
+        user_transactions = load_user_transactions(username)
 
         if not user_transactions:
             print("No transactions found for this user.")
@@ -134,8 +136,7 @@ def delete_transaction(username):
         des = input("Are you sure you want to delete this transaction? (y/n): ").lower()
         
         if des == 'y':
-            transactions.remove(target)
-            save_transactions(transactions)
+            delete_transaction_record(target)
             print("Transaction deleted successfully.")
         elif des == 'n':
             print("Skipping deleting transaction...")
@@ -148,8 +149,7 @@ def delete_transaction(username):
 def edit_transaction(username):
     """Edit an existing transaction for the specified user."""
     try:
-        transactions = load_transactions()
-        user_transactions = [t for t in transactions if t["username"] == username]
+        user_transactions = load_user_transactions(username)
 
         if not user_transactions:
             print("No transactions found to edit.")
@@ -213,98 +213,106 @@ def edit_transaction(username):
         if new_payment:
             target_transaction["payment"] = new_payment
 
-        save_transactions(transactions)
+        update_transaction_record(target_transaction)
         print("Transaction updated successfully!")
 
     except Exception as e:
         print(f"Error editing transaction: {e}")
 
-def get_user_summary(username):
-    """Compute total income, total expenses and net per currency for a user.
+def summarize_transactions(transactions, currency=None, top_n=3):
+    """Aggregate a list of transactions in a single pass.
 
-    Returns a dict keyed by currency with {'income': float, 'expense': float, 'net': float}
+    Returns a dict with:
+      'totals':         {currency: {'income': float, 'expense': float, 'net': float}}
+      'categories':     {currency: {category: expense total}}
+      'breakdown':      {category: expense total} in currency (all currencies if None)
+      'top_categories': [(category, amount, percent_of_total_expense)] for the breakdown
+
+    transactions may also be a data_handler.TransactionTable, which is
+    aggregated column-wise.
+    """
+    if isinstance(transactions, TransactionTable):
+        totals, categories = transactions.currency_totals()
+        return _finish_summary(totals, categories, currency, top_n)
+
+    totals = {}
+    categories = {}
+    for t in transactions:
+        cur = t.get('currency', 'USD')
+        try:
+            amt = float(t.get('amount', 0.0))
+        except (TypeError, ValueError):
+            amt = 0.0
+        typ = t.get('type', '').lower()
+
+        cur_totals = totals.get(cur)
+        if cur_totals is None:
+            cur_totals = totals[cur] = {'income': 0.0, 'expense': 0.0, 'net': 0.0}
+
+        if typ == 'income':
+            cur_totals['income'] += amt
+            cur_totals['net'] += amt
+        else:
+            cur_totals['expense'] += amt
+            cur_totals['net'] -= amt
+            if typ == 'expense':
+                cats = categories.setdefault(cur, {})
+                cat = t.get('category', 'Other')
+                cats[cat] = cats.get(cat, 0.0) + amt
+
+    return _finish_summary(totals, categories, currency, top_n)
+
+def _finish_summary(totals, categories, currency, top_n):
+    """Derive breakdown and top categories from per-currency category totals"""
+    if currency is not None:
+        breakdown = dict(categories.get(currency, {}))
+    else:
+        breakdown = {}
+        for cats in categories.values():
+            for cat, amt in cats.items():
+                breakdown[cat] = breakdown.get(cat, 0.0) + amt
+
+    total_expense = sum(breakdown.values())
+    sorted_cats = sorted(breakdown.items(), key=lambda x: x[1], reverse=True)
+    top = []
+    for cat, amt in sorted_cats[:top_n]:
+        pct = (amt / total_expense * 100) if total_expense > 0 else 0.0
+        top.append((cat, amt, pct))
+
+    return {
+        'totals': totals,
+        'categories': categories,
+        'breakdown': breakdown,
+        'top_categories': top,
+    }
+
+def get_dashboard_summary(username, currency=None, top_n=3):
+    """Totals, category breakdown and top categories for a user.
+
+    Answered from the user's materialized rollups, so the cost depends on the
+    number of categories rather than the number of transactions.
     """
     try:
-        transactions = load_transactions()
-        user_transactions = [t for t in transactions if t.get('username') == username]
+        totals, categories = rollups.currency_totals(username)
+        return _finish_summary(totals, categories, currency, top_n)
+    except Exception as e:
+        print(f"Error computing dashboard summary: {e}")
+        return {'totals': {}, 'categories': {}, 'breakdown': {}, 'top_categories': []}
 
-        summary = {}
-        for t in user_transactions:
-            cur = t.get('currency', 'USD')
-            try:
-                amt = float(t.get('amount', 0.0))
-            except (TypeError, ValueError):
-                amt = 0.0
-            typ = t.get('type', '').lower()
-            if cur not in summary:
-                summary[cur] = {'income': 0.0, 'expense': 0.0, 'net': 0.0}
-
-            if typ == 'income':
-                summary[cur]['income'] += amt
-                summary[cur]['net'] += amt
-            else:
-                summary[cur]['expense'] += amt
-                summary[cur]['net'] -= amt
+def get_user_summary(username):
+    """Compute total income, total expenses and net per currency for a user.
 
-        return summary
-    except Exception as e:
-        print(f"Error computing user summary: {e}")
-        return {}
+    Returns a dict keyed by currency with {'income': float, 'expense': float, 'net': float}
+    """
+    return get_dashboard_summary(username)['totals']
 
 def get_top_categories(username, currency=None, top_n=3):
     """Return top N spending categories for a user in the given currency.
 
     Returns a list of tuples: (category, amount, percent_of_total_expense)
     """
-    try:
-        transactions = load_transactions()
-        user_transactions = [t for t in transactions if t.get('username') == username]
-
-        # Filter expenses and by currency if provided
-        expenses = [t for t in user_transactions if t.get('type', '').lower() == 'expense' and (currency is None or t.get('currency') == currency)]
-
-        totals = {}
-        total_expense = 0.0
-        for t in expenses:
-            cat = t.get('category', 'Other')
-            try:
-                amt = float(t.get('amount', 0.0))
-            except (TypeError, ValueError):
-                amt = 0.0
-            totals[cat] = totals.get(cat, 0.0) + amt
-            total_expense += amt
-
-        # Create sorted list
-        sorted_cats = sorted(totals.items(), key=lambda x: x[1], reverse=True)
-
-        result = []
-        for cat, amt in sorted_cats[:top_n]:
-            pct = (amt / total_expense * 100) if total_expense > 0 else 0.0
-            result.append((cat, amt, pct))
-
-        return result
-    except Exception as e:
-        print(f"Error computing top categories: {e}")
-        return []
+    return get_dashboard_summary(username, currency, top_n)['top_categories']
 
 def category_breakdown(username, currency=None):
-    try:
-        transactions = load_transactions()
-        user_transactions = [t for t in transactions if t.get('username') == username]
-
-        # Filter expenses and by currency if provided
-        expenses = [t for t in user_transactions if t.get('type', '').lower() == 'expense' and (currency is None or t.get('currency') == currency)]
-
-        breakdown = {}
-        for t in expenses:
-            cat = t.get('category', 'Other')
-            try:
-                amt = float(t.get('amount', 0.0))
-            except (TypeError, ValueError):
-                amt = 0.0
-            breakdown[cat] = breakdown.get(cat, 0.0) + amt
-
-        return breakdown
-    except Exception as e:
-        print(f"Error computing category breakdown: {e}")
-        return {}
\ No newline at end of file
+    """Return {category: expense total} for a user in the given currency"""
+    return get_dashboard_summary(username, currency)['breakdown']
@@ -1,25 +1,24 @@
 import re
-from auth import load_users, save_users, change_password
+from auth import change_password
+from data_handler import delete_user_record, get_user, save_user
 
 # Delete user account    
 def delete_user(username):
-    users = load_users()
-    if username not in users:
+    if get_user(username) is None:
         print("User does not exist.")
         return
     
     confirm = input(f"Are you sure you want to delete '{username}'? (y/n): ").strip().lower()
     if confirm == 'y':
-        del users[username]
-        save_users(users)
+        delete_user_record(username)
         print("User account deleted successfully.")
     else:
         print("Account deletion cancelled.")
         
 # Edit user profile
 def edit_user_profile(username):
-    users = load_users()
-    if username not in users:
+    user = get_user(username)
+    if user is None:
         print("User does not exist.")
         return
     
@@ -36,7 +35,7 @@ def edit_user_profile(username):
             if not re.match(r"^[A-Za-z\s]{2,50}$", full_name):
                 print("Full name must contain only letters and spaces (2–50 characters).")
                 return
-            users[username]["full_name"] = full_name
+            user["full_name"] = full_name
     
     elif field == "2":
         change_password(username)
@@ -48,21 +47,20 @@ def edit_user_profile(username):
             if not re.match(r"^[A-Z]{3}$", currency):
                 print("Invalid currency format! Use 3-letter code (e.g., USD).")
                 return
-            users[username]["currency"] = currency
+            user["currency"] = currency
     
     else:
         print("Invalid choice!")
         return
     
-    save_users(users)
+    save_user(username, user)
     print("Profile updated successfully.")
     
 def view_user_profile(username):
-    users = load_users()
-    if username not in users:
+    user = get_user(username)
+    if user is None:
         print("User does not exist.")
         return
-    user = users[username]
     print("\n=== User Profile ===")
     print(f"Full Name: {user['full_name']}")
     print(f"Username: {username}")